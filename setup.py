@@ -94,7 +94,9 @@ setup(
         'textile': ['textile'],
         'creole': ['creole'],
         'mako': ['mako'],
-        'jinja2': ['jinja2']},
+        'jinja2': ['jinja2'],
+        'brotli': ['brotli'],
+        'pygments': ['pygments']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Console',
@@ -0,0 +1,220 @@
+'''Write the outputs of a rendering process into a tar or zip archive for
+deploying them. The rendered outputs are put into a spool as they are
+yielded by ``Project.render`` (in memory up to ``SPOOL_SIZE`` bytes, then in a
+temporary file), so they are not read from the output directory again; only
+the files which were not rendered are. A delta archive contains only the
+outputs whose content changed and the files which were written into the
+output directory by the stages (e.g. the feeds).
+
+The members are sorted by their paths and have the same modification time
+(the environment variable ``SOURCE_DATE_EPOCH`` or 1980-01-01, the earliest
+time a zip archive can store), so rendering the same outputs twice results in
+the same archive.
+
+'''
+import os
+import io
+import bz2
+import gzip
+import time
+import tarfile
+import zipfile
+import hashlib
+import tempfile
+
+from swsg.loggers import swsg_logger as logger
+
+# 1980-01-01 00:00:00 UTC
+DEFAULT_ARCHIVE_MTIME = 315532800
+
+# the number of bytes of rendered outputs which are spooled in memory before
+# they are moved into a temporary file
+SPOOL_SIZE = 16 * 1024 * 1024
+
+# filename extensions of the supported archive formats and the compression of
+# tar archives
+ARCHIVE_FORMATS = [
+    ('.tar', ('tar', None)),
+    ('.tar.gz', ('tar', 'gzip')),
+    ('.tgz', ('tar', 'gzip')),
+    ('.tar.bz2', ('tar', 'bzip2')),
+    ('.zip', ('zip', None))]
+
+
+def archive_format(filename):
+    '''Return the format ("tar" or "zip") and the compression of the archive
+    ``filename`` by its filename extension.
+
+    '''
+    for extension, format in ARCHIVE_FORMATS:
+        if filename.endswith(extension):
+            return format
+    raise ValueError(
+        '{0} is not a supported archive; possible filename extensions are: '
+        '{1}'.format(filename, ', '.join(
+            extension for extension, _ in ARCHIVE_FORMATS)))
+
+
+def archive_mtime():
+    'return the modification time of every member of an archive'
+    return int(os.environ.get('SOURCE_DATE_EPOCH', DEFAULT_ARCHIVE_MTIME))
+
+
+class _BZ2Writer(object):
+    'a file object which compresses everything written into ``fp``'
+    def __init__(self, fp):
+        self.fp = fp
+        self.compressor = bz2.BZ2Compressor()
+
+    def write(self, data):
+        self.fp.write(self.compressor.compress(data))
+
+    def close(self):
+        self.fp.write(self.compressor.flush())
+
+
+class TarArchiveWriter(object):
+    def __init__(self, fp, compression, mtime):
+        self.mtime = mtime
+        self.compressed_fp = None
+        if compression == 'gzip':
+            # the header of a gzip file contains a time as well
+            fp = self.compressed_fp = gzip.GzipFile(
+                fileobj=fp, mode='wb', mtime=mtime)
+        elif compression == 'bzip2':
+            fp = self.compressed_fp = _BZ2Writer(fp)
+        self.archive = tarfile.open(
+            fileobj=fp, mode='w', format=tarfile.PAX_FORMAT)
+
+    def add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self.mtime
+        info.mode = 0644
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+        if self.compressed_fp is not None:
+            self.compressed_fp.close()
+
+
+class ZipArchiveWriter(object):
+    def __init__(self, fp, mtime):
+        self.date_time = time.gmtime(mtime)[:6]
+        self.archive = zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED)
+
+    def add(self, name, data):
+        info = zipfile.ZipInfo(name, self.date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0644 << 16
+        self.archive.writestr(info, data)
+
+    def close(self):
+        self.archive.close()
+
+
+class OutputArchive(object):
+    '''Collect the outputs of rendering ``project`` and write them into the
+    archive ``filename`` when :meth:`write` is called after the rendering
+    process. If ``delta`` is true, only the changed outputs are written.
+
+    '''
+    def __init__(self, project, filename, delta=False):
+        self.format, self.compression = archive_format(filename)
+        self.project = project
+        self.filename = filename
+        self.delta = delta
+        # the digests of the outputs before rendering; key is the path of an
+        # output, value is its digest
+        self.previous_digests = dict(
+            (entry.output_path, entry.output_digest)
+            for entry in project.manifest.entries.itervalues())
+        # the encoded rendered outputs in the order they were added; they are
+        # written into the archive in the order of the members
+        self.spool = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        # key is the path of a rendered output which belongs into the
+        # archive, value is a tuple of its offset and size in the spool
+        self.outputs = {}
+        # whole seconds, because file systems may store modification times
+        # with a resolution of a second
+        self.started = int(time.time())
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.filename)
+
+    def add(self, output_path, output):
+        'spool an output which was yielded by ``Project.render``'
+        data = output.encode('utf-8')
+        if self.delta:
+            digest = hashlib.sha256(data).hexdigest()
+            if self.previous_digests.get(output_path) == digest:
+                return
+        self.spool.seek(0, os.SEEK_END)
+        self.outputs[output_path] = self.spool.tell(), len(data)
+        self.spool.write(data)
+
+    def read_member(self, path):
+        '''Return the content of the member ``path``, from the spool if it
+        was rendered, otherwise from the output directory.
+
+        '''
+        if path in self.outputs:
+            offset, size = self.outputs[path]
+            self.spool.seek(offset)
+            return self.spool.read(size)
+        with open(path, 'rb') as fp:
+            return fp.read()
+
+    def members(self):
+        '''Return the paths of the files which belong into the archive, sorted
+        by their names in the archive.
+
+        '''
+        output_dir = self.project.output_dir
+        outputs = self.project.manifest.outputs
+        paths = set(self.outputs)
+        for directory, dirnames, filenames in os.walk(output_dir):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if self.delta:
+                    # outputs of sources are only in a delta archive if they
+                    # were added; other files are in it if a stage wrote them
+                    if (path in outputs or
+                        os.path.getmtime(path) < self.started):
+                        continue
+                paths.add(path)
+        return sorted(paths, key=self.member_name)
+
+    def member_name(self, path):
+        name = os.path.relpath(path, self.project.output_dir)
+        return name.replace(os.sep, '/')
+
+    def write(self):
+        'write the archive and return the number of its members'
+        temp_filename = '{0}.{1}.tmp'.format(self.filename, os.getpid())
+        mtime = archive_mtime()
+        count = 0
+        try:
+            with open(temp_filename, 'wb') as fp:
+                if self.format == 'zip':
+                    writer = ZipArchiveWriter(fp, mtime)
+                else:
+                    writer = TarArchiveWriter(fp, self.compression, mtime)
+                try:
+                    for path in self.members():
+                        writer.add(
+                            self.member_name(path), self.read_member(path))
+                        count += 1
+                finally:
+                    writer.close()
+            os.rename(temp_filename, self.filename)
+        except:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        finally:
+            self.spool.close()
+        logger.notice('wrote {0} files into the archive {1}'.format(
+            count, self.filename))
+        return count
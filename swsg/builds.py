@@ -0,0 +1,158 @@
+'''Render several projects of the projects file at once. The projects are
+rendered by a fixed set of worker processes which live until every project
+is rendered, so the caches of a worker (e.g. the highlighted code blocks of
+``swsg.highlighting``) are shared by all projects it renders. The workers
+never write the projects file; the projects are saved one after another by
+the process which started them. A project which fails does not stop the
+others from being rendered.
+
+'''
+import time
+import fnmatch
+import traceback
+import multiprocessing
+from Queue import Empty
+from collections import namedtuple
+
+from swsg.loggers import swsg_logger as logger
+from swsg.compression import CompressionStage
+from swsg.feeds import FeedStage
+from swsg.manifest import RenderReport
+from swsg.minify import MinifyStage
+from swsg.output_cache import OutputCache
+from swsg.pipeline import write_output
+from swsg.search import SearchIndexStage
+
+# ``error`` is the formatted traceback of a failed project or ``None``
+ProjectResult = namedtuple(
+    'ProjectResult', 'name project_dir rendered deleted duration error')
+
+
+def get_render_stages(project, shard=None):
+    '''Return the optional stages of rendering ``project`` which are enabled
+    in its configuration file. Stages which need every output of the project
+    are disabled if only the sources of ``shard`` are rendered.
+
+    '''
+    config = project.read_config()
+    stages = []
+    # minifying has to happen before compressing
+    stage_classes = [
+        FeedStage, SearchIndexStage, MinifyStage, CompressionStage]
+    for StageClass in stage_classes:
+        stage = StageClass.from_config(config)
+        if stage is None:
+            continue
+        if shard is not None and stage.site_wide:
+            logger.notice(
+                'the stage {0} is disabled, because only a shard is '
+                'rendered'.format(stage.name))
+            continue
+        stages.append(stage)
+    return stages
+
+
+def select_projects(projects, patterns=()):
+    '''Return the projects whose names or directories match one of the
+    shell-style ``patterns`` (every project if there are no patterns). The
+    projects which took longest to render the last time come first.
+
+    '''
+    if patterns:
+        projects = [
+            project for project in projects
+            if any(fnmatch.fnmatch(project.name, pattern) or
+                   fnmatch.fnmatch(project.project_dir, pattern)
+                   for pattern in patterns)]
+
+    def last_duration(project):
+        return sum(
+            entry.duration or 0
+            for entry in project.manifest.entries.itervalues())
+    return sorted(
+        projects, key=lambda project: (-last_duration(project), project.name))
+
+
+def render_project(project, output_cache=None):
+    '''Render ``project`` with the stages of its configuration file and write
+    its outputs, but do not update the projects file. Return a
+    ``ProjectResult``.
+
+    '''
+    start = time.time()
+    report = RenderReport()
+    for output_path, output in project.render(
+            report=report, stages=get_render_stages(project),
+            output_cache=output_cache, save=False):
+        write_output(output_path, output)
+    return ProjectResult(
+        project.name, project.project_dir, len(report.rendered),
+        len(report.deleted), time.time() - start, None)
+
+
+def _render_projects_in_worker(tasks, results, output_cache_directory):
+    output_cache = None
+    if output_cache_directory is not None:
+        output_cache = OutputCache.from_directory(output_cache_directory)
+    for project in iter(tasks.get, None):
+        start = time.time()
+        try:
+            result = render_project(project, output_cache)
+        except Exception:
+            results.put((None, ProjectResult(
+                project.name, project.project_dir, 0, 0, time.time() - start,
+                traceback.format_exc())))
+        else:
+            results.put((project, result))
+
+
+def _get_result(results, workers):
+    while True:
+        try:
+            return results.get(timeout=1.0)
+        except Empty:
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError('the worker processes exited unexpectedly')
+
+
+def render_projects(projects, processes=None, output_cache_directory=None):
+    '''Render ``projects`` in ``processes`` worker processes (the number of
+    CPUs per default) and update the projects file after every rendered
+    project. Yield a ``ProjectResult`` for every project in the order the
+    projects are finished. The outputs of all projects are looked up in the
+    output cache in ``output_cache_directory`` if it is given.
+
+    '''
+    projects = list(projects)
+    if not projects:
+        return
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    for project in projects:
+        tasks.put(project)
+    # the worker processes are not daemonic, because the stages of a project
+    # may start processes of their own (e.g. ``CompressionStage``)
+    workers = [
+        multiprocessing.Process(
+            target=_render_projects_in_worker,
+            args=(tasks, results, output_cache_directory))
+        for _ in xrange(min(processes, len(projects)))]
+    for worker in workers:
+        tasks.put(None)
+        worker.start()
+    finished = False
+    try:
+        for _ in projects:
+            project, result = _get_result(results, workers)
+            # the traceback of a failed project is reported by the caller
+            if project is not None:
+                project.update_projects_file()
+            yield result
+        finished = True
+    finally:
+        for worker in workers:
+            if not finished:
+                worker.terminate()
+            worker.join()
@@ -0,0 +1,271 @@
+'''On-disk caches of swsg. They are located in subdirectories of
+``swsg.file_paths.CACHE_DIR`` per default. The ``CacheManager`` keeps them
+below a maximum size and age.
+
+'''
+import os
+import re
+import time
+import errno
+import socket
+from collections import namedtuple
+from operator import attrgetter
+from ConfigParser import RawConfigParser
+
+from swsg.file_paths import CACHE_DIR, GLOBAL_CONFIGFILE
+from swsg.loggers import swsg_logger as logger
+
+
+class BaseCacheBackend(object):
+    '''The interface of the storages of caches. Keys are hex digests, values
+    are byte strings. ``put`` must be atomic: a value is stored completely or
+    not at all, so other processes (or machines) never see a partially
+    written value.
+
+    '''
+    def get(self, key):
+        'return the value of ``key`` or ``None`` if it is not cached'
+        raise NotImplementedError
+
+    def put(self, key, value):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class DirectoryCache(BaseCacheBackend):
+    '''A cache which stores every value (a byte string) in a file named by its
+    key, which is usually a hex digest. Values are written into temporary
+    files which are renamed afterwards, so concurrent readers never see a
+    partially written value and concurrent writers do not interfere. The
+    directory may be on a shared file system.
+
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+
+    @classmethod
+    def by_name(cls, name):
+        'return the cache ``name`` in the default cache directory'
+        return cls(os.path.join(CACHE_DIR, name))
+
+    def path(self, key):
+        # spread the files over subdirectories to keep the directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        'return the value of ``key`` or ``None`` if it is not cached'
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fp:
+                value = fp.read()
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        # the modification time records the last access for evicting the
+        # least recently used values (the access time is not reliable,
+        # because file systems are often mounted with "noatime")
+        try:
+            os.utime(path, None)
+        except OSError:
+            # the value was removed in the meantime or the cache is read-only
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        # the host name is part of the name of the temporary file, because
+        # processes of other machines may write to a shared directory
+        temp_path = '{0}.{1}.{2}.tmp'.format(
+            path, socket.gethostname(), os.getpid())
+        with open(temp_path, 'wb') as fp:
+            fp.write(value)
+        os.rename(temp_path, path)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+
+# a file of a cache; ``last_access`` is its modification time, which is
+# updated every time the file is read
+CacheFile = namedtuple('CacheFile', 'cache path size last_access')
+
+# temporary files of writers which crashed are removed after this many
+# seconds; younger temporary files may still be written to
+TEMPORARY_FILE_LIFETIME = 60 * 60
+
+_size_units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+_age_units = {'': 24 * 60 * 60, 'd': 24 * 60 * 60, 'h': 60 * 60, 'm': 60}
+
+
+def parse_size(value):
+    'parse a size like "500M" or "2G" and return it in bytes'
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*$', value, re.I)
+    if match is None:
+        raise ValueError('{0!r} is not a size like "500M"'.format(value))
+    number, unit = match.groups()
+    return int(float(number) * _size_units[unit.lower()])
+
+
+def parse_age(value):
+    '''parse an age like "30d", "12h" or "30m" (days if there is no unit) and
+    return it in seconds'''
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([dhm]?)\s*$', value, re.I)
+    if match is None:
+        raise ValueError('{0!r} is not an age like "30d"'.format(value))
+    number, unit = match.groups()
+    return float(number) * _age_units[unit.lower()]
+
+
+def format_size(size):
+    for unit in ('bytes', 'KiB', 'MiB'):
+        if size < 1024:
+            return '{0:.0f} {1}'.format(size, unit)
+        size /= 1024.0
+    return '{0:.1f} GiB'.format(size)
+
+
+class CacheManager(object):
+    '''Keep the caches in ``directory`` (every subdirectory is a cache) below
+    ``max_size`` bytes and remove the files which were not accessed for
+    ``max_age`` seconds. Files are evicted in the order of their last access.
+
+    Running the manager while other processes use the caches is safe:
+    values are replaced atomically, a value which is removed while it is read
+    can still be read completely, a removed value is a cache miss and
+    directories are never removed.
+
+    '''
+    def __init__(self, directory=CACHE_DIR, max_size=None, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+    @classmethod
+    def from_config(cls, directory=CACHE_DIR, filename=GLOBAL_CONFIGFILE):
+        '''Return a ``CacheManager`` whose limits are the options "max size"
+        and "max age" of the section "cache" of the configuration file
+        ``filename``.
+
+        '''
+        config = RawConfigParser()
+        config.read(filename)
+        max_size = max_age = None
+        if config.has_option('cache', 'max size'):
+            max_size = parse_size(config.get('cache', 'max size'))
+        if config.has_option('cache', 'max age'):
+            max_age = parse_age(config.get('cache', 'max age'))
+        return cls(directory, max_size, max_age)
+
+    @property
+    def has_limits(self):
+        return self.max_size is not None or self.max_age is not None
+
+    def caches(self):
+        'return the sorted names of the caches'
+        try:
+            return sorted(
+                name for name in os.listdir(self.directory)
+                if os.path.isdir(os.path.join(self.directory, name)))
+        except OSError, e:
+            if e.errno == errno.ENOENT:
+                return []
+            raise
+
+    def files(self, include_temporary_files=False):
+        'yield a ``CacheFile`` for every file of every cache'
+        for cache in self.caches():
+            cache_dir = os.path.join(self.directory, cache)
+            for directory, dirnames, filenames in os.walk(cache_dir):
+                for filename in filenames:
+                    if (filename.endswith('.tmp') and
+                        not include_temporary_files):
+                        continue
+                    path = os.path.join(directory, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError, e:
+                        # removed by another process in the meantime
+                        if e.errno == errno.ENOENT:
+                            continue
+                        raise
+                    yield CacheFile(cache, path, stat.st_size, stat.st_mtime)
+
+    def stats(self):
+        '''return a dictionary which maps the name of every cache to the
+        number of its files and their total size'''
+        stats = dict((cache, (0, 0)) for cache in self.caches())
+        for cache_file in self.files():
+            count, size = stats[cache_file.cache]
+            stats[cache_file.cache] = (count + 1, size + cache_file.size)
+        return stats
+
+    def _remove(self, cache_file):
+        try:
+            os.remove(cache_file.path)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+        return True
+
+    def collect_garbage(self, now=None):
+        '''Remove the files which are older than the maximum age and the
+        least recently used files which exceed the maximum size. Return the
+        number of removed files and the number of freed bytes.
+
+        '''
+        if now is None:
+            now = time.time()
+        removed = freed = 0
+        cache_files = []
+        for cache_file in self.files(include_temporary_files=True):
+            if cache_file.path.endswith('.tmp'):
+                expired = (
+                    now - cache_file.last_access > TEMPORARY_FILE_LIFETIME)
+            else:
+                expired = (
+                    self.max_age is not None and
+                    now - cache_file.last_access > self.max_age)
+            if expired:
+                if self._remove(cache_file):
+                    removed += 1
+                    freed += cache_file.size
+            elif not cache_file.path.endswith('.tmp'):
+                cache_files.append(cache_file)
+        if self.max_size is not None:
+            total_size = sum(cache_file.size for cache_file in cache_files)
+            cache_files.sort(key=attrgetter('last_access'))
+            for cache_file in cache_files:
+                if total_size <= self.max_size:
+                    break
+                total_size -= cache_file.size
+                if self._remove(cache_file):
+                    removed += 1
+                    freed += cache_file.size
+        logger.info('removed {0} files ({1}) from the caches in {2}'.format(
+            removed, format_size(freed), self.directory))
+        return removed, freed
+
+    def clear(self, caches=None):
+        '''Remove every file of the caches ``caches`` (all caches per
+        default). Return the number of removed files and the number of freed
+        bytes.
+
+        '''
+        removed = freed = 0
+        for cache_file in self.files(include_temporary_files=True):
+            if caches is not None and cache_file.cache not in caches:
+                continue
+            if self._remove(cache_file):
+                removed += 1
+                freed += cache_file.size
+        return removed, freed
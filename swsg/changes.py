@@ -0,0 +1,91 @@
+'''Write a manifest of the outputs which were added, modified or deleted by a
+rendering process, e.g. for purging them from a CDN or uploading only them.
+The changes are a by-product of the rendering process: an output is compared
+with the digest of its last rendering, which is recorded in the build
+manifest, and the deleted outputs are taken from the ``RenderReport``.
+
+'''
+import os
+import json
+import hashlib
+
+from swsg.loggers import swsg_logger as logger
+from swsg.stages import Stage
+
+# the version of the format of change manifests
+CHANGE_MANIFEST_VERSION = 1
+
+CHANGE_KINDS = ('added', 'modified', 'deleted')
+
+
+class ChangeManifestStage(Stage):
+    '''Write the changed outputs into the JSON file ``filename``. Paths are
+    relative to the output directory and use slashes. Every change has the
+    SHA-256 digest of the new output or, for deleted outputs, of the last
+    known output (``None`` if it is not known).
+
+    This stage has to be the last one, because it records the outputs as
+    they are written.
+
+    '''
+    name = 'changes'
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def output_name(self, project, output_path):
+        name = os.path.relpath(output_path, project.output_dir)
+        return name.replace(os.sep, '/')
+
+    def process(self, project, page):
+        state = self.get_state(project)
+        # changes which have not been written yet; they are kept in the state
+        # so resuming from a checkpoint does not lose them
+        pending = state.setdefault('pending', {})
+        name = self.output_name(project, page.output_path)
+        digest = hashlib.sha256(page.output.encode('utf-8')).hexdigest()
+        entry = page.previous_entry
+        if entry is None or entry.output_path != page.output_path:
+            pending[name] = 'added', digest
+            if entry is not None and not self.has_output(
+                    project, page.source_name, entry.output_path):
+                # the previous output of the source is not an output anymore
+                pending[self.output_name(project, entry.output_path)] = (
+                    'deleted', entry.output_digest)
+        elif entry.output_digest != digest:
+            pending[name] = 'modified', digest
+        return page.output
+
+    def has_output(self, project, source_name, output_path):
+        '''Return whether ``output_path`` is the output of another source
+        than ``source_name``.
+
+        '''
+        return any(
+            entry.output_path == output_path
+            for name, entry in project.manifest.entries.iteritems()
+            if name != source_name)
+
+    def finish(self, project, report):
+        state = self.get_state(project)
+        # the digests of deleted outputs are recorded in the build manifest,
+        # which knows them even if this stage did not see the outputs
+        pending = state.get('pending', {})
+        for output_path in report.deleted:
+            name = self.output_name(project, output_path)
+            pending[name] = 'deleted', report.deleted_digests.get(output_path)
+        changes = dict((kind, []) for kind in CHANGE_KINDS)
+        for name, (kind, digest) in sorted(pending.iteritems()):
+            changes[kind].append({'path': name, 'sha256': digest})
+        changes['version'] = CHANGE_MANIFEST_VERSION
+        temp_filename = '{0}.{1}.tmp'.format(self.filename, os.getpid())
+        with open(temp_filename, 'w') as fp:
+            json.dump(changes, fp, indent=1, sort_keys=True)
+        os.rename(temp_filename, self.filename)
+        state.pop('pending', None)
+        logger.notice(
+            'wrote the changes ({0}) into {1}'.format(
+                ', '.join(
+                    '{0} {1}'.format(len(changes[kind]), kind)
+                    for kind in CHANGE_KINDS),
+                self.filename))
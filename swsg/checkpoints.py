@@ -0,0 +1,132 @@
+'''Checkpoint the state of a long rendering process, so an interrupted
+rendering process can be resumed instead of rendering everything again. The
+build manifest is written into a checkpoint file every few outputs or
+seconds; ``Project.render`` continues from it if it is asked to resume.
+
+Outputs may be written after the checkpoint (e.g. by the background threads
+of ``swsg.pipeline.OutputWriter``), so an entry of a checkpoint is only used
+if the output on disk has the digest which was recorded in the entry.
+
+'''
+import os
+import time
+import errno
+import cPickle as pickle
+
+from swsg.loggers import swsg_logger as logger
+from swsg.utils import hash_file
+
+# change this value if the content of checkpoint files changes
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint(object):
+    '''Write the state of a rendering process into ``filename`` after every
+    ``every`` outputs or every ``interval`` seconds, whichever comes first.
+
+    '''
+    def __init__(self, filename, every=100, interval=60.0):
+        self.filename = filename
+        self.every = every
+        self.interval = interval
+        self.outputs = 0
+        self.last_save = time.time()
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.filename)
+
+    def output_written(self):
+        '''Count an output which has been yielded. Return whether a checkpoint
+        is due.
+
+        '''
+        self.outputs += 1
+        return (
+            (self.every is not None and self.outputs >= self.every) or
+            (self.interval is not None and
+             time.time() - self.last_save >= self.interval))
+
+    def save(self, project, report):
+        '''Write the build manifest of ``project`` and the outputs which have
+        been rendered so far (from the ``swsg.manifest.RenderReport``
+        ``report``) atomically into the checkpoint file.
+
+        '''
+        temp_filename = '{0}.{1}.tmp'.format(self.filename, os.getpid())
+        with open(temp_filename, 'wb') as fp:
+            pickle.dump({
+                'version': CHECKPOINT_VERSION,
+                'manifest': project.manifest,
+                'rendered': report.rendered}, fp, pickle.HIGHEST_PROTOCOL)
+            # the checkpoint must be on the disk before it replaces the old one
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.rename(temp_filename, self.filename)
+        logger.info('checkpointed {0} rendered outputs in {1}'.format(
+            len(report.rendered), self.filename))
+        self.outputs = 0
+        self.last_save = time.time()
+
+    def load(self):
+        'return the content of the checkpoint file or ``None``'
+        try:
+            with open(self.filename, 'rb') as fp:
+                data = pickle.load(fp)
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        except (pickle.UnpicklingError, EOFError, AttributeError), e:
+            logger.warning('ignoring the broken checkpoint {0}: {1}'.format(
+                self.filename, e))
+            return None
+        if data.get('version') != CHECKPOINT_VERSION:
+            return None
+        return data
+
+    def restore(self, project, report):
+        '''Take the entries of the checkpoint file whose outputs exist into the
+        build manifest of ``project`` and add their outputs to the
+        ``swsg.manifest.RenderReport`` ``report``. Return the number of
+        restored entries.
+
+        '''
+        data = self.load()
+        if data is None:
+            logger.notice('there is no checkpoint to resume from')
+            return 0
+        manifest = project.manifest
+        checkpointed_manifest = data['manifest']
+        rendered = frozenset(data['rendered'])
+        restored = 0
+        for source_name, entry in checkpointed_manifest.entries.iteritems():
+            current_entry = manifest.entries.get(source_name)
+            if (current_entry is not None and
+                vars(current_entry) == vars(entry)):
+                continue
+            try:
+                output_digest = hash_file(entry.output_path)
+            except IOError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            if output_digest != entry.output_digest:
+                # the output was not written before the interruption
+                continue
+            manifest.entries[source_name] = entry
+            restored += 1
+            if entry.output_path in rendered:
+                report.rendered.append(entry.output_path)
+        manifest.stamps.update(checkpointed_manifest.stamps)
+        manifest.stage_data = checkpointed_manifest.stage_data
+        logger.notice('resuming from {0} with {1} restored outputs'.format(
+            self.filename, restored))
+        return restored
+
+    def remove(self):
+        'remove the checkpoint file after the rendering process finished'
+        try:
+            os.remove(self.filename)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
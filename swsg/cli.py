@@ -3,21 +3,33 @@
 from __future__ import print_function
 
 import sys
-import codecs
+import json
 from os import makedirs, path, getcwd, name as operating_system
 from itertools import imap, izip
 from operator import itemgetter
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from texttable import Texttable
 from py.io import TerminalWriter
 from logbook import FileHandler, INFO, DEBUG
 
 from swsg import __version__
 from swsg.loggers import swsg_logger as logger
-from swsg.file_paths import LOGFILE as DEFAULT_LOGFILE
+from swsg.file_paths import LOGFILE as DEFAULT_LOGFILE, CACHE_DIR
+from swsg.archives import OutputArchive, archive_format
+from swsg.builds import get_render_stages, render_projects, select_projects
+from swsg.changes import ChangeManifestStage
+from swsg.caches import CacheManager, format_size, parse_age, parse_size
+from swsg.importer import ImportConflict, import_files
+from swsg.links import LinkChecker
+from swsg.checkpoints import Checkpoint
+from swsg.output_cache import OutputCache
 from swsg.projects import (DEFAULT_SETTINGS, NonexistingProject, Project,
     list_project_instances, get_project_by_path, remove_project)
+from swsg.pipeline import OutputWriter, write_output
+from swsg.sharding import (dump_partial_manifest, merge_partial_manifests,
+    parse_shard)
+from swsg.server import PreviewServer
 from swsg.sources import SUPPORTED_MARKUP_LANGUAGES
 from swsg.templates import SUPPORTED_TEMPLATE_ENGINES
 from swsg.utils import is_none
@@ -153,12 +165,277 @@ def change_config(args):
         template_language=args.template_language)
 
 
+def format_render_plan(plan):
+    lines = []
+    for action in ('rebuild', 'delete', 'keep'):
+        for source_name, output_path, reason in getattr(plan, action):
+            lines.append('{0:<8}{1} ({2})'.format(action, output_path, reason))
+    lines.append('{0} to rebuild, {1} to delete, {2} to keep'.format(
+        len(plan.rebuild), len(plan.delete), len(plan.keep)))
+    return '\n'.join(lines)
+
+
+def print_render_plan(project, as_json=False, shard=None):
+    plan = project.plan(shard)
+    if as_json:
+        print(json.dumps(plan.as_dict(), indent=2))
+    else:
+        print(format_render_plan(plan))
+
+
+def get_checkpoint(project, args):
+    if args.shard is None:
+        filename = '.checkpoint'
+    else:
+        filename = '.checkpoint-{0}-of-{1}'.format(*args.shard)
+    return Checkpoint(
+        path.join(project.project_dir, filename), args.checkpoint_every,
+        args.checkpoint_interval)
+
+
+def shard_argument(value):
+    try:
+        return parse_shard(value)
+    except ValueError, e:
+        raise ArgumentTypeError(str(e))
+
+
+def archive_argument(value):
+    try:
+        archive_format(value)
+    except ValueError, e:
+        raise ArgumentTypeError(str(e))
+    return value
+
+
+def get_partial_manifest_filename(project, args):
+    if args.manifest is not None:
+        return args.manifest
+    return path.join(
+        project.project_dir,
+        'manifest-{0}-of-{1}.json'.format(*args.shard))
+
+
+def format_project_results(results):
+    terminal_writer = TerminalWriter()
+    table = Texttable(max_width=terminal_writer.fullwidth)
+    table.header(['Name', 'Rendered', 'Deleted', 'Seconds', 'Result'])
+    for result in results:
+        table.add_row([
+            result.name, result.rendered, result.deleted,
+            '{0:.1f}'.format(result.duration),
+            'ok' if result.error is None else 'failed'])
+    return table.draw()
+
+
+def render_all(args):
+    for option in (
+            'plan', 'shard', 'resume', 'manifest', 'archive', 'changes'):
+        if getattr(args, option):
+            print(
+                'Error: the option "--{0}" cannot be combined with '
+                '"--all"'.format(option),
+                file=sys.stderr)
+            sys.exit(2)
+    projects = select_projects(list_project_instances(), args.projects)
+    if not projects:
+        print('no project matches', file=sys.stderr)
+        sys.exit(1)
+    results = []
+    for result in render_projects(
+            projects, args.processes, args.output_cache):
+        if result.error is not None:
+            print(
+                'rendering the project {0} failed:\n{1}'.format(
+                    result.name, result.error),
+                file=sys.stderr)
+        results.append(result)
+    print(format_project_results(results))
+    if any(result.error is not None for result in results):
+        sys.exit(1)
+
+
 def render(args):
+    if args.all:
+        render_all(args)
+        return
+    if args.projects:
+        print(
+            'Error: the option "--project" requires the option "--all"',
+            file=sys.stderr)
+        sys.exit(2)
+    # the project's directory is the current working directory
+    project = get_project_by_path(getcwd(), look_at_parent_dir=True)
+    if args.plan:
+        print_render_plan(project, args.json, args.shard)
+        return
+    if args.delta and args.archive is None:
+        print(
+            'Error: the option "--delta" requires the option "--archive"',
+            file=sys.stderr)
+        sys.exit(2)
+    stages = get_render_stages(project, args.shard)
+    if args.changes is not None:
+        # the changes are recorded after every other stage changed the outputs
+        stages.append(ChangeManifestStage(args.changes))
+    output_cache = None
+    if args.output_cache is not None:
+        output_cache = OutputCache.from_directory(args.output_cache)
+    checkpoint = get_checkpoint(project, args)
+    archive = None
+    if args.archive is not None:
+        archive = OutputArchive(project, args.archive, args.delta)
+    options = dict(
+        stages=stages, shard=args.shard, output_cache=output_cache,
+        checkpoint=checkpoint, resume=args.resume, jobs=args.processes or 1)
+    if args.io_threads > 0:
+        # read sources and write outputs in background threads while the
+        # current source is being rendered
+        with OutputWriter(args.io_threads, 2 * args.io_threads) as writer:
+            # the project must not be saved before every output is written
+            for output_path, output in project.render(
+                    prefetch=2 * args.io_threads, save=False, **options):
+                writer.write(output_path, output)
+                if archive is not None:
+                    archive.add(output_path, output)
+        if args.shard is None:
+            project.update_projects_file()
+            checkpoint.remove()
+    else:
+        for output_path, output in project.render(**options):
+            write_output(output_path, output)
+            if archive is not None:
+                archive.add(output_path, output)
+    if archive is not None:
+        count = archive.write()
+        print('wrote {0} files into the archive {1}'.format(
+            count, args.archive))
+    if output_cache is not None:
+        logger.notice('{0} outputs were taken from the cache, {1} were '
+            'rendered'.format(output_cache.hits, output_cache.misses))
+    # keep the caches within the limits of the global configuration file
+    cache_manager = CacheManager.from_config()
+    if cache_manager.has_limits:
+        cache_manager.collect_garbage()
+    if args.shard is not None:
+        filename = get_partial_manifest_filename(project, args)
+        with open(filename, 'w') as fp:
+            dump_partial_manifest(project, args.shard, fp)
+        checkpoint.remove()
+        print('wrote the partial manifest {0}'.format(filename))
+
+
+def merge_manifests(args):
+    # the project's directory is the current working directory
+    project = get_project_by_path(getcwd(), look_at_parent_dir=True)
+    shards = merge_partial_manifests(project, args.manifests)
+    count = shards[0].count
+    missing_shards = sorted(
+        set(xrange(1, count + 1)) - set(index for index, _ in shards))
+    if missing_shards:
+        print(
+            'Warning: the partial manifests of the shards {0} are '
+            'missing'.format(', '.join(
+                '{0}/{1}'.format(index, count) for index in missing_shards)),
+            file=sys.stderr)
+    site_wide_stages = [
+        stage.name for stage in get_render_stages(project) if stage.site_wide]
+    if site_wide_stages:
+        print(
+            'the merged outputs are passed to the stages {0} by the next '
+            '"swsg render" of the whole project'.format(
+                ', '.join(site_wide_stages)))
+
+
+def check_links(args):
     # the project's directory is the current working directory
     project = get_project_by_path(getcwd(), look_at_parent_dir=True)
-    for output_path, output in project.render():
-        with codecs.open(output_path, 'w', 'utf-8') as fp:
-            fp.write(output)
+    checker = LinkChecker(project, args.processes)
+    broken_links = checker.check()
+    for page, url, reason in broken_links:
+        print('{0}: {1} ({2})'.format(
+            path.relpath(page, project.output_dir), url, reason))
+    if broken_links:
+        sys.exit(1)
+
+
+def import_(args):
+    # the project's directory is the current working directory
+    project = get_project_by_path(getcwd(), look_at_parent_dir=True)
+    try:
+        names = import_files(project, args.path, args.templates)
+    except (ValueError, ImportConflict), e:
+        print('Error: {0}'.format(e), file=sys.stderr)
+        sys.exit(2)
+    print('imported {0} {1}'.format(
+        len(names), 'templates' if args.templates else 'sources'))
+
+
+def get_cache_manager(args):
+    cache_manager = CacheManager.from_config(args.directory)
+    if getattr(args, 'max_size', None) is not None:
+        cache_manager.max_size = args.max_size
+    if getattr(args, 'max_age', None) is not None:
+        cache_manager.max_age = args.max_age
+    return cache_manager
+
+
+def print_cache_stats(args):
+    cache_manager = get_cache_manager(args)
+    stats = cache_manager.stats()
+    if not stats:
+        print('no cache in {0}'.format(cache_manager.directory))
+        return
+    terminal_writer = TerminalWriter()
+    table = Texttable(max_width=terminal_writer.fullwidth)
+    table.header(['Cache', 'Files', 'Size'])
+    for cache, (count, size) in sorted(stats.iteritems()):
+        table.add_row([cache, count, format_size(size)])
+    total_count = sum(count for count, _ in stats.itervalues())
+    total_size = sum(size for _, size in stats.itervalues())
+    table.add_row(['total', total_count, format_size(total_size)])
+    print(table.draw())
+
+
+def collect_cache_garbage(args):
+    cache_manager = get_cache_manager(args)
+    if not cache_manager.has_limits:
+        print(
+            'Error: neither a maximum size nor a maximum age was given',
+            file=sys.stderr)
+        sys.exit(2)
+    removed, freed = cache_manager.collect_garbage()
+    print('removed {0} files ({1})'.format(removed, format_size(freed)))
+
+
+def clear_caches(args):
+    cache_manager = get_cache_manager(args)
+    removed, freed = cache_manager.clear(args.caches or None)
+    print('removed {0} files ({1})'.format(removed, format_size(freed)))
+
+
+def cache_argument(function):
+    def convert(value):
+        try:
+            return function(value)
+        except ValueError, e:
+            raise ArgumentTypeError(str(e))
+    convert.__name__ = function.__name__
+    return convert
+
+
+def serve(args):
+    # the project's directory is the current working directory
+    project = get_project_by_path(getcwd(), look_at_parent_dir=True)
+    server = PreviewServer(project, args.host, args.port)
+    print('serving the project {0!r} on http://{1}:{2}/'.format(
+        project.name, args.host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 def parse_args(argv=sys.argv[1:]):
@@ -223,7 +500,185 @@ def parse_args(argv=sys.argv[1:]):
         help=(
             'Render the templates with their corresponding source files which '
             'are located in the current project directory.'))
+    render_parser.add_argument(
+        '--plan', action='store_true',
+        help=(
+            'Do not render anything, but print which outputs would be '
+            'rebuilt, deleted or kept.'))
+    render_parser.add_argument(
+        '--json', action='store_true',
+        help='Print the plan of the option "--plan" in the JSON format.')
+    render_parser.add_argument(
+        '--io-threads', type=int, default=0, metavar='N',
+        help=(
+            'Read sources and write outputs in N background threads while '
+            'rendering (disabled per default). This speeds up rendering '
+            'projects which are located on slow file systems like NFS.'))
+    render_parser.add_argument(
+        '-j', '--processes', type=int, default=None, metavar='N',
+        help=(
+            'Render the sources in N processes (default: 1). The sources '
+            'which took longest to render the last time are started first. '
+            'With the option "--all", N projects are rendered at the same '
+            'time (default: the number of CPUs).'))
+    render_parser.add_argument(
+        '--all', action='store_true',
+        help=(
+            'Render every project of the projects file instead of the '
+            'project in the current working directory. A project which fails '
+            'does not stop the other projects from being rendered.'))
+    render_parser.add_argument(
+        '--project', action='append', dest='projects', default=[],
+        metavar='PATTERN',
+        help=(
+            'Render only the projects whose names or directories match the '
+            'shell-style pattern PATTERN with the option "--all" (may be '
+            'given several times).'))
+    render_parser.add_argument(
+        '--resume', action='store_true',
+        help=(
+            'Continue an interrupted rendering process from its last '
+            'checkpoint instead of rendering its outputs again.'))
+    render_parser.add_argument(
+        '--checkpoint-every', type=int, default=100, metavar='N',
+        help=(
+            'Checkpoint the state of the rendering process after every N '
+            'outputs (default: 100).'))
+    render_parser.add_argument(
+        '--checkpoint-interval', type=float, default=60.0,
+        metavar='SECONDS',
+        help=(
+            'Checkpoint the state of the rendering process at least every '
+            'SECONDS seconds (default: 60).'))
+    render_parser.add_argument(
+        '--output-cache', metavar='DIRECTORY',
+        help=(
+            'Look up the outputs in the directory DIRECTORY before rendering '
+            'them and store the rendered outputs there. The directory may be '
+            'shared by several checkouts of the project, e.g. by CI agents '
+            'on a shared file system.'))
+    render_parser.add_argument(
+        '--archive', type=archive_argument, metavar='FILE',
+        help=(
+            'Write the outputs into the archive FILE for deploying them '
+            '(.tar, .tar.gz, .tgz, .tar.bz2 or .zip). Rendered outputs are '
+            'spooled while rendering instead of being read from the output '
+            'directory again; the members are sorted and have the same '
+            'modification time.'))
+    render_parser.add_argument(
+        '--delta', action='store_true',
+        help=(
+            'Write only the outputs whose content changed into the archive of '
+            'the option "--archive".'))
+    render_parser.add_argument(
+        '--changes', metavar='FILE',
+        help=(
+            'Write the paths and SHA-256 digests of the outputs which were '
+            'added, modified or deleted into the JSON file FILE, e.g. for '
+            'purging them from a CDN.'))
+    render_parser.add_argument(
+        '--shard', type=shard_argument, metavar='K/N',
+        help=(
+            'Render only the K-th of N shards of the sources and write a '
+            'partial build manifest instead of updating the project. The '
+            'partial manifests of all shards are combined by the command '
+            '"merge-manifests".'))
+    render_parser.add_argument(
+        '--manifest', metavar='FILE',
+        help=(
+            'The file where the partial manifest of the option "--shard" is '
+            'written to (default: manifest-K-of-N.json in the project '
+            'directory).'))
     render_parser.set_defaults(func=render)
+    merge_parser = subparsers.add_parser(
+        'merge-manifests',
+        help=(
+            'Merge the partial build manifests of a sharded rendering '
+            'process into the project.'))
+    merge_parser.add_argument(
+        'manifests', nargs='+', metavar='FILE',
+        help='The partial manifests written by "render --shard".')
+    merge_parser.set_defaults(func=merge_manifests)
+    cache_parser = subparsers.add_parser(
+        'cache',
+        help=(
+            'Show the sizes of the caches of swsg, remove old files from them '
+            'or clear them.'))
+    cache_subparsers = cache_parser.add_subparsers()
+    cache_stats_parser = cache_subparsers.add_parser(
+        'stats', help='Show the number of files and the size of every cache.')
+    cache_stats_parser.set_defaults(func=print_cache_stats)
+    cache_gc_parser = cache_subparsers.add_parser(
+        'gc',
+        help=(
+            'Remove the files which were not used for longer than the maximum '
+            'age and the least recently used files which exceed the maximum '
+            'size. The limits are read from the section "cache" (options '
+            '"max size" and "max age") of the global configuration file. '
+            'This is safe while rendering.'))
+    cache_gc_parser.add_argument(
+        '--max-size', type=cache_argument(parse_size), metavar='SIZE',
+        help='The maximum size of all caches, e.g. 500M or 2G.')
+    cache_gc_parser.add_argument(
+        '--max-age', type=cache_argument(parse_age), metavar='AGE',
+        help=(
+            'The maximum time since the last use of a file, e.g. 30d or 12h '
+            '(days if there is no unit).'))
+    cache_gc_parser.set_defaults(func=collect_cache_garbage)
+    cache_clear_parser = cache_subparsers.add_parser(
+        'clear', help='Remove every file of the given caches (default: all).')
+    cache_clear_parser.add_argument(
+        'caches', nargs='*', metavar='CACHE',
+        help='The names of the caches as shown by "cache stats".')
+    cache_clear_parser.set_defaults(func=clear_caches)
+    for parser_ in (cache_stats_parser, cache_gc_parser, cache_clear_parser):
+        parser_.add_argument(
+            '--directory', default=CACHE_DIR,
+            help=(
+                'The directory of the caches (default: {0}). Every '
+                'subdirectory is a cache, so the directory of the option '
+                '"render --output-cache" can be given as well.'.format(
+                    CACHE_DIR)))
+    check_links_parser = subparsers.add_parser(
+        'check-links',
+        help=(
+            'Check that the internal links of the rendered outputs point to '
+            'existing files and anchors. Only outputs which changed since the '
+            'last check are parsed again.'))
+    check_links_parser.add_argument(
+        '-j', '--processes', type=int, default=None, metavar='N',
+        help=(
+            'The number of processes which parse the outputs (default: the '
+            'number of CPUs).'))
+    check_links_parser.set_defaults(func=check_links)
+    import_parser = subparsers.add_parser(
+        'import',
+        help=(
+            'Copy the sources of a directory or of a tar or zip archive into '
+            'the project in the current working directory. The projects file '
+            'is updated only once.'))
+    import_parser.add_argument(
+        'path', metavar='DIRECTORY|ARCHIVE',
+        help=(
+            'The directory or archive. Files in subdirectories are imported '
+            'by their names, files which are not sources are skipped.'))
+    import_parser.add_argument(
+        '--templates', action='store_true',
+        help='Import the files as templates instead of sources.')
+    import_parser.set_defaults(func=import_)
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help=(
+            'Serve the project on a local HTTP port for previewing it. Pages '
+            'are rendered when they are requested and cached until their '
+            'source, template or the configuration changes.'))
+    serve_parser.add_argument(
+        '--host', default='localhost',
+        help='The host name to listen on (default: localhost).')
+    serve_parser.add_argument(
+        '-p', '--port', type=int, default=8000,
+        help='The port to listen on (default: 8000).')
+    serve_parser.set_defaults(func=serve)
     return parser.parse_args(argv)
 
 
@@ -0,0 +1,179 @@
+'''Write precompressed variants of the rendered outputs (``.gz`` and ``.br``
+files next to them) for web servers which can serve them directly. Only the
+outputs which were rendered are compressed, in a pool of processes, unless
+the formats or levels changed since the last rendering process.
+
+'''
+import os
+import gzip
+import hashlib
+import multiprocessing
+from io import BytesIO
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from swsg import NoninstalledPackage
+from swsg.loggers import swsg_logger as logger
+from swsg.stages import Stage
+
+SUPPORTED_FORMATS = frozenset(['gzip', 'brotli'])
+FILENAME_EXTENSIONS = {'gzip': '.gz', 'brotli': '.br'}
+
+
+def compress(data, format, level):
+    if format == 'gzip':
+        buffer_ = BytesIO()
+        # a constant mtime makes the output reproducible
+        with gzip.GzipFile(
+                fileobj=buffer_, mode='wb', compresslevel=level,
+                mtime=0) as fp:
+            fp.write(data)
+        return buffer_.getvalue()
+    elif format == 'brotli':
+        return brotli.compress(data, quality=level)
+    raise ValueError('unsupported compression format {0!r}'.format(format))
+
+
+def write_compressed_files(output_path, data, levels):
+    '''Write a compressed variant of ``data`` for every format of ``levels``,
+    a dictionary which maps formats to compression levels. This function is
+    called in the worker processes.
+
+    '''
+    for format, level in levels.iteritems():
+        filename = output_path + FILENAME_EXTENSIONS[format]
+        temp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+        with open(temp_filename, 'wb') as fp:
+            fp.write(compress(data, format, level))
+        os.rename(temp_filename, filename)
+    return output_path
+
+
+class CompressionStage(Stage):
+    '''Compress every rendered output in ``processes`` worker processes (the
+    number of CPUs per default). ``levels`` maps the formats "gzip" and
+    "brotli" to their compression levels.
+
+    '''
+    name = 'compression'
+
+    def __init__(self, levels=None, processes=None):
+        if levels is None:
+            levels = {'gzip': 9}
+        for format in levels:
+            if format not in SUPPORTED_FORMATS:
+                raise ValueError(
+                    '{0} is not a supported compression format; possible '
+                    'valid values are: {1}'.format(
+                        format, ', '.join(sorted(SUPPORTED_FORMATS))))
+        if 'brotli' in levels and brotli is None:
+            raise NoninstalledPackage('brotli')
+        self.levels = levels
+        self.processes = processes
+        self.pool = None
+        self.results = []
+        # the paths of the outputs which were processed by the current
+        # rendering process
+        self.processed = set()
+
+    @classmethod
+    def from_config(cls, config):
+        '''Return a ``CompressionStage`` configured by the section
+        "compression" of the project's configuration or ``None`` if there is
+        no such section. The option "formats" is a comma-separated list of
+        formats, the options "gzip level" and "brotli level" are their
+        compression levels.
+
+        '''
+        if not config.has_section('compression'):
+            return None
+        options = dict(config.items('compression'))
+        formats = [
+            format.strip()
+            for format in options.get('formats', 'gzip').split(',')
+            if format.strip()]
+        default_levels = {'gzip': 9, 'brotli': 11}
+        levels = dict(
+            (format, int(options.get(
+                '{0} level'.format(format), default_levels.get(format, 0))))
+            for format in formats)
+        return cls(levels)
+
+    def sidecars(self, output_path):
+        return [
+            output_path + FILENAME_EXTENSIONS[format]
+            for format in self.levels]
+
+    def levels_changed(self, project):
+        '''Return whether the compressed files were written with other
+        formats or levels than the current ones.
+
+        '''
+        return self.get_state(project).get('levels') != self.levels
+
+    def process(self, project, page):
+        self.processed.add(page.output_path)
+        data = page.output.encode('utf-8')
+        entry = page.previous_entry
+        if (entry is not None and
+            entry.output_digest == hashlib.sha256(data).hexdigest() and
+            not self.levels_changed(project) and
+            all(os.path.exists(path)
+                for path in self.sidecars(page.output_path))):
+            # the output did not change, so its compressed files are still
+            # up to date
+            return page.output
+        self.compress(page.output_path, data)
+        return page.output
+
+    def compress(self, output_path, data):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes)
+        self.results.append(self.pool.apply_async(
+            write_compressed_files, (output_path, data, self.levels)))
+
+    def wait(self):
+        'wait until the outputs which have been processed are compressed'
+        try:
+            for result in self.results:
+                logger.info('compressed the output {0}'.format(result.get()))
+        finally:
+            self.results = []
+
+    def checkpoint(self, project):
+        self.wait()
+
+    def finish(self, project, report):
+        if self.levels_changed(project):
+            # the outputs which were not rendered again are compressed with
+            # the current levels as well
+            for output_path in sorted(project.manifest.outputs):
+                self.remove_stale_files(output_path, self.levels)
+                if (output_path not in self.processed and
+                    os.path.exists(output_path)):
+                    with open(output_path, 'rb') as fp:
+                        self.compress(output_path, fp.read())
+        self.processed = set()
+        if self.pool is not None:
+            self.pool.close()
+            try:
+                self.wait()
+            finally:
+                self.pool.join()
+                self.pool = None
+        self.get_state(project)['levels'] = dict(self.levels)
+        for output_path in report.deleted:
+            self.remove_stale_files(output_path)
+
+    def remove_stale_files(self, output_path, levels=()):
+        '''Remove the compressed files of ``output_path`` whose formats are
+        not in ``levels``.
+
+        '''
+        for format, extension in FILENAME_EXTENSIONS.iteritems():
+            filename = output_path + extension
+            if format not in levels and os.path.exists(filename):
+                logger.info('removing the stale file {0}'.format(filename))
+                os.remove(filename)
@@ -0,0 +1,97 @@
+'''Immutable snapshots of configuration files. A snapshot is taken by reading
+the file once; the digest of its content is calculated from the same buffer.
+Whether a snapshot is still current is checked by the stat information of the
+file, so it is only read and parsed again if it was changed.
+
+Snapshots are small and can be pickled, so they are passed to worker
+processes together with their project instead of being read again there.
+
+'''
+import os
+from io import BytesIO
+from collections import OrderedDict
+from ConfigParser import NoOptionError, NoSectionError, RawConfigParser
+
+from swsg.utils import read_file
+
+
+class ConfigSnapshot(object):
+    '''The sections and options of the configuration file ``filename`` at the
+    time described by the ``swsg.utils.FileStamp`` ``stamp``. The read-only
+    methods of ``ConfigParser.RawConfigParser`` are supported.
+
+    '''
+    def __init__(self, filename, stamp, sections):
+        self.filename = filename
+        self.stamp = stamp
+        # key is the name of a section, value is an ``OrderedDict`` of its
+        # options and their values
+        self._sections = sections
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.filename)
+
+    @classmethod
+    def read(cls, filename):
+        'read and parse ``filename`` and return its snapshot'
+        data, stamp = read_file(filename)
+        parser = RawConfigParser(dict_type=OrderedDict)
+        parser.readfp(BytesIO(data), filename)
+        sections = OrderedDict(
+            (section, OrderedDict(parser.items(section)))
+            for section in parser.sections())
+        return cls(filename, stamp, sections)
+
+    @property
+    def digest(self):
+        'the SHA-256 hex digest of the content of the configuration file'
+        return self.stamp.digest
+
+    def is_current(self):
+        '''Return whether the configuration file still has the modification
+        time and size it had when the snapshot was taken.
+
+        '''
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return False
+        return (stat.st_mtime, stat.st_size) == (
+            self.stamp.mtime, self.stamp.size)
+
+    def sections(self):
+        return list(self._sections)
+
+    def has_section(self, section):
+        return section in self._sections
+
+    def has_option(self, section, option):
+        # option names are case-insensitive like in ``RawConfigParser``
+        return option.lower() in self._sections.get(section, ())
+
+    def get(self, section, option):
+        try:
+            options = self._sections[section]
+        except KeyError:
+            raise NoSectionError(section)
+        try:
+            return options[option.lower()]
+        except KeyError:
+            raise NoOptionError(option, section)
+
+    def items(self, section):
+        try:
+            return self._sections[section].items()
+        except KeyError:
+            raise NoSectionError(section)
+
+    def update_parser(self, parser):
+        '''Set the options of the snapshot in the ``RawConfigParser``
+        ``parser``, like reading the file with ``parser.readfp`` would do.
+
+        '''
+        for section, options in self._sections.iteritems():
+            if not parser.has_section(section):
+                parser.add_section(section)
+            for option, value in options.iteritems():
+                parser.set(section, option, value)
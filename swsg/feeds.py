@@ -0,0 +1,140 @@
+'''Generate an Atom feed and a sitemap.xml of a project while rendering it.
+The entries of both files are derived from the source index and the build
+manifest, and the feed entry of a page is only computed again if the page was
+rendered. The files are streamed to disk instead of being built in memory.
+
+'''
+import os
+import heapq
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from swsg.loggers import swsg_logger as logger
+from swsg.stages import Stage
+from swsg.utils import html_to_text, write_atomically
+
+# the number of characters of the content of a page which is used as the
+# summary of its feed entry
+SUMMARY_LENGTH = 200
+
+
+def format_timestamp(timestamp):
+    'format a timestamp (seconds since the epoch) as required by Atom'
+    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FeedEntry(object):
+    def __init__(self, title, summary):
+        self.title = title
+        self.summary = summary
+
+
+class FeedStage(Stage):
+    '''Write the Atom feed ``feed_filename`` with the ``max_entries`` most
+    recently changed pages and the sitemap ``sitemap_filename`` with all
+    pages into the output directory. ``base_url`` is the URL the output
+    directory is published at.
+
+    '''
+    name = 'feeds'
+    site_wide = True
+
+    def __init__(self, base_url, title=u'', max_entries=20,
+                 feed_filename='atom.xml', sitemap_filename='sitemap.xml'):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.title = title
+        self.max_entries = max_entries
+        self.feed_filename = feed_filename
+        self.sitemap_filename = sitemap_filename
+        # whether a page was processed since the feed was written
+        self.processed = False
+
+    @classmethod
+    def from_config(cls, config):
+        '''Return a ``FeedStage`` configured by the section "feeds" of the
+        project's configuration or ``None`` if it has no option "base url".
+
+        '''
+        if not config.has_option('feeds', 'base url'):
+            return None
+        options = dict(config.items('feeds'))
+        return cls(
+            options['base url'], options.get('title', u''),
+            int(options.get('entries', 20)))
+
+    def url(self, output_path):
+        return self.base_url + os.path.basename(output_path)
+
+    def process(self, project, page):
+        summary = html_to_text(page.source.namespace['content'])
+        self.get_state(project)[page.source_name] = FeedEntry(
+            page.source.title, summary[:SUMMARY_LENGTH])
+        self.processed = True
+        return page.output
+
+    def finish(self, project, report):
+        state = self.get_state(project)
+        entries = project.manifest.entries
+        for source_name in set(state).difference(entries):
+            del state[source_name]
+        feed_path = os.path.join(project.output_dir, self.feed_filename)
+        sitemap_path = os.path.join(project.output_dir, self.sitemap_filename)
+        if (not (self.processed or report.rendered or report.deleted) and
+            os.path.exists(feed_path) and os.path.exists(sitemap_path)):
+            return
+        self.processed = False
+        logger.info('writing the feed {0}'.format(feed_path))
+        write_atomically(feed_path, self.generate_feed(project))
+        logger.info('writing the sitemap {0}'.format(sitemap_path))
+        write_atomically(sitemap_path, self.generate_sitemap(project))
+
+    def generate_feed(self, project):
+        entries = project.manifest.entries
+        state = self.get_state(project)
+        newest = heapq.nlargest(
+            self.max_entries, entries,
+            key=lambda source_name: entries[source_name].modified or 0)
+        updated = entries[newest[0]].modified if newest else None
+        yield u'<?xml version="1.0" encoding="utf-8"?>\n'
+        yield u'<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        yield u'  <title>{0}</title>\n'.format(escape(self.title))
+        yield u'  <id>{0}</id>\n'.format(escape(self.base_url))
+        yield u'  <link href={0}/>\n'.format(quoteattr(self.base_url))
+        yield u'  <updated>{0}</updated>\n'.format(
+            format_timestamp(updated or 0))
+        for source_name in newest:
+            entry = entries[source_name]
+            feed_entry = state.get(source_name)
+            if feed_entry is None:
+                # the page has not been rendered since the feed was enabled
+                metadata = project.source_index.get(source_name)
+                feed_entry = FeedEntry(
+                    metadata.title if metadata else u'', u'')
+            url = self.url(entry.output_path)
+            yield u'  <entry>\n'
+            yield u'    <title>{0}</title>\n'.format(escape(feed_entry.title))
+            yield u'    <id>{0}</id>\n'.format(escape(url))
+            yield u'    <link href={0}/>\n'.format(quoteattr(url))
+            yield u'    <updated>{0}</updated>\n'.format(
+                format_timestamp(entry.modified or 0))
+            if feed_entry.summary:
+                yield u'    <summary>{0}</summary>\n'.format(
+                    escape(feed_entry.summary))
+            yield u'  </entry>\n'
+        yield u'</feed>\n'
+
+    def generate_sitemap(self, project):
+        entries = project.manifest.entries
+        yield u'<?xml version="1.0" encoding="utf-8"?>\n'
+        yield u'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for metadata in project.source_index:
+            entry = entries.get(metadata.name)
+            if entry is None:
+                continue
+            yield u'  <url><loc>{0}</loc>'.format(
+                escape(self.url(metadata.output_path)))
+            if entry.modified is not None:
+                yield u'<lastmod>{0}</lastmod>'.format(
+                    format_timestamp(entry.modified))
+            yield u'</url>\n'
+        yield u'</urlset>\n'
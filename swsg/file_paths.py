@@ -4,7 +4,10 @@ XDG_DATA_HOME = getenv(
     'XDG_DATA_HOME', path.expanduser(path.join('~', '.local', 'share')))
 XDG_CONFIG_HOME = getenv(
     'XDG_CONFIG_HOME', path.expanduser(path.join('~', '.config')))
+XDG_CACHE_HOME = getenv(
+    'XDG_CACHE_HOME', path.expanduser(path.join('~', '.cache')))
 GLOBAL_CONFIGFILE = path.join(XDG_CONFIG_HOME, 'swsg')
 PROJECT_DATA_DIR = path.join(XDG_DATA_HOME, 'swsg')
 LOGFILE = path.join(PROJECT_DATA_DIR, 'swsg.log')
 DEFAULT_PROJECTS_FILE_NAME = path.join(PROJECT_DATA_DIR, 'projects.shelve')
+CACHE_DIR = path.join(XDG_CACHE_HOME, 'swsg')
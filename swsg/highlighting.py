@@ -0,0 +1,207 @@
+'''Syntax highlighting of code blocks in sources with Pygments. Highlighting
+is slow, so the results are cached by the lexer, its options and the hash of
+the code, in memory and in ``~/.cache/swsg/highlight``. A code block which
+did not change is never highlighted again, even if the text around it or the
+template of its source changed.
+
+ReST sources use the directive "code" (also known as "code-block" and
+"sourcecode"), Markdown sources use code blocks whose first line names the
+lexer like ":::python".
+
+'''
+import re
+import json
+import hashlib
+
+from docutils import nodes
+from docutils.parsers.rst import directives
+from docutils.parsers.rst.roles import set_classes
+from docutils.parsers.rst.directives.body import CodeBlock
+from docutils.utils.code_analyzer import Lexer, LexerError, NumberLines
+try:
+    import pygments
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    pygments = None
+try:
+    from markdown.extensions import Extension
+    from markdown.treeprocessors import Treeprocessor
+except ImportError:
+    Extension = Treeprocessor = object
+
+from swsg.caches import DirectoryCache
+
+# change this value if the highlighted code changes, so cached results of
+# older versions are not used anymore
+HIGHLIGHTER_VERSION = '1'
+
+
+class HighlightCache(object):
+    '''Cache the results of highlighting code blocks. The results must be
+    serializable as JSON. They are kept in memory and in ``cache``, a
+    ``swsg.caches.DirectoryCache`` (the cache "highlight" per default).
+
+    '''
+    def __init__(self, cache=None):
+        self._cache = cache
+        self.memory = {}
+
+    @property
+    def cache(self):
+        # the default cache is only created when it is used the first time
+        if self._cache is None:
+            self._cache = DirectoryCache.by_name('highlight')
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+        self.memory.clear()
+
+    def key(self, lexer, options, code):
+        code_digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        pygments_version = getattr(pygments, '__version__', None)
+        key = json.dumps(
+            [HIGHLIGHTER_VERSION, pygments_version, lexer, options,
+             code_digest],
+            sort_keys=True)
+        return hashlib.sha256(key).hexdigest()
+
+    def get(self, lexer, options, code, highlight_code):
+        '''Return the cached result of highlighting ``code`` with ``lexer``
+        and ``options``. If it is not cached yet, the result of calling
+        ``highlight_code`` is cached and returned.
+
+        '''
+        key = self.key(lexer, options, code)
+        if key in self.memory:
+            return self.memory[key]
+        value = self.cache.get(key)
+        if value is None:
+            result = highlight_code()
+            self.cache.put(key, json.dumps(result))
+        else:
+            result = json.loads(value)
+        self.memory[key] = result
+        return result
+
+
+# the cache which is shared by all sources
+highlight_cache = HighlightCache()
+
+
+def lex_code(code, language, tokennames='short'):
+    '''Return the tokens of ``code`` as returned by
+    ``docutils.utils.code_analyzer.Lexer``, but as a list of lists.
+
+    '''
+    def analyze():
+        return [[classes, value] for classes, value in
+                Lexer(code, language, tokennames)]
+    if not language or language == 'text' or tokennames == 'none':
+        return analyze()
+    return highlight_cache.get(
+        language, {'tokennames': tokennames, 'type': 'docutils tokens'}, code,
+        analyze)
+
+
+def highlight_html(code, language, css_class='codehilite'):
+    'return ``code`` highlighted by Pygments as HTML'
+    def highlight_code():
+        formatter = HtmlFormatter(cssclass=css_class)
+        return highlight(code, get_lexer_by_name(language), formatter)
+    return highlight_cache.get(
+        language, {'css_class': css_class, 'type': 'html'}, code,
+        highlight_code)
+
+
+class CachedCodeBlock(CodeBlock):
+    '''The ReST directive "code" whose tokens are cached. The nodes are the
+    same as the ones of the directive of docutils.
+
+    '''
+    def run(self):
+        self.assert_has_content()
+        language = self.arguments[0] if self.arguments else ''
+        set_classes(self.options)
+        classes = ['code']
+        if language:
+            classes.append(language)
+        classes.extend(self.options.get('classes', []))
+        code = u'\n'.join(self.content)
+        try:
+            tokens = lex_code(
+                code, language, self.state.document.settings.syntax_highlight)
+        except LexerError, e:
+            if self.state.document.settings.report_level > 2:
+                # don't report warnings -> insert without syntax highlight
+                tokens = lex_code(code, language, 'none')
+            else:
+                raise self.warning(e)
+        if 'number-lines' in self.options:
+            # optional argument `startline`, defaults to 1
+            try:
+                startline = int(self.options['number-lines'] or 1)
+            except ValueError:
+                raise self.error(':number-lines: with non-integer start value')
+            endline = startline + len(self.content)
+            tokens = NumberLines(tokens, startline, endline)
+        node = nodes.literal_block(code, classes=classes)
+        self.add_name(node)
+        if 'source' in self.options:
+            node.attributes['source'] = self.options['source']
+        for classes, value in tokens:
+            if classes:
+                node += nodes.inline(value, value, classes=classes)
+            else:
+                node += nodes.Text(value)
+        return [node]
+
+
+def register_directives():
+    for name in ('code', 'code-block', 'sourcecode'):
+        directives.register_directive(name, CachedCodeBlock)
+
+
+class HighlightTreeprocessor(Treeprocessor):
+    'highlight the code blocks of a Markdown document which name a lexer'
+
+    language_line = re.compile(r'^:::([\w+.#-]+)[ \t]*\n')
+
+    def run(self, root):
+        for block in root.iter('pre'):
+            if len(block) != 1 or block[0].tag != 'code':
+                continue
+            code = block[0].text
+            match = self.language_line.match(code)
+            if match is None:
+                continue
+            code = code[match.end():]
+            for escaped, character in [
+                    ('&lt;', '<'), ('&gt;', '>'), ('&amp;', '&')]:
+                code = code.replace(escaped, character)
+            try:
+                html = highlight_html(code, match.group(1))
+            except ClassNotFound:
+                continue
+            # the element is replaced by the highlighted code in the same way
+            # as the extension "codehilite" of Markdown does it
+            placeholder = self.md.htmlStash.store(html)
+            block.clear()
+            block.tag = 'p'
+            block.text = placeholder
+
+
+class HighlightExtension(Extension):
+    '''A Markdown extension which highlights code blocks whose first line
+    names a lexer like ":::python" (the syntax of the extension
+    "codehilite"). Code blocks without such a line are not changed.
+
+    '''
+    def extendMarkdown(self, md):
+        md.treeprocessors.register(
+            HighlightTreeprocessor(md), 'swsg-highlight', 30)
+        md.registerExtension(self)
@@ -0,0 +1,120 @@
+'''Import many sources or templates into a project at once, from a directory
+or from a tar or zip archive. The files are written in a
+``Project.batch`` block, so the projects file is updated only once.
+
+The source directory of a project is flat, so every file is imported under
+its base name, wherever it is located in the directory or archive.
+
+'''
+import os
+import shutil
+import tarfile
+import zipfile
+import contextlib
+
+from swsg.loggers import swsg_logger as logger
+from swsg.sources import UnsupportedMarkup, get_source_class_by_markup
+
+
+class ImportConflict(Exception):
+    def __init__(self, name, paths):
+        self.name = name
+        self.paths = paths
+
+    def __str__(self):
+        return 'several files would be imported as {0}: {1}'.format(
+            self.name, ', '.join(self.paths))
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r})'.format(
+            self.__class__.__name__, self.name, self.paths)
+
+
+def _directory_files(directory):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            yield (
+                os.path.relpath(path, directory),
+                lambda path=path: open(path, 'rb'))
+
+
+def _tar_files(archive):
+    for member in archive.getmembers():
+        if member.isfile():
+            yield (
+                member.name,
+                lambda member=member: archive.extractfile(member))
+
+
+def _zip_files(archive):
+    for info in archive.infolist():
+        if not info.filename.endswith('/'):
+            yield info.filename, lambda info=info: archive.open(info)
+
+
+@contextlib.contextmanager
+def open_files(path):
+    '''Yield a list of tuples of the path of every file in the directory or
+    archive ``path`` and a function which opens the file.
+
+    '''
+    if os.path.isdir(path):
+        yield list(_directory_files(path))
+    elif tarfile.is_tarfile(path):
+        with contextlib.closing(tarfile.open(path)) as archive:
+            yield list(_tar_files(archive))
+    elif zipfile.is_zipfile(path):
+        with contextlib.closing(zipfile.ZipFile(path)) as archive:
+            yield list(_zip_files(archive))
+    else:
+        raise ValueError(
+            '{0} is neither a directory nor a tar or zip archive'.format(path))
+
+
+def is_source(name):
+    'return whether the filename extension of ``name`` is a markup language'
+    markup_language = os.path.splitext(name)[1].lstrip('.')
+    try:
+        get_source_class_by_markup(markup_language)
+    except UnsupportedMarkup:
+        return False
+    return True
+
+
+def import_files(project, path, templates=False):
+    '''Copy the files of the directory or archive ``path`` into the source
+    directory of ``project`` (or into its template directory if
+    ``templates`` is true) and update the projects file once. Files which
+    are not sources of a supported markup language are skipped when
+    importing sources. Return the names of the imported files.
+
+    '''
+    if templates:
+        target_dir = project.template_dir
+    else:
+        target_dir = project.source_dir
+    with open_files(path) as files:
+        # key is the name of an imported file, value is a tuple of its path
+        # in ``path`` and the function which opens it
+        imports = {}
+        for file_path, open_file in files:
+            name = os.path.basename(file_path)
+            if not templates and not is_source(name):
+                logger.warning(
+                    'skipping {0}: it is not a source of a supported markup '
+                    'language'.format(file_path))
+                continue
+            if name in imports:
+                raise ImportConflict(name, [imports[name][0], file_path])
+            imports[name] = file_path, open_file
+        # nothing is written if the names conflict
+        with project.batch():
+            for name, (file_path, open_file) in sorted(imports.iteritems()):
+                logger.info('importing {0} as {1}'.format(file_path, name))
+                with contextlib.closing(open_file()) as source_fp:
+                    with open(os.path.join(target_dir, name), 'wb') as fp:
+                        shutil.copyfileobj(source_fp, fp)
+            project.update_projects_file()
+    return sorted(imports)
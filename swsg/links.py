@@ -0,0 +1,190 @@
+'''Check that the internal links of the rendered outputs point to existing
+files and anchors. The links and anchors of the outputs are extracted in a
+pool of processes and cached in the build manifest by the digest of the
+output, so only outputs which changed since the last check are parsed again.
+
+'''
+import os
+import errno
+import multiprocessing
+from collections import namedtuple
+from HTMLParser import HTMLParser, HTMLParseError
+from urllib import unquote
+from urlparse import urlsplit
+
+from swsg.loggers import swsg_logger as logger
+
+# the attributes which link to other files
+LINK_ATTRIBUTES = frozenset(['href', 'src'])
+
+# a link of ``page`` to ``url`` which cannot be resolved
+BrokenLink = namedtuple('BrokenLink', 'page url reason')
+
+# the cached result of checking an output: ``links`` are the URLs of the
+# internal links and ``broken`` are the ``BrokenLink`` instances of the links
+# to other outputs (links to other files are checked every time)
+CheckedOutput = namedtuple(
+    'CheckedOutput', 'output_digest links anchors broken')
+
+
+class LinkExtractor(HTMLParser):
+    'collect the links and the anchors (IDs and names) of an HTML document'
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.links = []
+        self.anchors = set()
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name in LINK_ATTRIBUTES:
+                self.links.append(value)
+            elif name == 'id' or (tag == 'a' and name == 'name'):
+                self.anchors.add(value)
+
+    handle_startendtag = handle_starttag
+
+
+def is_internal(url):
+    'return whether ``url`` refers to a file of the same site'
+    parts = urlsplit(url)
+    return not (parts.scheme or parts.netloc)
+
+
+def extract_links(output_path):
+    '''Return the output path, the internal links and the anchors of the
+    output ``output_path`` or ``None`` instead of the links and anchors if the
+    output does not exist. This function is called in the worker processes.
+
+    '''
+    try:
+        with open(output_path) as fp:
+            html = fp.read().decode('utf-8')
+    except IOError, e:
+        if e.errno != errno.ENOENT:
+            raise
+        return output_path, None, None
+    extractor = LinkExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except HTMLParseError, e:
+        logger.warning('cannot parse the output {0}: {1}'.format(
+            output_path, e))
+    links = tuple(url for url in extractor.links if is_internal(url))
+    return output_path, links, frozenset(extractor.anchors)
+
+
+def resolve_link(output_dir, page, url):
+    '''Return the path of the file and the fragment which the link ``url``
+    of the output ``page`` refers to. Absolute URLs are relative to
+    ``output_dir``.
+
+    '''
+    parts = urlsplit(url)
+    link_path = unquote(parts.path)
+    if not link_path:
+        target = page
+    else:
+        if link_path.startswith('/'):
+            target = os.path.join(output_dir, link_path.lstrip('/'))
+        else:
+            target = os.path.join(os.path.dirname(page), link_path)
+        if link_path.endswith('/'):
+            target = os.path.join(target, 'index.html')
+        target = os.path.normpath(target)
+    return target, unquote(parts.fragment)
+
+
+class LinkChecker(object):
+    '''Check the internal links of every output which is recorded in the
+    build manifest of ``project``. The outputs are parsed in ``processes``
+    worker processes (the number of CPUs per default).
+
+    '''
+    name = 'check-links'
+
+    def __init__(self, project, processes=None):
+        self.project = project
+        self.processes = processes
+
+    def get_state(self):
+        '''return the cached ``CheckedOutput`` instances, keyed by the paths
+        of the outputs'''
+        return self.project.manifest.stage_data.setdefault(self.name, {})
+
+    def extract(self, output_paths):
+        'yield the result of ``extract_links`` for every output path'
+        if len(output_paths) < 2:
+            for output_path in output_paths:
+                yield extract_links(output_path)
+            return
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in pool.imap_unordered(extract_links, output_paths):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+
+    def check(self):
+        '''Return the sorted list of the ``BrokenLink`` instances of all
+        outputs. Only outputs which changed and outputs which link to changed
+        outputs are checked again.
+
+        '''
+        state = self.get_state()
+        outputs = dict(
+            (os.path.normpath(entry.output_path), entry.output_digest)
+            for entry in self.project.manifest.entries.itervalues())
+        changed = set(path for path in state if path not in outputs)
+        for output_path in changed:
+            del state[output_path]
+        outdated = sorted(
+            path for path, digest in outputs.iteritems()
+            if path not in state or state[path].output_digest != digest)
+        for output_path, links, anchors in self.extract(outdated):
+            changed.add(output_path)
+            if links is None:
+                logger.warning('the output {0} does not exist'.format(
+                    output_path))
+                state.pop(output_path, None)
+                continue
+            logger.info('extracted the links of {0}'.format(output_path))
+            state[output_path] = CheckedOutput(
+                outputs[output_path], links, anchors, None)
+        output_dir = self.project.output_dir
+        broken_links = []
+        for page, checked in sorted(state.items()):
+            targets = [
+                resolve_link(output_dir, page, url) for url in checked.links]
+            if (checked.broken is None or page in changed or
+                any(target in changed for target, _ in targets)):
+                checked = state[page] = checked._replace(
+                    broken=self.check_page_links(page, checked, targets))
+            broken_links.extend(checked.broken)
+            # links to files which were not parsed are always checked,
+            # because there is nothing which tells whether they changed
+            for url, (target, fragment) in zip(checked.links, targets):
+                if target not in state and not os.path.exists(target):
+                    broken_links.append(
+                        BrokenLink(page, url, 'missing file'))
+        self.project.update_projects_file()
+        return sorted(broken_links)
+
+    def check_page_links(self, page, checked, targets):
+        '''Return the broken links of ``page`` to outputs. ``targets`` are
+        the resolved links of ``checked``.
+
+        '''
+        state = self.get_state()
+        broken_links = []
+        for url, (target, fragment) in zip(checked.links, targets):
+            if target not in state:
+                # links to other files are checked by ``check``
+                continue
+            if fragment and fragment not in state[target].anchors:
+                broken_links.append(BrokenLink(page, url, 'missing anchor'))
+        return broken_links
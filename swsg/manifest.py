@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+from swsg.utils import stamp_file
+
+# one output of a render plan and why it will be rebuilt, kept or deleted
+PlannedOutput = namedtuple('PlannedOutput', 'source_name output_path reason')
+
+
+class ManifestEntry(object):
+    '''The bookkeeping of a rendered source: the path of its output and the
+    digests of all files the output was rendered from.
+
+    '''
+    # the time (seconds since the epoch) when the output changed the last time
+    modified = None
+    # the seconds it took to load and render the source the last time
+    duration = None
+    # the ``swsg.navigation.SiteTree.structure_digest`` of the site tree the
+    # output was rendered with, if its template used the template functions
+    # of the site tree
+    site_tree_digest = None
+
+    def __init__(self, output_path, source_digest, template_path,
+                 template_digest, config_digest, output_digest,
+                 dependencies=None):
+        self.output_path = output_path
+        self.source_digest = source_digest
+        self.template_path = template_path
+        self.template_digest = template_digest
+        self.config_digest = config_digest
+        self.output_digest = output_digest
+        # key describes a further input of the output (e.g. the call of a
+        # template function), value is the digest of this input
+        self.dependencies = dependencies or {}
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.output_path)
+
+
+class BuildManifest(object):
+    '''Remembers the state of the last rendering process of a project. It is
+    pickled together with its ``Project`` instance in the projects file.
+
+    '''
+    # the names of the sources whose entries were merged from the partial
+    # manifests of shards; the stages which are disabled for shards have not
+    # seen their outputs yet
+    unstaged = frozenset()
+
+    def __init__(self):
+        # key is the name of the source, value is its ``ManifestEntry``
+        self.entries = {}
+        # key is the path to a source, template or configuration file, value
+        # is its last known ``swsg.utils.FileStamp``
+        self.stamps = {}
+        # key is the name of a ``swsg.stages.Stage``, value is its state
+        self.stage_data = {}
+
+    def stamp(self, filename):
+        '''Return the current ``FileStamp`` of ``filename``. The file is only
+        hashed if its stat information changed since it was stamped the last
+        time.
+
+        '''
+        stamp = stamp_file(filename, self.stamps.get(filename))
+        self.stamps[filename] = stamp
+        return stamp
+
+    @property
+    def outputs(self):
+        'the paths of all outputs which were created by rendering'
+        return frozenset(entry.output_path for entry in self.entries.values())
+
+    def remove(self, source_names):
+        '''Forget the sources ``source_names`` and return the paths of their
+        outputs which do not belong to any of the remaining sources.
+
+        '''
+        removed_outputs = [
+            self.entries.pop(source_name).output_path
+            for source_name in source_names]
+        outputs = self.outputs
+        return [path for path in removed_outputs if path not in outputs]
+
+
+class RenderPlan(object):
+    '''The outputs which would be rebuilt, kept or deleted by rendering a
+    project. Each list contains ``PlannedOutput`` instances.
+
+    '''
+    def __init__(self, config_digest, site_tree=None):
+        self.config_digest = config_digest
+        # the ``swsg.navigation.SiteTree`` the plan was computed with
+        self.site_tree = site_tree
+        self.rebuild = []
+        self.keep = []
+        self.delete = []
+
+    def __len__(self):
+        return len(self.rebuild) + len(self.keep) + len(self.delete)
+
+    def as_dict(self):
+        'return the plan as a dictionary which can be serialized as JSON'
+        return dict(
+            (action, [planned._asdict() for planned in getattr(self, action)])
+            for action in ('rebuild', 'keep', 'delete'))
+
+
+class RenderReport(object):
+    '''Collects what a rendering process actually did: the paths of the
+    outputs which were rendered and the paths of the stale outputs which
+    were deleted.
+
+    '''
+    def __init__(self):
+        self.rendered = []
+        self.deleted = []
+        # key is the path of a deleted output, value is the digest of its
+        # content which was recorded in the build manifest
+        self.deleted_digests = {}
@@ -0,0 +1,71 @@
+import os
+from collections import namedtuple
+
+from swsg.sources import scan_header
+
+# ``template`` is ``None`` if the source does not assign a template, so the
+# default template of the project is used for it
+SourceMetadata = namedtuple(
+    'SourceMetadata', 'name title template markup output_path mtime size')
+
+
+class SourceIndex(object):
+    '''The metadata of all sources of a project. The index is pickled together
+    with its ``Project`` instance and updated incrementally: only sources
+    whose stat information changed are scanned again, and scanning a source
+    reads only its header, never the whole file.
+
+    '''
+    def __init__(self):
+        # key is the name of the source, value is its ``SourceMetadata``
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        'iterate over the metadata of all sources ordered by their names'
+        for name in sorted(self.entries):
+            yield self.entries[name]
+
+    def __contains__(self, source_name):
+        return source_name in self.entries
+
+    def get(self, source_name):
+        return self.entries.get(source_name)
+
+    def update(self, project, source_names=None):
+        '''Bring the index up to date with the source directory of
+        ``project`` and return a tuple of two sets: the names of the sources
+        which were (re)scanned and the names of those which were removed.
+
+        '''
+        if source_names is None:
+            source_names = os.listdir(project.source_dir)
+        scanned = set()
+        for source_name in source_names:
+            source_path = os.path.join(project.source_dir, source_name)
+            stat = os.stat(source_path)
+            metadata = self.entries.get(source_name)
+            if (metadata is not None and
+                (metadata.mtime, metadata.size) ==
+                (stat.st_mtime, stat.st_size)):
+                continue
+            header = scan_header(source_path)
+            self.entries[source_name] = SourceMetadata(
+                source_name,
+                header.get(u'title') or u'unknown',
+                header.get(u'template') or None,
+                os.path.splitext(source_name)[1].lstrip('.'),
+                project.get_output_path(source_name),
+                stat.st_mtime, stat.st_size)
+            scanned.add(source_name)
+        removed = set(self.entries).difference(source_names)
+        for source_name in removed:
+            del self.entries[source_name]
+        return scanned, removed
+
+    def by_template(self, template):
+        '''return the metadata of all sources which assign the template
+        ``template``'''
+        return [metadata for metadata in self if metadata.template == template]
@@ -0,0 +1,76 @@
+'''Minify the rendered HTML outputs before they are written: whitespace is
+collapsed, comments are removed and the quotes of attribute values are left
+out where HTML allows it. The minified outputs are cached by the hash of the
+rendered output, so an output which did not change is never minified again.
+
+'''
+import re
+import hashlib
+
+from swsg.caches import DirectoryCache
+from swsg.stages import Stage
+
+# change this value if the minifier produces different results, so cached
+# results of older versions are not used anymore
+MINIFIER_VERSION = '1'
+
+# the content of these elements is never changed
+_preserved_element = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.DOTALL | re.IGNORECASE)
+# conditional comments of the Internet Explorer are kept
+_comment = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_tag = re.compile(r'<[^>]+>')
+_quoted_attribute = re.compile(
+    r'''(\s[\w:.-]+)=(["'])([^\s"'=<>`/]+)\2''', re.UNICODE)
+_whitespace = re.compile(r'\s+', re.UNICODE)
+
+
+def _minify_tag(match):
+    return _quoted_attribute.sub(r'\1=\3', match.group(0))
+
+
+def minify_html(html):
+    'return the minified version of the HTML document ``html``'
+    parts = _preserved_element.split(html)
+    minified_parts = []
+    # ``split`` returns the text between the preserved elements, the
+    # preserved elements and the names of the preserved elements
+    for i in xrange(0, len(parts), 3):
+        text = _comment.sub(u'', parts[i])
+        text = _whitespace.sub(u' ', text)
+        minified_parts.append(_tag.sub(_minify_tag, text))
+        if i + 1 < len(parts):
+            minified_parts.append(parts[i + 1])
+    return u''.join(minified_parts).strip()
+
+
+class MinifyStage(Stage):
+    '''Minify every rendered output. The results are cached in ``cache``, a
+    ``swsg.caches.DirectoryCache``.
+
+    '''
+    name = 'minify'
+
+    def __init__(self, cache=None):
+        if cache is None:
+            cache = DirectoryCache.by_name('minify')
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, config):
+        '''Return a ``MinifyStage`` if the project's configuration has the
+        section "minify", otherwise return ``None``.
+
+        '''
+        if not config.has_section('minify'):
+            return None
+        return cls()
+
+    def process(self, project, page):
+        data = page.output.encode('utf-8')
+        key = hashlib.sha256(MINIFIER_VERSION + data).hexdigest()
+        minified = self.cache.get(key)
+        if minified is None:
+            minified = minify_html(page.output).encode('utf-8')
+            self.cache.put(key, minified)
+        return minified.decode('utf-8')
@@ -0,0 +1,375 @@
+'''The hierarchical structure of the pages of a project and the template
+functions which are based on it. The structure is computed once per rendering
+process, and the results of the template functions are memoized, so rendering
+the navigation of a page does not depend on the number of pages.
+
+'''
+import os
+import json
+import hashlib
+from cgi import escape
+from collections import OrderedDict
+
+from swsg.loggers import swsg_logger as logger
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _describe(node):
+    return u'{0}\0{1}\0{2}'.format(node.name, node.title, node.url)
+
+
+class InvalidNavigation(Exception):
+    def __init__(self, filename, reason):
+        self.filename = filename
+        self.reason = reason
+
+    def __str__(self):
+        return 'the navigation file {0} is invalid: {1}'.format(
+            self.filename, self.reason)
+
+    def __repr__(self):
+        return '{0}({1}, {2})'.format(
+            self.__class__.__name__, self.filename, self.reason)
+
+
+def compile_navigation(filename):
+    '''Read the navigation file ``filename`` and return its structure as
+    nested tuples. A page is represented as ``('page', name)``, a virtual
+    folder as ``('folder', title, children)``. The file contains a JSON list
+    of source names and objects which map folder titles to lists of their
+    children (or to objects of subfolders), for example::
+
+        ["index", {"folder 1": ["source 1.1", "source 1.2"]}, "source 2"]
+
+    '''
+    def compile_items(items):
+        if isinstance(items, dict):
+            return tuple(
+                ('folder', title, compile_items(children))
+                for title, children in items.iteritems())
+        elif isinstance(items, list):
+            compiled = []
+            for item in items:
+                if isinstance(item, basestring):
+                    compiled.append(('page', item))
+                else:
+                    compiled.extend(compile_items(item))
+            return tuple(compiled)
+        raise InvalidNavigation(
+            filename, 'unexpected value {0!r}'.format(items))
+    with open(filename) as fp:
+        try:
+            structure = json.load(fp, object_pairs_hook=OrderedDict)
+        except ValueError, e:
+            raise InvalidNavigation(filename, str(e))
+    return compile_items(structure)
+
+
+class SiteNode(object):
+    '''A page of the site tree. ``name`` is the name of its source and
+    ``url`` is the file name of its output.
+
+    '''
+    def __init__(self, name, title, url, children=None):
+        self.name = name
+        self.title = title
+        self.url = url
+        self.children = children or []
+        self.parent = None
+        for child in self.children:
+            child.parent = self
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.name)
+
+    @property
+    def ancestors(self):
+        'the ancestors of the node, starting with the root'
+        ancestors = []
+        node = self.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        return ancestors[::-1]
+
+    def link(self):
+        title = escape(self.title)
+        if self.url is None:
+            return title
+        return u'<a href="{0}">{1}</a>'.format(escape(self.url, True), title)
+
+
+class SiteTree(object):
+    '''The tree of all pages of a project. The results of :meth:`sitemap`
+    and :meth:`breadcrumbs` are memoized per argument set.
+
+    '''
+    def __init__(self, root):
+        self.root = root
+        # key is the name of the source, value is its ``SiteNode``
+        self.nodes = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            # virtual folders have no names
+            if node.name is not None:
+                self.nodes[node.name] = node
+            stack.extend(node.children)
+        self._cache = {}
+
+    @classmethod
+    def from_index(cls, source_index):
+        '''Build a flat tree from a ``swsg.metadata.SourceIndex``: the page
+        rendered to "index.html" is the root, all other pages are its
+        children ordered by their titles.
+
+        '''
+        root = None
+        pages = []
+        for metadata in source_index:
+            node = SiteNode(
+                metadata.name, metadata.title,
+                os.path.basename(metadata.output_path))
+            if node.url == 'index.html' and root is None:
+                root = node
+            else:
+                pages.append(node)
+        pages.sort(key=lambda node: (node.title, node.name))
+        if root is None:
+            root = SiteNode(None, u'', None)
+        root.children = pages
+        for page in pages:
+            page.parent = root
+        return cls(root)
+
+    @classmethod
+    def from_navigation(cls, structure, source_index):
+        '''Build a tree from the ``structure`` returned by
+        ``compile_navigation``, taking the titles of the pages from the
+        ``swsg.metadata.SourceIndex`` ``source_index``. A page may be given
+        with or without the filename extension of its source.
+
+        '''
+        metadata_by_name = {}
+        for metadata in source_index:
+            metadata_by_name[metadata.name] = metadata
+            metadata_by_name.setdefault(
+                os.path.splitext(metadata.name)[0], metadata)
+
+        def build_nodes(items):
+            nodes = []
+            for item in items:
+                if item[0] == 'folder':
+                    title, children = item[1:]
+                    nodes.append(
+                        SiteNode(None, title, None, build_nodes(children)))
+                    continue
+                metadata = metadata_by_name.get(item[1])
+                if metadata is None:
+                    logger.warning(
+                        'the navigation contains the unknown source '
+                        '{0}'.format(item[1]))
+                    continue
+                nodes.append(SiteNode(
+                    metadata.name, metadata.title,
+                    os.path.basename(metadata.output_path)))
+            return nodes
+        return cls(SiteNode(None, u'', None, build_nodes(structure)))
+
+    def parent(self, source_name):
+        '''return the parent node of the page ``source_name`` (which may be
+        a virtual folder) or ``None``'''
+        node = self.nodes.get(source_name)
+        if node is None or node.parent is None or self._is_virtual(
+                node.parent):
+            return None
+        return node.parent
+
+    def _is_virtual(self, node):
+        'the root of a tree built from a navigation file is not a page'
+        return node is self.root and node.name is None
+
+    def children(self, source_name):
+        node = self.nodes.get(source_name)
+        return [] if node is None else node.children
+
+    def siblings(self, source_name):
+        'return the other children of the parent of the page ``source_name``'
+        node = self.nodes.get(source_name)
+        if node is None or node.parent is None:
+            return []
+        return [child for child in node.parent.children if child is not node]
+
+    def _memoized(self, key, function):
+        try:
+            return self._cache[key]
+        except KeyError:
+            result = self._cache[key] = function()
+            return result
+
+    def sitemap(self, depth=None, exclude=()):
+        '''Return the tree as nested HTML lists. ``depth`` limits the number
+        of levels below the root, ``exclude`` is a list of source names
+        which are left out together with their children.
+
+        '''
+        key = ('sitemap', depth, tuple(sorted(exclude)))
+        return self._memoized(
+            key, lambda: self._render_sitemap(depth, frozenset(exclude)))
+
+    def _render_sitemap(self, depth, exclude):
+        def render_node(node, level):
+            children = [
+                child for child in node.children if child.name not in exclude]
+            html = node.link()
+            if children and (depth is None or level < depth):
+                html += render_list(children, level + 1)
+            return u'<li>{0}</li>'.format(html)
+
+        def render_list(nodes, level):
+            return u'<ul>{0}</ul>'.format(
+                u''.join(render_node(node, level) for node in nodes))
+        if self.root.name in exclude:
+            return u''
+        return u'<ul class="sitemap">{0}</ul>'.format(
+            render_node(self.root, 0))
+
+    def breadcrumbs(self, source_name, separator=u' &raquo; '):
+        '''Return links to the ancestors of the page ``source_name``,
+        followed by the title of the page itself.
+
+        '''
+        key = ('breadcrumbs', source_name, separator)
+        return self._memoized(
+            key, lambda: self._render_breadcrumbs(source_name, separator))
+
+    def _render_breadcrumbs(self, source_name, separator):
+        node = self.nodes.get(source_name)
+        if node is None:
+            return u''
+        crumbs = [
+            ancestor.link() for ancestor in node.ancestors if ancestor.title]
+        crumbs.append(escape(node.title))
+        return u'<span class="breadcrumbs">{0}</span>'.format(
+            separator.join(crumbs))
+
+    def structure_digest(self):
+        '''Return the digest of the names, titles and URLs of all nodes and
+        of their arrangement. The results of all template functions depend
+        only on the structure, so they cannot have changed if it did not.
+
+        '''
+        def compute():
+            parts = []
+            stack = [(self.root, 0)]
+            while stack:
+                node, level = stack.pop()
+                parts.append(u'{0}\0{1}'.format(level, _describe(node)))
+                stack.extend(
+                    (child, level + 1) for child in reversed(node.children))
+            return _digest(u'\1'.join(parts))
+        return self._memoized(('structure digest',), compute)
+
+    def digest(self, key):
+        '''Return the digest of the result of the template function call
+        described by ``key`` or ``None`` if ``key`` is unknown.
+
+        '''
+        if key[0] == 'sitemap':
+            depth, exclude = key[1:]
+            function = lambda: _digest(self.sitemap(depth, exclude))
+        elif key[0] == 'breadcrumbs':
+            source_name, separator = key[1:]
+            function = lambda: _digest(
+                self.breadcrumbs(source_name, separator))
+        elif key[0] == 'navigation':
+            function = lambda: self._navigation_digest(key[1])
+        else:
+            return None
+        return self._memoized(('digest',) + key, function)
+
+    def template_functions(self, source_name, dependencies):
+        '''Return the template functions for the page ``source_name``. Every
+        call is recorded in ``dependencies`` together with the digest of its
+        result, so the page can be rendered again if the result changes.
+
+        '''
+        def sitemap(depth=None, exclude=()):
+            key = ('sitemap', depth, tuple(sorted(exclude)))
+            dependencies[key] = self.digest(key)
+            return self.sitemap(depth, exclude)
+
+        def breadcrumbs(separator=u' &raquo; '):
+            key = ('breadcrumbs', source_name, separator)
+            dependencies[key] = self.digest(key)
+            return self.breadcrumbs(source_name, separator)
+
+        def navigation():
+            key = ('navigation', source_name)
+            dependencies[key] = self.digest(key)
+            return self.navigation(source_name)
+        return {
+            'sitemap': sitemap, 'breadcrumbs': breadcrumbs,
+            'navigation': navigation}
+
+    def navigation(self, source_name):
+        '''Return the navigation context of the page ``source_name``: an
+        object with the attributes ``parent``, ``children``, ``siblings``
+        and ``ancestors``, which are ``SiteNode`` instances.
+
+        '''
+        node = self.nodes.get(source_name)
+        return NavigationContext(
+            self.parent(source_name), self.children(source_name),
+            self.siblings(source_name),
+            [] if node is None else [
+                ancestor for ancestor in node.ancestors
+                if not self._is_virtual(ancestor)])
+
+    def _navigation_digest(self, source_name):
+        '''Return the digest of the navigation context of the page
+        ``source_name``. It is built from digests which are memoized per
+        node, so it does not depend on the number of siblings of the page.
+
+        '''
+        node = self.nodes.get(source_name)
+        if node is None:
+            return _digest(u'')
+        parent = self.parent(source_name)
+        parts = [
+            _describe(parent) if parent else u'',
+            self._children_digest(node),
+            self._children_digest(node.parent) if node.parent else u'',
+            _describe(node),
+            self._ancestors_digest(node)]
+        return _digest(u'\2'.join(parts))
+
+    def _children_digest(self, node):
+        'return the digest of the children of ``node``'
+        return self._memoized(
+            ('children digest', node), lambda: _digest(u'\1'.join(
+                _describe(child) for child in node.children)))
+
+    def _ancestors_digest(self, node):
+        '''return the digest of the ancestors of ``node`` which are pages;
+        it is built from the digest of the ancestors of its parent'''
+        def compute():
+            parent = node.parent
+            if parent is None:
+                return u''
+            description = u'' if self._is_virtual(parent) else _describe(
+                parent)
+            return _digest(
+                self._ancestors_digest(parent) + u'\1' + description)
+        return self._memoized(('ancestors digest', node), compute)
+
+
+class NavigationContext(object):
+    def __init__(self, parent, children, siblings, ancestors):
+        self.parent = parent
+        self.children = children
+        self.siblings = siblings
+        self.ancestors = ancestors
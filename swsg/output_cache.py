@@ -0,0 +1,121 @@
+'''A content-addressed cache of rendered outputs which can be shared by
+several checkouts of a project, e.g. by CI agents which mount the same
+directory. An output is cached under a digest of everything it was rendered
+from: the source, all templates, the configuration file and the version of
+swsg. The results of template functions and the files read while converting
+the source are not known before rendering, so they are stored together with
+the output and verified when the output is taken from the cache.
+
+'''
+import os
+import json
+import hashlib
+
+from swsg import __version__
+from swsg.caches import DirectoryCache
+from swsg.loggers import swsg_logger as logger
+from swsg.utils import lists_to_tuples
+
+# change this value if the format of the cached values changes
+OUTPUT_CACHE_VERSION = '1'
+
+
+class CachedSource(object):
+    '''Stands in for a source whose output was taken from the cache. It has
+    the attributes of a source which are used after it has been rendered.
+
+    '''
+    def __init__(self, title, content, template_path, dependencies):
+        self.title = title
+        self.template_path = template_path
+        self.namespace = {'title': title, 'content': content}
+        self.dependencies = dependencies
+        self.read_files = []
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.title)
+
+
+class OutputCache(object):
+    '''Cache the outputs of a project in ``backend``, a
+    ``swsg.caches.BaseCacheBackend``.
+
+    '''
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_directory(cls, directory):
+        return cls(DirectoryCache(directory))
+
+    def inputs_digest(self, project, config_digest):
+        '''Return the digest of the inputs which are shared by all sources of
+        ``project``: the configuration file and every file in the template
+        directory (templates may include or extend other templates).
+
+        '''
+        templates = []
+        for directory, dirnames, filenames in os.walk(project.template_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                templates.append([
+                    os.path.relpath(path, project.template_dir),
+                    project.manifest.stamp(path).digest])
+        return hashlib.sha256(json.dumps(
+            [OUTPUT_CACHE_VERSION, __version__, config_digest, templates]
+        )).hexdigest()
+
+    def key(self, project, inputs_digest, source_name):
+        'return the key of the output of the source ``source_name``'
+        source_path = os.path.join(project.source_dir, source_name)
+        source_digest = project.manifest.stamp(source_path).digest
+        return hashlib.sha256(json.dumps(
+            [inputs_digest, source_name, source_digest])).hexdigest()
+
+    def get(self, project, key, site_tree):
+        '''Return a ``CachedSource`` and the output of ``key`` or ``None`` if
+        the output is not cached or if one of its dependencies changed.
+
+        '''
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        data = json.loads(value)
+        dependencies = {}
+        for dependency_key, digest in data['dependencies']:
+            dependency_key = lists_to_tuples(dependency_key)
+            if dependency_key[0] == 'file':
+                dependency_key = (
+                    dependency_key[0],
+                    project.absolute_path(dependency_key[1]))
+            if project.dependency_digest(dependency_key, site_tree) != digest:
+                logger.info('the cached output {0} is outdated ({1} '
+                    'changed)'.format(key, dependency_key[0]))
+                self.misses += 1
+                return None
+            dependencies[dependency_key] = digest
+        self.hits += 1
+        source = CachedSource(
+            data['title'], data['content'],
+            project.absolute_path(data['template_path']), dependencies)
+        return source, data['output']
+
+    def put(self, project, key, source, output):
+        'cache the ``output`` of the rendered ``source``'
+        dependencies = []
+        for dependency_key, digest in sorted(source.dependencies.iteritems()):
+            if dependency_key[0] == 'file':
+                dependency_key = (
+                    dependency_key[0],
+                    project.relative_path(dependency_key[1]))
+            dependencies.append([dependency_key, digest])
+        self.backend.put(key, json.dumps({
+            'output': output,
+            'title': source.title,
+            'content': source.namespace['content'],
+            'template_path': project.relative_path(source.template_path),
+            'dependencies': dependencies}))
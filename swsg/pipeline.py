@@ -0,0 +1,116 @@
+'''Overlap the file I/O of the rendering process with the rendering itself.
+Sources are read ahead by a background thread and outputs are written by
+background threads. Both stages communicate with the rendering process through
+bounded queues, so only a limited number of files is held in memory.
+
+'''
+import sys
+import codecs
+import threading
+from Queue import Queue, Full
+
+# put into a queue to signal that there are no more items
+_DONE = object()
+
+
+def write_output(output_path, output):
+    with codecs.open(output_path, 'w', 'utf-8') as fp:
+        fp.write(output)
+
+
+def prefetch(function, items, size=8):
+    '''Yield ``function(item)`` for each item of ``items`` in the original
+    order. The return values are computed by a background thread which stays
+    at most ``size`` items ahead of the consumer. An exception raised by
+    ``function`` is re-raised in the consumer.
+
+    '''
+    queue = Queue(size)
+    stopped = threading.Event()
+
+    def put(value):
+        # do not block forever if the consumer stopped iterating
+        while not stopped.is_set():
+            try:
+                queue.put(value, timeout=0.1)
+            except Full:
+                continue
+            return True
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((True, function(item))):
+                    return
+        except Exception:
+            put((False, sys.exc_info()))
+        else:
+            put((True, _DONE))
+
+    thread = threading.Thread(target=produce, name='swsg-prefetch')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            succeeded, value = queue.get()
+            if not succeeded:
+                raise value[0], value[1], value[2]
+            if value is _DONE:
+                break
+            yield value
+    finally:
+        stopped.set()
+
+
+class OutputWriter(object):
+    '''Write outputs in ``threads`` background threads. At most ``size``
+    outputs wait for being written; if the queue is full, :meth:`write`
+    blocks. Leaving the ``with`` block waits until every output is written
+    and re-raises the first error which occured while writing.
+
+    '''
+    def __init__(self, threads=2, size=16, write=write_output):
+        self.queue = Queue(size)
+        self.write_function = write
+        self.errors = []
+        self.threads = [
+            threading.Thread(
+                target=self._work, name='swsg-writer-{0}'.format(i))
+            for i in xrange(threads)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            try:
+                self.write_function(*item)
+            except Exception:
+                self.errors.append(sys.exc_info())
+
+    def write(self, output_path, output):
+        if self.errors:
+            self._reraise()
+        self.queue.put((output_path, output))
+
+    def close(self):
+        for thread in self.threads:
+            self.queue.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            self._reraise()
+
+    def _reraise(self):
+        exc_type, exc_value, traceback = self.errors[0]
+        raise exc_type, exc_value, traceback
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
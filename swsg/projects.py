@@ -3,9 +3,14 @@ import shutil
 import shelve
 import hashlib
 import contextlib
+import time
 from datetime import datetime
+from functools import partial
+from itertools import imap
 from ConfigParser import RawConfigParser
 
+from swsg import pipeline, scheduling
+from swsg.config import ConfigSnapshot
 from swsg.loggers import swsg_logger as logger
 from swsg.file_paths import DEFAULT_PROJECTS_FILE_NAME, GLOBAL_CONFIGFILE
 from swsg.templates import (SUPPORTED_TEMPLATE_ENGINES,
@@ -13,7 +18,13 @@ from swsg.templates import (SUPPORTED_TEMPLATE_ENGINES,
     DEFAULT_JINJA_TEMPLATE, GenshiTemplate, Jinja2Template,
     get_template_class_by_template_language)
 from swsg.sources import get_source_class_by_markup
-from swsg.utils import hash_file
+from swsg.metadata import SourceIndex
+from swsg.stages import RenderedPage
+from swsg.navigation import SiteTree, compile_navigation
+from swsg.sharding import in_shard
+from swsg.utils import read_file
+from swsg.manifest import (BuildManifest, ManifestEntry, PlannedOutput,
+    RenderPlan, RenderReport)
 
 DEFAULT_SETTINGS = {
     'general':
@@ -56,6 +67,14 @@ class NonexistingProject(Exception):
 
 
 class Project(object):
+    # the number of nested :meth:`batch` blocks which are active
+    batch_depth = 0
+    # ``None`` if no update of the projects file was deferred by a batch,
+    # otherwise the argument ``new_created`` of the deferred update
+    deferred_update = None
+    # the ``swsg.config.ConfigSnapshot`` which was taken when the
+    # configuration file was read the last time
+    config_snapshot = None
 
     def __init__(self, path, name,
                  projects_file_name=DEFAULT_PROJECTS_FILE_NAME):
@@ -76,20 +95,44 @@ class Project(object):
         self.template_dir = os.path.join(self.project_dir, 'templates')
         self.output_dir = os.path.join(self.project_dir, 'output')
         self.config_filename = os.path.join(self.project_dir, 'config.ini')
+        # the optional file which arranges the sources in virtual folders
+        self.navigation_filename = os.path.join(
+            self.project_dir, 'navigation.json')
         self.projects_file_name = projects_file_name
 
         # True after the projects file was updated
         self.updated_projects_file = False
 
-        # key is the path to the file, value is its md5 hash
-        self.rendered_sources = {}
-        self.rendered_templates = {}
-
-        self.config_hash = ''
+        # the state of the last rendering process
+        self.manifest = BuildManifest()
+        # the metadata of all sources, read from their headers
+        self.source_index = SourceIndex()
+        # a tuple of the digest of the navigation file and its compiled
+        # structure
+        self.compiled_navigation = None
 
     def __repr__(self):
         return '{0} "{1}"'.format(self.__class__.__name__, self.name)
 
+    def __setstate__(self, state):
+        '''Unpickle a project from the projects file. Projects which were
+        pickled by older versions of swsg have the hashes of the rendered
+        files instead of a build manifest, so their build state starts empty.
+
+        '''
+        for name in ('rendered_sources', 'rendered_templates', 'config_hash'):
+            state.pop(name, None)
+        self.__dict__.update(state)
+        if 'navigation_filename' not in state:
+            self.navigation_filename = os.path.join(
+                self.project_dir, 'navigation.json')
+        if 'manifest' not in state:
+            self.manifest = BuildManifest()
+        if 'source_index' not in state:
+            self.source_index = SourceIndex()
+        if 'compiled_navigation' not in state:
+            self.compiled_navigation = None
+
     def init(self):
         '''create the specific project directory and add a configuration file
         with default values
@@ -144,21 +187,122 @@ class Project(object):
     @property
     def sources(self):
         self.read_config()
+        self.update_source_index()
+        site_tree = self.build_site_tree()
+        for source_name in os.listdir(self.source_dir):
+            yield source_name, self.load_source(source_name, site_tree)
+
+    def load_source(self, source_name, site_tree=None):
+        '''Read the source ``source_name`` from the source directory. If
+        ``site_tree`` is given, the template functions which are based on the
+        structure of the site are available in the source's namespace.
+
+        '''
         default_template = os.path.join(
             self.template_dir,
             self.config.get('general', 'default template'))
-        for source_name in os.listdir(self.source_dir):
-            # the markup language is the filename extension without the dot.
-            # For example, the content of "foo.rest" will be rendered as ReST
-            markup_language = os.path.splitext(source_name)[1].lstrip('.')
-            source_path = os.path.join(self.source_dir, source_name)
-            with open(source_path) as fp:
-                text = fp.read().decode('utf-8')
-            SourceClass = get_source_class_by_markup(markup_language)
-            yield source_name, SourceClass(
-                self.template_dir, default_template, text)
+        # the markup language is the filename extension without the dot.
+        # For example, the content of "foo.rest" will be rendered as ReST
+        markup_language = os.path.splitext(source_name)[1].lstrip('.')
+        source_path = os.path.join(self.source_dir, source_name)
+        # the file is read only once; its stamp is calculated from the same
+        # buffer, so rendering does not have to hash the source again
+        data, self.manifest.stamps[source_path] = read_file(source_path)
+        text = data.decode('utf-8')
+        del data
+        SourceClass = get_source_class_by_markup(markup_language)
+        dependencies = {}
+        if site_tree is None:
+            template_functions = {}
+        else:
+            template_functions = site_tree.template_functions(
+                source_name, dependencies)
+        source = SourceClass(
+            self.template_dir, default_template, text, template_functions,
+            dependencies, source_path)
+        # files which were read by the markup language (e.g. by the ReST
+        # directive "include") are inputs of the output as well
+        for filename in source.read_files:
+            dependencies[('file', filename)] = self.file_digest(filename)
+        return source
+
+    def load_template(self, template_path, TemplateClass):
+        'read the template ``template_path`` and record its stamp'
+        data, self.manifest.stamps[template_path] = read_file(template_path)
+        return TemplateClass(data.decode('utf-8'))
+
+    def update_source_index(self):
+        '''Scan the headers of all new or changed sources and return the
+        up-to-date ``swsg.metadata.SourceIndex`` of the project. The index is
+        also updated by :meth:`plan` and :meth:`render`.
+
+        '''
+        self.source_index.update(self)
+        return self.source_index
+
+    def build_site_tree(self):
+        '''Return the ``swsg.navigation.SiteTree`` of the project. If the
+        project has a navigation file, the tree is built from its structure,
+        which is only compiled again if the file changed. Otherwise, the tree
+        is built from the source index.
+
+        '''
+        if not os.path.isfile(self.navigation_filename):
+            return SiteTree.from_index(self.source_index)
+        digest = self.manifest.stamp(self.navigation_filename).digest
+        if (self.compiled_navigation is None or
+            self.compiled_navigation[0] != digest):
+            logger.info('compiling the navigation file {0}'.format(
+                self.navigation_filename))
+            self.compiled_navigation = (
+                digest, compile_navigation(self.navigation_filename))
+        return SiteTree.from_navigation(
+            self.compiled_navigation[1], self.source_index)
+
+    def get_output_path(self, source_name):
+        filename = os.path.splitext(os.path.basename(source_name))[0]
+        return os.path.join(self.output_dir, filename) + '.html'
+
+    def relative_path(self, path):
+        '''Return ``path`` relative to the project directory if it is inside
+        of it, otherwise return ``path`` unchanged. Relative paths are used
+        for everything which is shared between checkouts of the project.
+
+        '''
+        relative_path = os.path.relpath(path, self.project_dir)
+        if relative_path.startswith(os.pardir):
+            return path
+        return relative_path
+
+    def absolute_path(self, path):
+        'the opposite of :meth:`relative_path`'
+        return os.path.join(self.project_dir, path)
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''Defer updating the projects file until the end of the ``with``
+        block, so saving many sources or templates in the block writes the
+        projects file only once instead of once per file. Batches can be
+        nested; the outermost one updates the projects file, even if the
+        block raised an exception, because the files which were saved before
+        are on the disk already.
+
+        '''
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0 and self.deferred_update is not None:
+                new_created = self.deferred_update
+                self.deferred_update = None
+                self.update_projects_file(new_created)
 
     def update_projects_file(self, new_created=False):
+        if self.batch_depth > 0:
+            logger.info('deferring the update of the projects file')
+            self.deferred_update = bool(self.deferred_update or new_created)
+            return
         # create the directories where the projects file will be saved if they
         # do not exist yet
         path, file = os.path.split(self.projects_file_name)
@@ -180,16 +324,33 @@ class Project(object):
         self.updated_projects_file = True
 
     def read_config(self):
+        '''Return a current ``swsg.config.ConfigSnapshot`` of the
+        configuration file and update ``self.config`` from it. The file is
+        only read and parsed again if its stat information changed since the
+        last snapshot was taken.
+
+        '''
+        snapshot = self.config_snapshot
+        if snapshot is not None and snapshot.is_current():
+            return snapshot
         logger.notice(
             'reading the configuration file {0}'.format(self.config_filename))
-        with open(self.config_filename) as fp:
-            self.config.readfp(fp)
+        snapshot = self.config_snapshot = ConfigSnapshot.read(
+            self.config_filename)
+        snapshot.update_parser(self.config)
+        # the file has been hashed already, so planning does not hash it again
+        self.manifest.stamps[self.config_filename] = snapshot.stamp
+        return snapshot
 
     def reset_config(self):
         logger.notice(
             'resetting the configuration file {0}'.format(
                 self.config_filename))
         # check if thee is a global config in CONFIGDIR
+        # the file may be changed within the resolution of its modification
+        # time, so the next snapshot must not be taken from the stat
+        # information
+        self.config_snapshot = None
         if os.path.exists(GLOBAL_CONFIGFILE):
             shutil.copyfile(GLOBAL_CONFIGFILE, self.config_filename)
             return None
@@ -220,61 +381,336 @@ class Project(object):
             self.config.set(section, option, value)
         with open(self.config_filename, 'w') as fp:
             self.config.write(fp)
+        self.config_snapshot = None
         self.update_projects_file()
 
-    def render(self):
+    def plan(self, shard=None):
+        '''Find out which outputs have to be rebuilt, which ones can be kept
+        and which ones belong to sources which do not exist anymore, without
+        rendering anything. The result is a ``swsg.manifest.RenderPlan``.
+
+        A file is only hashed if its modification time or size differ from
+        the values recorded while rendering the last time.
+
+        If ``shard`` is a ``swsg.sharding.Shard``, the plan only contains
+        the sources which belong to this shard.
+
+        '''
+        config_digest = self.read_config().digest
+        source_names = sorted(os.listdir(self.source_dir))
+        self.source_index.update(self, source_names)
+        plan = RenderPlan(config_digest, self.build_site_tree())
+        for source_name in source_names:
+            if shard is not None and not in_shard(source_name, shard):
+                continue
+            entry = self.manifest.entries.get(source_name)
+            reason = self._outdated_reason(source_name, entry, plan)
+            output_path = self.get_output_path(source_name)
+            if reason is None:
+                plan.keep.append(
+                    PlannedOutput(source_name, output_path, 'up to date'))
+            else:
+                plan.rebuild.append(
+                    PlannedOutput(source_name, output_path, reason))
+        existing_sources = frozenset(source_names)
+        for source_name, entry in sorted(self.manifest.entries.iteritems()):
+            if shard is not None and not in_shard(source_name, shard):
+                continue
+            if source_name not in existing_sources:
+                plan.delete.append(PlannedOutput(
+                    source_name, entry.output_path, 'source removed'))
+        return plan
+
+    def _outdated_reason(self, source_name, entry, plan):
+        '''Return the reason why the source ``source_name`` has to be
+        rendered again or ``None`` if its output is up to date.
+
+        '''
+        if entry is None:
+            return 'new source'
+        if not os.path.exists(entry.output_path):
+            return 'output missing'
+        # comparing the config file's hash is the cheapest check, because it
+        # has already been calculated
+        if entry.config_digest != plan.config_digest:
+            return 'config changed'
+        source_path = os.path.join(self.source_dir, source_name)
+        if self.manifest.stamp(source_path).digest != entry.source_digest:
+            return 'source changed'
+        if not os.path.isfile(entry.template_path):
+            return 'template changed'
+        template_digest = self.manifest.stamp(entry.template_path).digest
+        if template_digest != entry.template_digest:
+            return 'template changed'
+        # the results of the template functions of the site tree are only
+        # compared if the structure of the site changed; the structure digest
+        # is only computed if the template used these functions
+        site_tree_changed = (
+            entry.site_tree_digest is None or
+            entry.site_tree_digest != plan.site_tree.structure_digest())
+        for key, digest in entry.dependencies.iteritems():
+            if key[0] != 'file' and not site_tree_changed:
+                continue
+            if self.dependency_digest(key, plan.site_tree) != digest:
+                return '{0} changed'.format(key[0])
+        return None
+
+    def dependency_digest(self, key, site_tree):
+        '''Return the current digest of the dependency ``key`` which was
+        recorded while rendering a source.
+
+        '''
+        if key[0] == 'file':
+            return self.file_digest(key[1])
+        return site_tree.digest(key)
+
+    def file_digest(self, filename):
+        '''Return the digest of the file ``filename`` which was read while
+        rendering a source or an empty string if it does not exist.
+
+        '''
+        if not os.path.isfile(filename):
+            return ''
+        return self.manifest.stamp(filename).digest
+
+    def get_template_options(self, TemplateClass):
+        '''return the config settings of the template language being used if
+        there are settings for it in the config file'''
+        if TemplateClass == GenshiTemplate:
+            return dict(self.config.items('genshi'))
+        elif TemplateClass == Jinja2Template:
+            return dict(self.config.items('jinja'))
+        return {}
+
+    def render(self, prune=True, report=None, prefetch=0, stages=(),
+               shard=None, output_cache=None, checkpoint=None, resume=False,
+               jobs=1, save=True):
+        '''Render every source whose output is not up to date and yield the
+        path of the output and the output itself. If ``prune`` is true, the
+        outputs of sources which were removed or renamed are deleted after
+        the last output has been yielded. Only outputs which are recorded in
+        the build manifest are deleted, so the output directory is never
+        scanned. ``report`` can be a ``swsg.manifest.RenderReport`` which
+        is filled with the paths of the rendered and deleted outputs.
+
+        If ``prefetch`` is greater than 0, up to ``prefetch`` sources are read
+        by a background thread while the current source is rendered.
+
+        ``stages`` is a list of ``swsg.stages.Stage`` instances which process
+        every rendered output before it is yielded and which are finished
+        after the last output has been yielded.
+
+        If ``shard`` is a ``swsg.sharding.Shard``, only the sources of this
+        shard are rendered and the projects file is not updated, because
+        the shards may be rendered at the same time. The build manifest has
+        to be written with ``swsg.sharding.dump_partial_manifest`` instead.
+
+        ``output_cache`` can be a ``swsg.output_cache.OutputCache`` which is
+        looked up before a source is rendered. Sources whose outputs are
+        cached are neither read nor rendered.
+
+        ``checkpoint`` can be a ``swsg.checkpoints.Checkpoint`` which saves
+        the build manifest periodically while rendering. If ``resume`` is
+        true, the outputs which were rendered before the last checkpoint of
+        an interrupted rendering process are not rendered again.
+
+        If ``jobs`` is greater than 1, the sources are rendered by ``jobs``
+        processes, the sources which took longest the last time first (see
+        ``swsg.scheduling``), and ``prefetch`` is ignored. The outputs are
+        yielded in the order they are finished.
+
+        If ``save`` is false, the projects file is not updated and the
+        checkpoint is not removed either, e.g. because another process saves
+        the project afterwards or the outputs are still being written.
+
+        '''
+        if report is None:
+            report = RenderReport()
         logger.notice('starting the rendering process')
-        self.read_config()
+        if checkpoint is not None and resume:
+            checkpoint.restore(self, report)
+        plan = self.plan(shard)
         template_language = self.config.get('general', 'template language')
         TemplateClass = get_template_class_by_template_language(
             template_language)
-        for source_name, source in self.sources:
-            sha256_source = hashlib.sha256(source.full_text).hexdigest()
+        options = self.get_template_options(TemplateClass)
+        # key is the name of a source, value is its key in the output cache
+        cache_keys = {}
+        # key is the name of a source, value is a tuple of a
+        # ``swsg.output_cache.CachedSource`` and the output
+        cached_outputs = {}
+        if output_cache is not None:
+            inputs_digest = output_cache.inputs_digest(
+                self, plan.config_digest)
+            for source_name, _, _ in plan.rebuild:
+                key = cache_keys[source_name] = output_cache.key(
+                    self, inputs_digest, source_name)
+                cached_output = output_cache.get(self, key, plan.site_tree)
+                if cached_output is not None:
+                    cached_outputs[source_name] = cached_output
+        planned_outputs = [
+            planned for planned in plan.rebuild
+            if planned.source_name not in cached_outputs]
+        if jobs > 1:
+            rendered_sources = scheduling.render_in_processes(
+                self, planned_outputs, plan.site_tree, TemplateClass,
+                options, jobs)
+        else:
+            rendered_sources = self._render_sources(
+                planned_outputs, plan.site_tree, TemplateClass, options,
+                prefetch)
+        rendered_sources = self._with_cached_outputs(
+            plan, cached_outputs, rendered_sources)
+        for planned, source, output, duration in rendered_sources:
+            source_name, output_path, reason = planned
+            if output_cache is not None and source_name not in cached_outputs:
+                output_cache.put(self, cache_keys[source_name], source, output)
+            logger.info('{0} + {1} -> {2} ({3})'.format(
+                source_name, source.template_path, output_path, reason))
+            previous_entry = self.manifest.entries.get(source_name)
+            page = RenderedPage(
+                source_name, source, output_path, output, previous_entry)
+            for stage in stages:
+                page.output = stage.process(self, page)
+            output = page.output
+            # update the hashes after having rendered the sources
+            source_path = os.path.join(self.source_dir, source_name)
             template_path = os.path.join(
                 self.template_dir, source.template_path)
-            sha256_template = hash_file(template_path)
-            head, tail = os.path.split(source_name)
-            filename = os.path.splitext(tail)[0]
-            output_path = os.path.join(self.output_dir, filename) + '.html'
-            if source_name in self.rendered_sources:
-                # source ehas already been rendered once -> this is a necessary
-                # but not sufficient requirement to skip rendering for
-                # this source
-                if self.rendered_sources.get(output_path) == sha256_source:
-                    # source file has not chnaged -> may require rendering if
-                    # the configuration file or the source's template has been
-                    # changed
-                    # compare the new calculated template's hash with the old
-                    # one, if it exists. otherwise, rendering will be
-                    # necessary
-                    source_hash = self.rendered_templates.get(template_path)
-                    if source_hash == sha256_template:
-                        # check if the config file has been changed since the
-                        # last rendering
-                        config_hash = hash_file(self.config_filename)
-                        if config_hash == self.config_hash:
-                            # skip the rendering process, because neither the
-                            # source nor its template file nor the config file
-                            # have been changed
-                            continue
-            # pass the config settings of the template language being used
-            # if there are settings for it in the config file
-            if TemplateClass == GenshiTemplate:
-                options = dict(self.config.items('genshi'))
-            elif TemplateClass == Jinja2Template:
-                options = dict(self.config.items('jinja'))
+            entry = self.manifest.entries[source_name] = ManifestEntry(
+                output_path,
+                self.manifest.stamp(source_path).digest,
+                template_path,
+                self.manifest.stamp(template_path).digest,
+                plan.config_digest,
+                hashlib.sha256(output.encode('utf-8')).hexdigest(),
+                source.dependencies)
+            if (previous_entry is None or
+                previous_entry.output_digest != entry.output_digest):
+                entry.modified = time.time()
             else:
-                options = {}
-            output = source.render(TemplateClass, **options)
-            logger.info('{0} + {1} -> {2}'.format(
-                source_name, source.template_path, output_path))
-            # update the hashes after having rendered the sources
-            self.rendered_sources[output_path] = sha256_source
-            self.rendered_templates[template_path] = sha256_template
-            self.config_hash = hash_file(self.config_filename)
+                entry.modified = previous_entry.modified
+            if any(key[0] != 'file' for key in entry.dependencies):
+                entry.site_tree_digest = plan.site_tree.structure_digest()
+            else:
+                entry.site_tree_digest = None
+            if duration is None and previous_entry is not None:
+                # an output from the cache was not rendered now
+                duration = previous_entry.duration
+            entry.duration = duration
+            report.rendered.append(output_path)
             yield output_path, output
+            # the output has been written by the caller now
+            if checkpoint is not None and checkpoint.output_written():
+                for stage in stages:
+                    stage.checkpoint(self)
+                checkpoint.save(self, report)
+        if prune:
+            self.prune_outputs(
+                [source_name for source_name, _, _ in plan.delete], report)
+        site_wide_stages = [stage for stage in stages if stage.site_wide]
+        if shard is None:
+            if site_wide_stages:
+                self._stage_merged_outputs(plan, site_wide_stages)
+            # the site-wide stages have seen every output now, if there are
+            # any stages which need to see them
+            self.manifest.unstaged = frozenset()
+        for stage in stages:
+            stage.finish(self, report)
         logger.notice('finishing the rendering process')
-        self.update_projects_file()
+        if shard is None and save:
+            self.update_projects_file()
+            # a shard's checkpoint is needed until its manifest is written
+            if checkpoint is not None:
+                checkpoint.remove()
+
+    def _stage_merged_outputs(self, plan, stages):
+        '''Pass the outputs which were rendered by shards and are not
+        rendered again to the site-wide ``stages``. The outputs are read from
+        the output directory, only their sources are loaded.
+
+        '''
+        unstaged = self.manifest.unstaged
+        for source_name, output_path, _ in plan.keep:
+            if source_name not in unstaged:
+                continue
+            logger.info('passing the output {0} of a shard to {1}'.format(
+                output_path, ', '.join(stage.name for stage in stages)))
+            source = self.load_source(source_name, plan.site_tree)
+            with open(output_path, 'rb') as fp:
+                output = fp.read().decode('utf-8')
+            page = RenderedPage(
+                source_name, source, output_path, output,
+                self.manifest.entries[source_name])
+            for stage in stages:
+                stage.process(self, page)
+
+    def _render_sources(self, planned_outputs, site_tree, TemplateClass,
+                        options, prefetch):
+        '''Load and render the sources of ``planned_outputs`` one after
+        another. Yield the planned output, the source, the output and the
+        duration of loading and rendering the source.
+
+        '''
+        load_source = partial(self.load_source, site_tree=site_tree)
+        source_names = [planned.source_name for planned in planned_outputs]
+        if prefetch > 0:
+            sources = pipeline.prefetch(load_source, source_names, prefetch)
+        else:
+            sources = imap(load_source, source_names)
+        templates = {}
+        for planned in planned_outputs:
+            start = time.time()
+            source = next(sources)
+            output = self.render_source(
+                source, TemplateClass, templates, **options)
+            yield planned, source, output, time.time() - start
+
+    def _with_cached_outputs(self, plan, cached_outputs, rendered_sources):
+        '''Yield the outputs which were taken from the output cache (without
+        a duration) and then the ones of ``rendered_sources``.
+
+        '''
+        for source_name, output_path, reason in plan.rebuild:
+            if source_name in cached_outputs:
+                source, output = cached_outputs[source_name]
+                yield (PlannedOutput(
+                    source_name, output_path, reason + ', cached'),
+                    source, output, None)
+        for rendered_source in rendered_sources:
+            yield rendered_source
+
+    def render_source(self, source, TemplateClass, templates, **options):
+        '''Render the loaded ``source`` with its template. ``templates`` is
+        a dictionary which caches the loaded templates by their paths.
+
+        '''
+        template_path = os.path.join(self.template_dir, source.template_path)
+        if template_path not in templates:
+            templates[template_path] = self.load_template(
+                template_path, TemplateClass)
+        return source.render_template(templates[template_path], **options)
+
+    def prune_outputs(self, source_names, report=None):
+        '''Remove the outputs of the removed sources ``source_names`` from
+        the output directory and forget the sources in the build manifest.
+
+        '''
+        output_digests = {}
+        for source_name in source_names:
+            self.manifest.stamps.pop(
+                os.path.join(self.source_dir, source_name), None)
+            entry = self.manifest.entries[source_name]
+            output_digests[entry.output_path] = entry.output_digest
+        for output_path in self.manifest.remove(source_names):
+            if not os.path.exists(output_path):
+                continue
+            logger.info('removing the stale output {0}'.format(output_path))
+            os.remove(output_path)
+            if report is not None:
+                report.deleted.append(output_path)
+                report.deleted_digests[output_path] = output_digests[
+                    output_path]
 
     def save_source(self, source, name):
         logger.notice('saving the source {0} in the directory {1}'.format(
@@ -0,0 +1,122 @@
+'''Render sources in several processes. The sources are scheduled by their
+expected cost, longest first, so a few large sources which would otherwise be
+started last do not keep a single process busy while the others are idle.
+
+The cost of a source is the duration of its last rendering, which is recorded
+in the build manifest. The cost of a new source is estimated from its size
+and the average duration per byte of the sources which were rendered before.
+
+'''
+import os
+import time
+import multiprocessing
+
+from swsg.output_cache import CachedSource
+
+# the state of a worker process, set by ``_initialize_worker``
+_worker = {}
+
+
+def _source_size(project, source_name):
+    path = os.path.join(project.source_dir, source_name)
+    stamp = project.manifest.stamps.get(path)
+    if stamp is not None:
+        return stamp.size
+    return os.path.getsize(path)
+
+
+def expected_costs(project, source_names):
+    '''Return a dictionary which maps the names of the sources
+    ``source_names`` to the expected durations of rendering them.
+
+    '''
+    entries = project.manifest.entries
+    known_duration = known_size = 0
+    for source_name, entry in entries.iteritems():
+        path = os.path.join(project.source_dir, source_name)
+        if entry.duration is not None and path in project.manifest.stamps:
+            known_duration += entry.duration
+            known_size += project.manifest.stamps[path].size
+    costs = {}
+    for source_name in source_names:
+        entry = entries.get(source_name)
+        if entry is not None and entry.duration is not None:
+            costs[source_name] = entry.duration
+        elif known_size:
+            costs[source_name] = (
+                _source_size(project, source_name) * known_duration /
+                known_size)
+        else:
+            # nothing is known about the durations, so the sizes are the best
+            # estimate of the order of the costs
+            costs[source_name] = _source_size(project, source_name)
+    return costs
+
+
+def schedule(project, planned_outputs):
+    '''Return the ``swsg.manifest.PlannedOutput`` instances sorted by the
+    expected costs of rendering their sources, the most expensive first.
+
+    '''
+    costs = expected_costs(
+        project, [planned.source_name for planned in planned_outputs])
+    return sorted(
+        planned_outputs,
+        key=lambda planned: (-costs[planned.source_name], planned.source_name))
+
+
+def _initialize_worker(project, site_tree, TemplateClass, options):
+    _worker.update(
+        project=project, site_tree=site_tree, TemplateClass=TemplateClass,
+        options=options, templates={})
+
+
+def _render_in_worker(planned):
+    project = _worker['project']
+    start = time.time()
+    source = project.load_source(planned.source_name, _worker['site_tree'])
+    output = project.render_source(
+        source, _worker['TemplateClass'], _worker['templates'],
+        **_worker['options'])
+    duration = time.time() - start
+    # the stamps of the files which were read, so the main process does not
+    # have to hash them again
+    filenames = [
+        os.path.join(project.source_dir, planned.source_name),
+        os.path.join(project.template_dir, source.template_path)]
+    filenames.extend(source.read_files)
+    stamps = dict(
+        (filename, project.manifest.stamps[filename])
+        for filename in filenames if filename in project.manifest.stamps)
+    summary = CachedSource(
+        source.title, source.namespace['content'], source.template_path,
+        source.dependencies)
+    return planned, summary, output, duration, stamps
+
+
+def render_in_processes(project, planned_outputs, site_tree, TemplateClass,
+                        options, processes):
+    '''Render the sources of ``planned_outputs`` in ``processes`` worker
+    processes, the most expensive sources first. Yield the planned output,
+    a ``swsg.output_cache.CachedSource`` which stands in for the source, the
+    output and the duration of rendering in the order the sources are
+    finished.
+
+    '''
+    pool = multiprocessing.Pool(
+        processes, _initialize_worker,
+        (project, site_tree, TemplateClass, options))
+    finished = False
+    try:
+        results = pool.imap_unordered(
+            _render_in_worker, schedule(project, planned_outputs))
+        for planned, source, output, duration, stamps in results:
+            project.manifest.stamps.update(stamps)
+            yield planned, source, output, duration
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
@@ -0,0 +1,200 @@
+'''Maintain a client-side full-text search index of a project while rendering
+it. The index is an inverted index which is split into JSON shards: a term is
+stored in the shard ``crc32(term) % shards``. Only the postings of rendered or
+removed pages are updated, and a shard is only written if its content
+changed.
+
+The files are written into the directory "search" of the output directory:
+
+- meta.json: the number of shards and the tokenization parameters
+- documents.json: maps document ids to the URL and title of the pages
+- shard-N.json: maps terms to lists of ``[document id, term frequency]``
+
+'''
+import os
+import re
+import json
+import zlib
+from collections import defaultdict
+
+from swsg.loggers import swsg_logger as logger
+from swsg.stages import Stage
+from swsg.utils import html_to_text, write_atomically
+
+_word = re.compile(r'\w+', re.UNICODE)
+_shard_filename = re.compile(r'^shard-(\d+)\.json$')
+# shorter words are not indexed
+MIN_TERM_LENGTH = 2
+
+
+def tokenize(html):
+    '''return a dictionary which maps the terms of the HTML snippet ``html``
+    to their frequencies'''
+    frequencies = defaultdict(int)
+    for word in _word.findall(html_to_text(html).lower()):
+        if len(word) >= MIN_TERM_LENGTH:
+            frequencies[word] += 1
+    return dict(frequencies)
+
+
+def get_shard(term, shards):
+    return (zlib.crc32(term.encode('utf-8')) & 0xffffffff) % shards
+
+
+def dump_json(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+class SearchDocument(object):
+    def __init__(self, id, url, title, frequencies):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.frequencies = frequencies
+
+
+class SearchIndexStage(Stage):
+    '''Tokenize the content of every rendered page and update the sharded
+    search index in the directory ``directory`` of the output directory.
+
+    '''
+    name = 'search'
+    site_wide = True
+
+    def __init__(self, shards=16, directory='search'):
+        self.shards = shards
+        self.directory = directory
+
+    @classmethod
+    def from_config(cls, config):
+        '''Return a ``SearchIndexStage`` configured by the section "search" of
+        the project's configuration or ``None`` if there is no such section.
+
+        '''
+        if not config.has_section('search'):
+            return None
+        options = dict(config.items('search'))
+        return cls(int(options.get('shards', 16)))
+
+    def process(self, project, page):
+        # the new documents are kept in the state until the index is updated
+        # by ``finish``, so they are checkpointed together with the state
+        pending = self.get_state(project).setdefault('pending', {})
+        pending[page.source_name] = SearchDocument(
+            None, os.path.basename(page.output_path), page.source.title,
+            tokenize(page.source.namespace['content']))
+        return page.output
+
+    def finish(self, project, report):
+        state = self.get_state(project)
+        documents = state.setdefault('documents', {})
+        index_dir = os.path.join(project.output_dir, self.directory)
+        meta_path = os.path.join(index_dir, 'meta.json')
+        rebuild = (
+            state.get('shards') != self.shards or
+            not os.path.isfile(meta_path))
+        removed = set(documents).difference(project.manifest.entries)
+        # key is the name of the source, value is its new ``SearchDocument``
+        pending = state.pop('pending', {})
+        if not (pending or removed or rebuild):
+            return
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+        # the ids of the documents whose postings have to be replaced
+        touched_ids = set()
+        # terms whose postings changed, grouped by their shards
+        changed_terms = defaultdict(set)
+        new_documents = []
+        for source_name in removed:
+            document = documents.pop(source_name)
+            touched_ids.add(document.id)
+            self.add_terms(changed_terms, document)
+        for source_name, document in pending.iteritems():
+            old_document = documents.get(source_name)
+            if old_document is None:
+                document.id = state['next id'] = state.get('next id', 0) + 1
+            else:
+                document.id = old_document.id
+                touched_ids.add(document.id)
+                self.add_terms(changed_terms, old_document)
+            self.add_terms(changed_terms, document)
+            documents[source_name] = document
+            new_documents.append(document)
+        if rebuild:
+            logger.info('building the search index from scratch')
+            for shard in xrange(self.shards):
+                self.write_shard(index_dir, shard, {})
+            self.remove_stale_shards(index_dir)
+            touched_ids = set()
+            changed_terms = defaultdict(set)
+            new_documents = documents.values()
+            for document in new_documents:
+                self.add_terms(changed_terms, document)
+        new_postings = defaultdict(list)
+        for document in new_documents:
+            for term, frequency in document.frequencies.iteritems():
+                new_postings[term].append([document.id, frequency])
+        for shard, terms in changed_terms.iteritems():
+            self.update_shard(
+                index_dir, shard, terms, touched_ids, new_postings)
+        self.write_if_changed(
+            os.path.join(index_dir, 'documents.json'),
+            dump_json(dict(
+                (document.id, [document.url, document.title])
+                for document in documents.itervalues())))
+        meta = {'shards': self.shards, 'min_term_length': MIN_TERM_LENGTH}
+        self.write_if_changed(meta_path, dump_json(meta))
+        state['shards'] = self.shards
+
+    def add_terms(self, changed_terms, document):
+        for term in document.frequencies:
+            changed_terms[get_shard(term, self.shards)].add(term)
+
+    def shard_filename(self, index_dir, shard):
+        return os.path.join(index_dir, 'shard-{0}.json'.format(shard))
+
+    def remove_stale_shards(self, index_dir):
+        'remove the shards of an index which had more shards than this one'
+        for filename in os.listdir(index_dir):
+            match = _shard_filename.match(filename)
+            if match is not None and int(match.group(1)) >= self.shards:
+                path = os.path.join(index_dir, filename)
+                logger.info('removing the stale search index file {0}'.format(
+                    path))
+                os.remove(path)
+
+    def update_shard(self, index_dir, shard, terms, touched_ids,
+                     new_postings):
+        '''Replace the postings of the documents ``touched_ids`` for the
+        ``terms`` of the shard ``shard`` by ``new_postings``, which maps
+        terms to the postings of the new or changed documents.
+
+        '''
+        filename = self.shard_filename(index_dir, shard)
+        if os.path.isfile(filename):
+            with open(filename, 'rb') as fp:
+                postings = json.load(fp)
+        else:
+            postings = {}
+        for term in terms:
+            term_postings = [
+                posting for posting in postings.get(term, [])
+                if posting[0] not in touched_ids]
+            term_postings.extend(new_postings.get(term, []))
+            if term_postings:
+                postings[term] = sorted(term_postings)
+            else:
+                postings.pop(term, None)
+        self.write_shard(index_dir, shard, postings)
+
+    def write_shard(self, index_dir, shard, postings):
+        self.write_if_changed(
+            self.shard_filename(index_dir, shard), dump_json(postings))
+
+    def write_if_changed(self, filename, text):
+        if os.path.isfile(filename):
+            with open(filename, 'rb') as fp:
+                if fp.read() == text.encode('utf-8'):
+                    return
+        logger.info('writing the search index file {0}'.format(filename))
+        write_atomically(filename, [text])
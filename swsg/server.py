@@ -0,0 +1,213 @@
+'''A local HTTP server for previewing a project while editing it. Pages are
+rendered on demand from their sources when they are requested and cached until
+one of the files they were rendered from changes. Everything else is served
+from the project's output directory.
+
+'''
+import os
+import hashlib
+import urllib
+import urlparse
+import mimetypes
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from swsg.loggers import swsg_logger as logger
+from swsg.templates import get_template_class_by_template_language
+
+
+class PreviewPage(object):
+    '''A rendered page together with the digests it was rendered from.
+    ``etag`` is made of the SHA-256 digest of ``output``, the same digest
+    ``Project.render`` stores in the manifest as the output's digest.
+
+    '''
+    def __init__(self, output, inputs_digest, source_digest, template_path,
+                 dependencies):
+        self.etag = '"{0}"'.format(
+            hashlib.sha256(output.encode('utf-8')).hexdigest())
+        self.inputs_digest = inputs_digest
+        self.output = output
+        self.source_digest = source_digest
+        self.template_path = template_path
+        self.dependencies = dependencies
+
+
+class PreviewRenderer(object):
+    '''Renders single pages of ``project`` and keeps the loaded templates,
+    the configuration and the rendered pages in memory. Whether a page is
+    still up to date is checked with the stat information of its files, so
+    unchanged files are not read again.
+
+    '''
+    def __init__(self, project):
+        self.project = project
+        self.config_digest = None
+        self.TemplateClass = None
+        self.template_options = {}
+        # key is the path to the template, value is a tuple of the template's
+        # digest and the loaded template
+        self.templates = {}
+        # key is the name of the source, value is its ``PreviewPage``
+        self.pages = {}
+        # key is the file name of an output, value is the name of its source
+        self.source_names = {}
+        self.source_dir_mtime = None
+        self.site_tree = None
+        self.navigation_stamp = None
+
+    def refresh_config(self):
+        config = self.project.read_config()
+        if config.digest == self.config_digest:
+            return
+        template_language = config.get('general', 'template language')
+        self.TemplateClass = get_template_class_by_template_language(
+            template_language)
+        self.template_options = self.project.get_template_options(
+            self.TemplateClass)
+        self.templates.clear()
+        self.pages.clear()
+        self.config_digest = config.digest
+
+    def find_source(self, output_name):
+        '''return the name of the source whose output is called
+        ``output_name`` or ``None`` if there is no such source'''
+        source_dir = self.project.source_dir
+        mtime = os.stat(source_dir).st_mtime
+        if mtime != self.source_dir_mtime:
+            self.source_names = dict(
+                (os.path.basename(self.project.get_output_path(name)), name)
+                for name in os.listdir(source_dir))
+            self.source_dir_mtime = mtime
+        return self.source_names.get(output_name)
+
+    def refresh_site_tree(self):
+        scanned, removed = self.project.source_index.update(self.project)
+        navigation_filename = self.project.navigation_filename
+        if os.path.isfile(navigation_filename):
+            navigation_stamp = self.project.manifest.stamp(navigation_filename)
+        else:
+            navigation_stamp = None
+        if (self.site_tree is None or scanned or removed or
+            navigation_stamp != self.navigation_stamp):
+            self.site_tree = self.project.build_site_tree()
+            self.navigation_stamp = navigation_stamp
+
+    def make_inputs_digest(self, source_digest, template_digest,
+                           dependencies):
+        digests = [self.config_digest, source_digest, template_digest]
+        digests.extend(digest for key, digest in sorted(dependencies.items()))
+        return hashlib.sha256(''.join(digests)).hexdigest()
+
+    def is_up_to_date(self, page, source_digest):
+        if (page.source_digest != source_digest or
+            not os.path.isfile(page.template_path)):
+            return False
+        for key, digest in page.dependencies.iteritems():
+            if self.project.dependency_digest(key, self.site_tree) != digest:
+                return False
+        template_digest = self.project.manifest.stamp(
+            page.template_path).digest
+        return page.inputs_digest == self.make_inputs_digest(
+            source_digest, template_digest, page.dependencies)
+
+    def render(self, source_name):
+        '''Return the ``PreviewPage`` of the source ``source_name``. The
+        source is only rendered if it has not been rendered yet or if the
+        source, its template or the config file changed since then.
+
+        '''
+        self.refresh_config()
+        self.refresh_site_tree()
+        stamp = self.project.manifest.stamp
+        source_path = os.path.join(self.project.source_dir, source_name)
+        source_digest = stamp(source_path).digest
+        page = self.pages.get(source_name)
+        if page is not None and self.is_up_to_date(page, source_digest):
+            return page
+        logger.info('rendering the source {0}'.format(source_name))
+        source = self.project.load_source(source_name, self.site_tree)
+        source_digest = self.project.manifest.stamps[source_path].digest
+        template_path = os.path.join(
+            self.project.template_dir, source.template_path)
+        template_digest = stamp(template_path).digest
+        digest, template = self.templates.get(template_path, (None, None))
+        if digest != template_digest:
+            template = self.project.load_template(
+                template_path, self.TemplateClass)
+            template_digest = self.project.manifest.stamps[
+                template_path].digest
+            self.templates[template_path] = template_digest, template
+        output = source.render_template(template, **self.template_options)
+        inputs_digest = self.make_inputs_digest(
+            source_digest, template_digest, source.dependencies)
+        page = PreviewPage(
+            output, inputs_digest, source_digest, template_path,
+            source.dependencies)
+        self.pages[source_name] = page
+        return page
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    # set by ``PreviewServer``
+    renderer = None
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        path = urllib.unquote(urlparse.urlsplit(self.path).path)
+        output_name = path.lstrip('/') or 'index.html'
+        output_dir = self.server.project.output_dir
+        filename = os.path.normpath(os.path.join(output_dir, output_name))
+        if not filename.startswith(output_dir + os.sep):
+            self.send_error(404)
+            return
+        try:
+            source_name = self.renderer.find_source(output_name)
+            if source_name is not None:
+                page = self.renderer.render(source_name)
+                etag = page.etag
+                body = page.output.encode('utf-8')
+                content_type = 'text/html; charset=utf-8'
+            elif os.path.isfile(filename):
+                stamp = self.server.project.manifest.stamp(filename)
+                etag = '"{0}"'.format(stamp.digest)
+                with open(filename, 'rb') as fp:
+                    body = fp.read()
+                content_type = (
+                    mimetypes.guess_type(filename)[0] or
+                    'application/octet-stream')
+            else:
+                self.send_error(404)
+                return
+        except Exception, e:
+            logger.exception('could not render {0}'.format(output_name))
+            self.send_error(500, str(e))
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info('{0} - {1}'.format(self.client_address[0], format % args))
+
+
+class PreviewServer(HTTPServer):
+    def __init__(self, project, host='localhost', port=8000):
+        self.project = project
+
+        class RequestHandler(PreviewRequestHandler):
+            renderer = PreviewRenderer(project)
+        HTTPServer.__init__(self, (host, port), RequestHandler)
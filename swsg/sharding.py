@@ -0,0 +1,185 @@
+'''Split the rendering of a project into N shards which can be rendered by
+different processes or machines. Every source belongs to exactly one shard,
+determined by a stable hash of its name. A sharded rendering process does not
+update the projects file; it writes a partial build manifest instead, and the
+partial manifests of all shards are merged into the project afterwards.
+
+Paths inside the project directory are stored relative to it, so shards can
+be rendered in different checkouts of the same project.
+
+'''
+import os
+import json
+import hashlib
+from collections import namedtuple
+
+from swsg.manifest import ManifestEntry
+from swsg.utils import FileStamp, lists_to_tuples
+
+# the version of the format of partial manifests
+PARTIAL_MANIFEST_VERSION = 1
+
+# ``index`` is between 1 and ``count``
+Shard = namedtuple('Shard', 'index count')
+
+
+class InvalidPartialManifest(Exception):
+    def __init__(self, filename, reason):
+        self.filename = filename
+        self.reason = reason
+
+    def __str__(self):
+        return 'the partial manifest {0} is invalid: {1}'.format(
+            self.filename, self.reason)
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r})'.format(
+            self.__class__.__name__, self.filename, self.reason)
+
+
+def parse_shard(value):
+    'parse a shard like "2/4" (the second of four shards)'
+    try:
+        index, count = map(int, value.split('/'))
+    except ValueError:
+        raise ValueError('{0!r} is not a shard like "1/4"'.format(value))
+    if not 1 <= index <= count:
+        raise ValueError(
+            'the shard {0!r} is not between 1 and {1}'.format(value, count))
+    return Shard(index, count)
+
+
+def in_shard(source_name, shard):
+    '''Return whether the source ``source_name`` belongs to ``shard``. The
+    hash of the name does not depend on the machine or the Python process.
+
+    '''
+    digest = hashlib.sha1(source_name.encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard.count == shard.index - 1
+
+
+def _encode_entry(project, entry):
+    dependencies = []
+    for key, digest in sorted(entry.dependencies.iteritems()):
+        if key[0] == 'file':
+            key = (key[0], project.relative_path(key[1]))
+        dependencies.append([key, digest])
+    return {
+        'output_path': project.relative_path(entry.output_path),
+        'source_digest': entry.source_digest,
+        'template_path': project.relative_path(entry.template_path),
+        'template_digest': entry.template_digest,
+        'config_digest': entry.config_digest,
+        'output_digest': entry.output_digest,
+        'modified': entry.modified,
+        'duration': entry.duration,
+        'site_tree_digest': entry.site_tree_digest,
+        'dependencies': dependencies}
+
+
+def _decode_entry(project, data):
+    dependencies = {}
+    for key, digest in data['dependencies']:
+        key = lists_to_tuples(key)
+        if key[0] == 'file':
+            key = (key[0], project.absolute_path(key[1]))
+        dependencies[key] = digest
+    entry = ManifestEntry(
+        project.absolute_path(data['output_path']),
+        data['source_digest'],
+        project.absolute_path(data['template_path']),
+        data['template_digest'],
+        data['config_digest'],
+        data['output_digest'],
+        dependencies)
+    entry.modified = data['modified']
+    # partial manifests of older versions of swsg have no durations and no
+    # digests of the site tree
+    entry.duration = data.get('duration')
+    entry.site_tree_digest = data.get('site_tree_digest')
+    return entry
+
+
+def dump_partial_manifest(project, shard, fp):
+    '''Write the entries of the build manifest of ``project`` which belong
+    to the sources of ``shard`` into the file object ``fp`` as JSON.
+
+    '''
+    manifest = project.manifest
+    entries = dict(
+        (source_name, entry)
+        for source_name, entry in manifest.entries.iteritems()
+        if in_shard(source_name, shard))
+    # only the stamps of the files which were used by the shard are written,
+    # so merging the partial manifests never replaces a recent stamp with an
+    # old one of another shard
+    filenames = set([project.config_filename])
+    for source_name, entry in entries.iteritems():
+        filenames.add(os.path.join(project.source_dir, source_name))
+        filenames.add(entry.template_path)
+        filenames.update(
+            key[1] for key in entry.dependencies if key[0] == 'file')
+    stamps = dict(
+        (project.relative_path(filename), list(manifest.stamps[filename]))
+        for filename in filenames if filename in manifest.stamps)
+    json.dump({
+        'version': PARTIAL_MANIFEST_VERSION,
+        'shard': list(shard),
+        'entries': dict(
+            (source_name, _encode_entry(project, entry))
+            for source_name, entry in entries.iteritems()),
+        'stamps': stamps}, fp, indent=1, sort_keys=True)
+
+
+def load_partial_manifest(project, filename):
+    'return the shard, the entries and the stamps of a partial manifest'
+    with open(filename) as fp:
+        try:
+            data = json.load(fp)
+        except ValueError, e:
+            raise InvalidPartialManifest(filename, str(e))
+    if data.get('version') != PARTIAL_MANIFEST_VERSION:
+        raise InvalidPartialManifest(filename, 'unsupported version')
+    shard = Shard(*data['shard'])
+    entries = dict(
+        (source_name, _decode_entry(project, entry))
+        for source_name, entry in data['entries'].iteritems())
+    stamps = dict(
+        (project.absolute_path(filename), FileStamp(*stamp))
+        for filename, stamp in data['stamps'].iteritems())
+    return shard, entries, stamps
+
+
+def merge_partial_manifests(project, filenames):
+    '''Merge the partial manifests ``filenames`` into the build manifest of
+    ``project``. Sources of a shard which are not in its partial manifest
+    were removed, so they are removed from the build manifest as well.
+    Return the shards which were merged.
+
+    The merged sources whose outputs changed are remembered as unstaged, so
+    the site-wide stages
+    (e.g. the feeds and the search index), which are disabled for shards,
+    see them during the next rendering process of the whole project.
+
+    '''
+    partial_manifests = [
+        load_partial_manifest(project, filename) for filename in filenames]
+    counts = set(shard.count for shard, _, _ in partial_manifests)
+    if len(counts) > 1:
+        raise ValueError(
+            'the partial manifests belong to different numbers of shards')
+    manifest = project.manifest
+    for shard, entries, stamps in partial_manifests:
+        removed_sources = [
+            source_name for source_name in manifest.entries
+            if in_shard(source_name, shard) and source_name not in entries]
+        manifest.remove(removed_sources)
+        changed_sources = [
+            source_name for source_name, entry in entries.iteritems()
+            if source_name not in manifest.entries or
+            manifest.entries[source_name].output_digest != entry.output_digest]
+        manifest.entries.update(entries)
+        manifest.unstaged = manifest.unstaged.union(changed_sources)
+        manifest.stamps.update(stamps)
+    project.update_projects_file()
+    return sorted(shard for shard, _, _ in partial_manifests)
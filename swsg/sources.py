@@ -1,7 +1,8 @@
 from os import path
 from functools import partial
 
-from docutils.core import publish_parts as rest
+from docutils import io as docutils_io
+from docutils.core import publish_programmatically
 installed_markups = set(['rest'])
 try:
     from markdown import markdown
@@ -21,11 +22,16 @@ except ImportError:
     pass
 
 from swsg import NoninstalledPackage
+from swsg import highlighting
 from swsg.template_functions import clevercss
 
 SUPPORTED_MARKUP_LANGUAGES = frozenset(
     ['rest', 'creole', 'textile', 'markdown'])
 
+# the variables which can be assigned in the first lines of a source
+HEADER_VARIABLES = (u'title', u'template')
+HEADER_LINES = 2
+
 
 class UnsupportedMarkup(Exception):
     def __init__(self, markup):
@@ -38,34 +44,91 @@ class UnsupportedMarkup(Exception):
         return '{0}({1})'.format(self.__class__.__name__, self.markup)
 
 
+def parse_header_line(line):
+    '''Return a tuple of the variable's name and its value if ``line``
+    assigns one of the variables listed in ``HEADER_VARIABLES``, otherwise
+    return ``None``.
+
+    '''
+    for name in HEADER_VARIABLES:
+        prefix = name + u':'
+        if line.startswith(prefix):
+            return name, line[len(prefix):].strip()
+    return None
+
+
+def split_header(text):
+    '''Split the text of a source into its header and its body. Return a
+    dictionary of the variables assigned in the header and the text without
+    the lines which assign them. Only the first ``HEADER_LINES`` lines can
+    assign variables, and only if they are followed by a newline.
+
+    '''
+    lines = text.split(u'\n', HEADER_LINES)
+    # the last item is the rest of the text after the first lines
+    first_lines, rest = lines[:-1], lines[-1]
+    header = {}
+    body_lines = []
+    for line in first_lines:
+        assignment = parse_header_line(line)
+        if assignment is None:
+            body_lines.append(line)
+        else:
+            name, value = assignment
+            header[name] = value
+    return header, u'\n'.join(body_lines + [rest])
+
+
+def scan_header(filename):
+    '''Read only the first ``HEADER_LINES`` lines of the source file
+    ``filename`` and return a dictionary of the variables assigned there,
+    like :func:`split_header` does for the whole text.
+
+    '''
+    with open(filename) as fp:
+        # a source may consist of a single very long line, so never read
+        # more than a few kilobytes
+        data = ''.join(fp.readline(4096) for i in xrange(HEADER_LINES))
+    return split_header(data.decode('utf-8', 'replace'))[0]
+
+
+def rest(text, source_path=None):
+    '''Convert the ReST document ``text`` to HTML. Return the body of the
+    HTML document and the absolute paths of the files which were read while
+    converting it (e.g. by the directive "include"). Relative paths in the
+    document are relative to the directory of ``source_path``.
+
+    '''
+    output, publisher = publish_programmatically(
+        source_class=docutils_io.StringInput, source=text,
+        source_path=source_path, destination_class=docutils_io.StringOutput,
+        destination=None, destination_path=None, reader=None,
+        reader_name='standalone', parser=None, parser_name='restructuredtext',
+        writer=None, writer_name='html', settings=None, settings_spec=None,
+        # the stylesheet is not part of the body, so it is not read
+        settings_overrides={'embed_stylesheet': False}, config_section=None,
+        enable_exit_status=False)
+    read_files = [
+        path.abspath(filename)
+        for filename in publisher.settings.record_dependencies.list]
+    return publisher.writer.parts['body'], read_files
+
+
 class BaseSource(object):
-    def __init__(self, template_dir, default_template, text):
-        splitted_text = text.split(u'\n', 2)
-        try:
-            first_line, second_line, rest = splitted_text
-            first_lines = [first_line, second_line]
-        except ValueError:
-            # there is only one newline or no newline at all
-            try:
-                first_line, rest = splitted_text
-                first_lines = [first_line]
-            except ValueError:
-                # there is no newline in the text, therefore there are no
-                # variable assignments
-                first_lines = []
-                rest = text
-        title = u''
-        template = u''
-        temp_first_lines = first_lines[:]
-        for line in first_lines:
-            # remove the line from the list of the first two lines where a
-            # variable assignment can be found
-            if line.startswith(u'title:'):
-                title = line.lstrip(u'title:').strip()
-                temp_first_lines.remove(line)
-            elif line.startswith(u'template:'):
-                template = line.lstrip(u'template:').strip()
-                temp_first_lines.remove(line)
+    def __init__(self, template_dir, default_template, text,
+                 template_functions=None, dependencies=None, filename=None):
+        # collects everything the output depends on besides the source and
+        # its template, e.g. the results of template functions
+        self.dependencies = {} if dependencies is None else dependencies
+        # the path of the source file; files which are included by the
+        # source are relative to it
+        self.filename = filename
+        # the files besides the source file which were read while rendering
+        # the source without its template
+        self.read_files = []
+        header, body = split_header(text)
+        title = header.get(u'title', u'')
+        template = header.get(u'template', u'')
         # if the title is not set, "unknown" will be used. That means that
         # setting the title is highly recommended!
         self.title = title or u'unknown'
@@ -76,7 +139,7 @@ class BaseSource(object):
             template_dir,
             template or default_template)
         self.full_text = text
-        self.text = u'\n'.join(temp_first_lines + [rest])
+        self.text = body
 
         try:
             rendered_source = self.render_templateless()
@@ -86,6 +149,9 @@ class BaseSource(object):
             'title': self.title,
             'content': rendered_source,
             'clevercss': clevercss}
+        # additional functions like ``sitemap`` and ``breadcrumbs`` which
+        # depend on the project the source belongs to
+        self.namespace.update(template_functions or {})
 
     def __eq__(self, other):
         return type(self) == type(other) and self.full_text == other.full_text
@@ -103,13 +169,21 @@ class BaseSource(object):
         # render the template with the source's namespace
         with open(self.template_path) as fp:
             text = fp.read().decode('utf-8')
-        template = TemplateClass(text)
+        return self.render_template(TemplateClass(text), **template_options)
+
+    def render_template(self, template, **template_options):
+        'render the already loaded ``template`` with the source\'s namespace'
         return template.render(self.namespace, **template_options)
 
 
+# code blocks of ReST sources are highlighted by the cached directive "code"
+highlighting.register_directives()
+
+
 class ReSTSource(BaseSource):
     def render_templateless(self):
-        return rest(self.text, writer_name='html')['body']
+        body, self.read_files = rest(self.text, self.filename)
+        return body
 
 
 class CreoleSource(BaseSource):
@@ -126,7 +200,11 @@ class TextileSource(BaseSource):
 
 class MarkdownSource(BaseSource):
     def render_templateless(self):
-        return markdown(self.text, output_format='xhtml')
+        extensions = []
+        if highlighting.pygments is not None:
+            extensions.append(highlighting.HighlightExtension())
+        return markdown(
+            self.text, output_format='xhtml', extensions=extensions)
 
 
 def get_source_class_by_markup(markup):
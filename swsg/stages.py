@@ -0,0 +1,59 @@
+'''Optional stages of the rendering process. A stage sees every output right
+after it has been rendered and may change it before it is yielded by
+``Project.render``. At the end of the rendering process, after stale outputs
+have been pruned, every stage is finished with the ``RenderReport`` of the
+rendering process, so it only has to deal with what actually changed.
+
+'''
+
+
+class RenderedPage(object):
+    '''An output which has just been rendered. ``previous_entry`` is the
+    ``swsg.manifest.ManifestEntry`` of the last rendering of the source or
+    ``None`` if the source has never been rendered before.
+
+    '''
+    def __init__(self, source_name, source, output_path, output,
+                 previous_entry=None):
+        self.source_name = source_name
+        self.source = source
+        self.output_path = output_path
+        self.output = output
+        self.previous_entry = previous_entry
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.output_path)
+
+
+class Stage(object):
+    'base class for the stages of the rendering process'
+
+    # the key of the data of the stage which is kept in the build manifest
+    name = None
+    # whether the stage needs to see the pages of the whole site (e.g. for
+    # writing a feed); such stages cannot be used when rendering a shard
+    site_wide = False
+
+    def get_state(self, project):
+        '''return the persistent state of the stage, a dictionary which is
+        pickled together with the project'''
+        return project.manifest.stage_data.setdefault(self.name, {})
+
+    def process(self, project, page):
+        '''Called for every rendered ``RenderedPage``. Return the (possibly
+        changed) output of the page.
+
+        '''
+        return page.output
+
+    def checkpoint(self, project):
+        '''Called before the state of the rendering process is checkpointed.
+        Everything the stage did for the pages which have been rendered so
+        far has to be finished or recorded in its state afterwards.
+
+        '''
+        pass
+
+    def finish(self, project, report):
+        'called at the end of the rendering process'
+        pass
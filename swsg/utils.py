@@ -1,10 +1,108 @@
+import os
+import re
+import mmap
 from functools import partial
 from operator import is_
 from hashlib import sha256
+from collections import namedtuple
+from HTMLParser import HTMLParser
 
 is_none = partial(is_, None)
 
-def hash_file(filename):
-    with open(filename) as fp:
-        text = fp.read()
-    return sha256(text).hexdigest()
+# files are hashed in chunks of this size, so hashing a file never needs more
+# memory than that
+HASH_CHUNK_SIZE = 64 * 1024
+
+# files of at least this size are memory-mapped for hashing, which saves
+# copying them chunk by chunk into Python strings
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# the stat information of a file together with the hash of its content
+FileStamp = namedtuple('FileStamp', 'mtime size digest')
+
+_html_tag = re.compile(r'<[^>]*>')
+_whitespace = re.compile(r'\s+', re.UNICODE)
+
+
+def hash_file(filename, use_mmap=False):
+    '''Return the SHA-256 hex digest of the content of ``filename``. The file
+    is read in chunks of ``HASH_CHUNK_SIZE`` bytes or, if ``use_mmap`` is
+    true, memory-mapped instead of being read into memory at once.
+
+    '''
+    hash_ = sha256()
+    with open(filename, 'rb') as fp:
+        # empty files cannot be memory-mapped
+        if use_mmap and os.fstat(fp.fileno()).st_size:
+            mapped_file = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                hash_.update(mapped_file)
+            finally:
+                mapped_file.close()
+        else:
+            for chunk in iter(partial(fp.read, HASH_CHUNK_SIZE), b''):
+                hash_.update(chunk)
+    return hash_.hexdigest()
+
+
+def stamp_file(filename, previous=None):
+    '''Return a ``FileStamp`` of the file ``filename``. If the modification
+    time and the size of the file did not change since ``previous`` was
+    created, the file is not read again and ``previous`` is returned. Files
+    of at least ``MMAP_THRESHOLD`` bytes are memory-mapped for hashing.
+
+    '''
+    stat = os.stat(filename)
+    if (previous is not None and
+        (previous.mtime, previous.size) == (stat.st_mtime, stat.st_size)):
+        return previous
+    digest = hash_file(filename, use_mmap=stat.st_size >= MMAP_THRESHOLD)
+    return FileStamp(stat.st_mtime, stat.st_size, digest)
+
+
+def read_file(filename):
+    '''Read the file ``filename`` exactly once and return its content and its
+    ``FileStamp``. The digest is calculated from the same buffer which is
+    returned, so the file does not have to be read again for hashing it.
+
+    '''
+    with open(filename, 'rb') as fp:
+        # stat before reading: if the file is changed while it is read, the
+        # stamp will be outdated and the file is hashed again next time
+        stat = os.fstat(fp.fileno())
+        data = fp.read()
+    digest = sha256(data).hexdigest()
+    return data, FileStamp(stat.st_mtime, stat.st_size, digest)
+
+
+def html_to_text(html):
+    '''Return the text of the HTML snippet ``html``: tags are removed,
+    entities are replaced and whitespace is collapsed.
+
+    '''
+    text = HTMLParser().unescape(_html_tag.sub(u' ', html))
+    return _whitespace.sub(u' ', text).strip()
+
+
+def write_atomically(filename, chunks):
+    '''Write the unicode strings yielded by ``chunks`` UTF-8 encoded into a
+    temporary file and rename it to ``filename`` afterwards, so readers never
+    see a partially written file.
+
+    '''
+    temp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+    with open(temp_filename, 'wb') as fp:
+        for chunk in chunks:
+            fp.write(chunk.encode('utf-8'))
+    os.rename(temp_filename, filename)
+
+
+def lists_to_tuples(value):
+    '''Convert the lists in ``value`` recursively to tuples. JSON has no
+    tuples, so this is needed to restore tuples (e.g. the keys of the
+    dependencies of a ``swsg.manifest.ManifestEntry``) from JSON.
+
+    '''
+    if isinstance(value, list):
+        return tuple(lists_to_tuples(item) for item in value)
+    return value
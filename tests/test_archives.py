@@ -0,0 +1,92 @@
+import tarfile
+import zipfile
+
+import py
+from swsg import archives
+from swsg.archives import (DEFAULT_ARCHIVE_MTIME, OutputArchive,
+    ZipArchiveWriter, archive_format)
+from swsg.pipeline import write_output
+
+from utils import make_project
+
+
+def pytest_funcarg__temp_project(request):
+    project = make_project(request.getfuncargvalue('tmpdir'), dict(
+        ('{0}.rest'.format(name), u'text of ' + name)
+        for name in ('b', 'a', 'c')))
+    style = py.path.local(project.output_dir).join('style.css')
+    style.write('p {}')
+    # the file was not written by the rendering process
+    style.setmtime(style.mtime() - 10)
+    return project
+
+
+def render(project, filename, delta=False):
+    archive = OutputArchive(project, filename, delta)
+    for output_path, output in project.render():
+        write_output(output_path, output)
+        archive.add(output_path, output)
+    return archive.write()
+
+
+def test_archive_format():
+    assert archive_format('site.tar.gz') == ('tar', 'gzip')
+    assert archive_format('site.zip') == ('zip', None)
+    py.test.raises(ValueError, "archive_format('site.rar')")
+
+
+def test_tar_archive(temp_project, tmpdir, monkeypatch):
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    filename = str(tmpdir.join('site.tar.gz'))
+    assert render(temp_project, filename) == 4
+    with tarfile.open(filename) as archive:
+        members = archive.getmembers()
+        assert [member.name for member in members] == [
+            'a.html', 'b.html', 'c.html', 'style.css']
+        assert all(
+            member.mtime == DEFAULT_ARCHIVE_MTIME for member in members)
+        assert archive.extractfile('style.css').read() == 'p {}'
+        assert 'text of b' in archive.extractfile('b.html').read()
+    # an archive of the same outputs is the same
+    content = py.path.local(filename).read('rb')
+    archive = OutputArchive(temp_project, filename)
+    archive.write()
+    assert py.path.local(filename).read('rb') == content
+
+
+def test_delta_archive(temp_project, tmpdir):
+    render(temp_project, str(tmpdir.join('site.zip')))
+    source_dir = py.path.local(temp_project.source_dir)
+    source_dir.join('b.rest').write(u'changed text of b')
+    # the output of "c" is rendered again, but it does not change
+    source_dir.join('c.rest').write(u'text of c\n')
+    filename = str(tmpdir.join('delta.zip'))
+    assert render(temp_project, filename, delta=True) == 1
+    with zipfile.ZipFile(filename) as archive:
+        assert archive.namelist() == ['b.html']
+        assert 'changed text of b' in archive.read('b.html')
+
+
+def test_failed_archive(temp_project, tmpdir, monkeypatch):
+    def add(self, name, data):
+        raise IOError('disk full')
+    monkeypatch.setattr(ZipArchiveWriter, 'add', add)
+    filename = str(tmpdir.join('site.zip'))
+    py.test.raises(IOError, 'render(temp_project, filename)')
+    # the temporary file of the archive is removed
+    assert tmpdir.listdir(lambda path: path.basename.startswith('site.')) == []
+
+
+def test_spooled_outputs(temp_project, tmpdir, monkeypatch):
+    monkeypatch.setattr(archives, 'SPOOL_SIZE', 10)
+    filename = str(tmpdir.join('site.tar'))
+    archive = OutputArchive(temp_project, filename)
+    for output_path, output in temp_project.render():
+        write_output(output_path, output)
+        archive.add(output_path, output)
+    # rendered outputs are not read from the output directory again
+    py.path.local(temp_project.output_dir).join('a.html').write('changed')
+    assert archive.write() == 4
+    with tarfile.open(filename) as tar_archive:
+        assert 'text of a' in tar_archive.extractfile('a.html').read()
+        assert 'text of c' in tar_archive.extractfile('c.html').read()
@@ -0,0 +1,52 @@
+import py
+from swsg.builds import render_projects, select_projects
+from swsg.projects import Project, get_project_by_path
+
+
+def pytest_funcarg__temp_projects(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    projects_filename = str(tmpdir.join('projects.shelve'))
+    projects = []
+    for name in ('blog', 'docs', 'wiki'):
+        project = Project(str(tmpdir), name, projects_filename)
+        project.init()
+        source_dir = py.path.local(project.source_dir)
+        for i in xrange(3):
+            source_dir.join('page{0}.rest'.format(i)).write(
+                u'{0} {1}'.format(name, i))
+        projects.append(project)
+    return projects
+
+
+def test_select_projects(temp_projects):
+    blog, docs, wiki = temp_projects
+    assert select_projects(temp_projects) == [blog, docs, wiki]
+    assert select_projects(temp_projects, ['blog', '*/wiki']) == [blog, wiki]
+    assert select_projects(temp_projects, ['nothing']) == []
+    # the projects which took longest the last time are rendered first
+    list(wiki.render(save=False))
+    for entry in wiki.manifest.entries.itervalues():
+        entry.duration = 1.0
+    assert select_projects(temp_projects) == [wiki, blog, docs]
+
+
+def test_render_projects(temp_projects):
+    blog, docs, wiki = temp_projects
+    # a project which fails does not stop the others
+    py.path.local(docs.config_filename).remove()
+    results = sorted(render_projects(temp_projects, 2))
+    assert [result.name for result in results] == ['blog', 'docs', 'wiki']
+    assert [result.rendered for result in results] == [3, 0, 3]
+    assert results[0].error is None
+    assert 'IOError' in results[1].error
+    for project in (blog, wiki):
+        output_dir = py.path.local(project.output_dir)
+        assert output_dir.join('page1.html').check()
+        # the projects file was updated by this process
+        saved_project = get_project_by_path(
+            project.project_dir, project.projects_file_name)
+        assert len(saved_project.manifest.entries) == 3
+        assert saved_project.plan().rebuild == []
+    saved_project = get_project_by_path(
+        docs.project_dir, docs.projects_file_name)
+    assert saved_project.manifest.entries == {}
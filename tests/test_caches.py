@@ -0,0 +1,96 @@
+import os
+
+import py
+from swsg.caches import (CacheManager, DirectoryCache, parse_age,
+    parse_size)
+
+
+def test_directory_cache(tmpdir):
+    cache = DirectoryCache(str(tmpdir.join('cache')))
+    key = 'abcdef'
+    assert cache.get(key) is None
+    assert key not in cache
+    cache.put(key, 'value')
+    assert key in cache
+    assert cache.get(key) == 'value'
+    cache.put(key, 'new value')
+    assert cache.get(key) == 'new value'
+    # no temporary files are left
+    assert tmpdir.join('cache', 'ab').listdir() == [
+        tmpdir.join('cache', 'ab', key)]
+
+
+def make_caches(tmpdir):
+    '''create two caches; the values of the first cache were accessed
+    before the values of the second one'''
+    minify = DirectoryCache(str(tmpdir.join('minify')))
+    highlight = DirectoryCache(str(tmpdir.join('highlight')))
+    for i, key in enumerate(['aa1', 'aa2', 'bb3']):
+        minify.put(key, 'x' * 100)
+        os.utime(minify.path(key), (1000 + i, 1000 + i))
+        highlight.put(key, 'y' * 10)
+        os.utime(highlight.path(key), (2000 + i, 2000 + i))
+    return minify, highlight
+
+
+def test_directory_cache_records_access(tmpdir):
+    cache = DirectoryCache(str(tmpdir))
+    cache.put('abc', 'value')
+    os.utime(cache.path('abc'), (1000, 1000))
+    cache.get('abc')
+    assert os.path.getmtime(cache.path('abc')) > 1000
+
+
+def test_parse_size_and_age():
+    assert parse_size('100') == 100
+    assert parse_size('2k') == 2048
+    assert parse_size('1.5G') == int(1.5 * 1024 ** 3)
+    assert parse_size('500 MB') == 500 * 1024 ** 2
+    py.test.raises(ValueError, "parse_size('many')")
+    assert parse_age('2') == 2 * 24 * 60 * 60
+    assert parse_age('12h') == 12 * 60 * 60
+    assert parse_age('30m') == 30 * 60
+    py.test.raises(ValueError, "parse_age('1y')")
+
+
+def test_cache_stats(tmpdir):
+    make_caches(tmpdir)
+    manager = CacheManager(str(tmpdir))
+    assert manager.caches() == ['highlight', 'minify']
+    assert manager.stats() == {'highlight': (3, 30), 'minify': (3, 300)}
+    assert CacheManager(str(tmpdir.join('missing'))).stats() == {}
+
+
+def test_collect_garbage(tmpdir):
+    minify, highlight = make_caches(tmpdir)
+    # an interrupted write of a crashed process
+    tmpdir.join('minify', 'aa', 'aa4.host.1.tmp').write('z')
+    os.utime(str(tmpdir.join('minify', 'aa', 'aa4.host.1.tmp')), (0, 0))
+    manager = CacheManager(str(tmpdir), max_age=3999)
+    assert manager.collect_garbage(now=5000) == (2, 101)
+    assert manager.stats() == {'highlight': (3, 30), 'minify': (2, 200)}
+    # the least recently used values are evicted first
+    manager = CacheManager(str(tmpdir), max_size=125)
+    assert manager.collect_garbage(now=5000) == (2, 200)
+    assert manager.stats() == {'highlight': (3, 30), 'minify': (0, 0)}
+    assert minify.get('bb3') is None
+    assert highlight.get('bb3') == 'y' * 10
+
+
+def test_clear(tmpdir):
+    make_caches(tmpdir)
+    manager = CacheManager(str(tmpdir))
+    assert manager.clear(['minify']) == (3, 300)
+    assert manager.stats() == {'highlight': (3, 30), 'minify': (0, 0)}
+    assert manager.clear() == (3, 30)
+
+
+def test_from_config(tmpdir):
+    config_file = tmpdir.join('config')
+    config_file.write('[cache]\nmax size = 1M\nmax age = 7\n')
+    manager = CacheManager.from_config(str(tmpdir), str(config_file))
+    assert manager.max_size == 1024 ** 2
+    assert manager.max_age == 7 * 24 * 60 * 60
+    manager = CacheManager.from_config(
+        str(tmpdir), str(tmpdir.join('missing')))
+    assert not manager.has_limits
@@ -0,0 +1,71 @@
+import json
+
+import py
+from swsg.changes import ChangeManifestStage
+
+from utils import make_project, render
+
+
+def pytest_funcarg__temp_project(request):
+    return make_project(request.getfuncargvalue('tmpdir'), dict(
+        ('{0}.rest'.format(name), u'text of ' + name)
+        for name in ('a', 'b', 'c')))
+
+
+def render_changes(project, filename):
+    'render ``project`` and return the changes of the rendering process'
+    render(project, stages=[ChangeManifestStage(filename)])
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def paths(changes, kind):
+    return [change['path'] for change in changes[kind]]
+
+
+def test_change_manifest(temp_project, tmpdir):
+    filename = str(tmpdir.join('changes.json'))
+    changes = render_changes(temp_project, filename)
+    assert changes['version'] == 1
+    assert paths(changes, 'added') == ['a.html', 'b.html', 'c.html']
+    assert changes['modified'] == changes['deleted'] == []
+    output_dir = py.path.local(temp_project.output_dir)
+    digest = changes['added'][1]['sha256']
+    assert digest == temp_project.manifest.entries['b.rest'].output_digest
+    source_dir = py.path.local(temp_project.source_dir)
+    source_dir.join('a.rest').write(u'changed text of a')
+    # the output of "c" is rendered again, but it does not change
+    source_dir.join('c.rest').write(u'text of c\n')
+    source_dir.join('b.rest').remove()
+    source_dir.join('d.rest').write(u'text of d')
+    changes = render_changes(temp_project, filename)
+    assert paths(changes, 'added') == ['d.html']
+    assert paths(changes, 'modified') == ['a.html']
+    assert changes['deleted'] == [{'path': 'b.html', 'sha256': digest}]
+    assert not output_dir.join('b.html').check()
+    # nothing changed
+    changes = render_changes(temp_project, filename)
+    assert changes['added'] == changes['modified'] == changes['deleted'] == []
+
+
+def test_deleted_digest(temp_project, tmpdir):
+    # the outputs were rendered without a change manifest
+    render(temp_project)
+    digest = temp_project.manifest.entries['b.rest'].output_digest
+    py.path.local(temp_project.source_dir).join('b.rest').remove()
+    changes = render_changes(temp_project, str(tmpdir.join('changes.json')))
+    assert changes['deleted'] == [{'path': 'b.html', 'sha256': digest}]
+
+
+def test_changed_output_path(temp_project, tmpdir):
+    filename = str(tmpdir.join('changes.json'))
+    render_changes(temp_project, filename)
+    entry = temp_project.manifest.entries['a.rest']
+    old_output = py.path.local(temp_project.output_dir).join('old-a.html')
+    py.path.local(entry.output_path).move(old_output)
+    entry.output_path = str(old_output)
+    py.path.local(temp_project.source_dir).join('a.rest').write(u'new text')
+    changes = render_changes(temp_project, filename)
+    assert paths(changes, 'added') == ['a.html']
+    assert changes['deleted'] == [
+        {'path': 'old-a.html', 'sha256': entry.output_digest}]
@@ -0,0 +1,106 @@
+import py
+from swsg.checkpoints import Checkpoint
+from swsg.manifest import RenderReport
+from swsg.pipeline import write_output
+from swsg.projects import get_project_by_path
+from swsg.stages import Stage
+
+from utils import make_project
+
+
+def pytest_funcarg__temp_project(request):
+    return make_project(request.getfuncargvalue('tmpdir'), dict(
+        ('page{0}.rest'.format(i), u'text {0}'.format(i))
+        for i in xrange(5)))
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CountingStage(Stage):
+    name = 'counting'
+
+    def __init__(self):
+        self.checkpoints = 0
+
+    def process(self, project, page):
+        state = self.get_state(project)
+        state[page.source_name] = state.get(page.source_name, 0) + 1
+        return page.output
+
+    def checkpoint(self, project):
+        self.checkpoints += 1
+
+
+def render(project, outputs=None, **options):
+    'render ``project`` and stop after ``outputs`` outputs'
+    rendered = []
+    for output_path, output in project.render(**options):
+        write_output(output_path, output)
+        rendered.append(py.path.local(output_path).basename)
+        if len(rendered) == outputs:
+            raise Interrupted
+    return rendered
+
+
+def test_output_written():
+    checkpoint = Checkpoint('checkpoint', every=2, interval=None)
+    assert not checkpoint.output_written()
+    assert checkpoint.output_written()
+    checkpoint = Checkpoint('checkpoint', every=None, interval=0)
+    assert checkpoint.output_written()
+
+
+def test_resume(temp_project):
+    filename = py.path.local(temp_project.project_dir).join('.checkpoint')
+    checkpoint = Checkpoint(str(filename), every=2, interval=None)
+    stage = CountingStage()
+    py.test.raises(
+        Interrupted,
+        'render(temp_project, 3, checkpoint=checkpoint, stages=[stage])')
+    assert filename.check()
+    assert stage.checkpoints == 1
+    # the projects file was not updated, so without the checkpoint every
+    # source would be rendered again
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.manifest.entries == {}
+    assert len(project.plan().rebuild) == 5
+    # only the outputs which were checkpointed are not rendered again
+    report = RenderReport()
+    checkpoint = Checkpoint(str(filename), every=2, interval=None)
+    rendered = render(
+        project, checkpoint=checkpoint, resume=True, report=report,
+        stages=[CountingStage()])
+    assert rendered == ['page2.html', 'page3.html', 'page4.html']
+    assert len(report.rendered) == 5
+    # the state of the stages is restored as well
+    assert project.manifest.stage_data['counting'] == {
+        'page0.rest': 1, 'page1.rest': 1, 'page2.rest': 1, 'page3.rest': 1,
+        'page4.rest': 1}
+    # the checkpoint is removed after the rendering process finished
+    assert not filename.check()
+    assert project.plan().rebuild == []
+
+
+def test_resume_with_unwritten_outputs(temp_project):
+    filename = py.path.local(temp_project.project_dir).join('.checkpoint')
+    checkpoint = Checkpoint(str(filename), every=2, interval=None)
+    py.test.raises(
+        Interrupted, 'render(temp_project, 2, checkpoint=checkpoint)')
+    # the outputs which were not written are rendered again
+    output_dir = py.path.local(temp_project.output_dir)
+    output_dir.join('page0.html').remove()
+    output_dir.join('page1.html').write('interrupted')
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    checkpoint = Checkpoint(str(filename))
+    assert len(render(project, checkpoint=checkpoint, resume=True)) == 5
+
+
+def test_resume_without_checkpoint(temp_project):
+    filename = py.path.local(temp_project.project_dir).join('.checkpoint')
+    filename.write('broken')
+    checkpoint = Checkpoint(str(filename))
+    assert len(render(temp_project, checkpoint=checkpoint, resume=True)) == 5
@@ -1,8 +1,15 @@
+from functools import partial
+
 import py
-from swsg.cli import parse_args, validate_change_config
+from swsg import cli
+from swsg.cli import parse_args, render, validate_change_config
 from swsg import __version__ as swsg_version
 from swsg.sources import SUPPORTED_MARKUP_LANGUAGES
 from swsg.templates import SUPPORTED_TEMPLATE_ENGINES
+from swsg.pipeline import OutputWriter
+from swsg.projects import get_project_by_path
+
+from utils import make_project
 
 args_without_any_options = parse_args(['list-projects'])
 
@@ -121,3 +128,104 @@ def test_remove_project(tmpdir):
     py.test.raises(SystemExit, "parse_args(['remove-project'])")
     args = parse_args(['remove-project', str(tmpdir)])
     assert args.path == str(tmpdir)
+
+
+def test_render():
+    args = parse_args(['render'])
+    assert not args.plan
+    assert not args.json
+    assert args.io_threads == 0
+    args = parse_args(['render', '--plan', '--json'])
+    assert args.plan
+    assert args.json
+    args = parse_args(['render', '--io-threads', '4'])
+    assert args.io_threads == 4
+    assert args.shard is None
+    assert args.output_cache is None
+    assert not args.resume
+    assert (args.checkpoint_every, args.checkpoint_interval) == (100, 60)
+    args = parse_args([
+        'render', '--resume', '--checkpoint-every', '10',
+        '--checkpoint-interval', '5'])
+    assert args.resume
+    assert (args.checkpoint_every, args.checkpoint_interval) == (10, 5)
+    args = parse_args(['render', '--output-cache', '/mnt/cache'])
+    assert args.output_cache == '/mnt/cache'
+    args = parse_args(['render', '--shard', '2/3', '--manifest', 'm.json'])
+    assert args.shard == (2, 3)
+    assert args.manifest == 'm.json'
+    py.test.raises(SystemExit, "parse_args(['render', '--shard', '4/3'])")
+    assert args.processes is None
+    assert not args.all
+    args = parse_args([
+        'render', '--all', '-j', '4', '--project', 'blog',
+        '--project', 'docs-*'])
+    assert args.all
+    assert args.processes == 4
+    assert args.projects == ['blog', 'docs-*']
+    # "--project" is only an option of "--all"
+    args = parse_args(['render', '--project', 'blog'])
+    py.test.raises(SystemExit, 'render(args)')
+    args = parse_args(['render', '--archive', 'site.tar.gz', '--delta'])
+    assert args.archive == 'site.tar.gz'
+    assert args.delta
+    assert parse_args(['render', '--changes', 'c.json']).changes == 'c.json'
+    py.test.raises(
+        SystemExit, "parse_args(['render', '--archive', 'site.rar'])")
+
+
+def test_merge_manifests():
+    args = parse_args(['merge-manifests', 'a.json', 'b.json'])
+    assert args.manifests == ['a.json', 'b.json']
+
+
+def test_serve():
+    args = parse_args(['serve'])
+    assert args.host == 'localhost'
+    assert args.port == 8000
+    args = parse_args(['serve', '--host', '0.0.0.0', '-p', '8080'])
+    assert args.host == '0.0.0.0'
+    assert args.port == 8080
+
+
+def test_check_links():
+    args = parse_args(['check-links'])
+    assert args.processes is None
+    args = parse_args(['check-links', '-j', '4'])
+    assert args.processes == 4
+
+
+def test_import():
+    args = parse_args(['import', 'pages.tar.gz'])
+    assert args.path == 'pages.tar.gz'
+    assert not args.templates
+    args = parse_args(['import', '--templates', 'templates'])
+    assert args.templates
+
+
+def test_cache():
+    args = parse_args(['cache', 'gc', '--max-size', '10M', '--max-age', '2h'])
+    assert args.max_size == 10 * 1024 ** 2
+    assert args.max_age == 2 * 60 * 60
+    py.test.raises(
+        SystemExit, "parse_args(['cache', 'gc', '--max-size', 'x'])")
+    args = parse_args(['cache', 'clear', 'minify', '--directory', 'caches'])
+    assert args.caches == ['minify']
+    assert args.directory == 'caches'
+
+
+def test_render_saves_after_writing(tmpdir, monkeypatch):
+    project = make_project(tmpdir, {'page.rest': u'text'})
+    monkeypatch.setattr(
+        cli, 'get_project_by_path', lambda *args, **kwargs: project)
+
+    def write(output_path, output):
+        raise IOError('disk full')
+    monkeypatch.setattr(
+        cli, 'OutputWriter', partial(OutputWriter, write=write))
+    args = parse_args(['render', '--io-threads', '2'])
+    py.test.raises(IOError, 'render(args)')
+    # the output which was not written is rendered again next time
+    project = get_project_by_path(
+        project.project_dir, project.projects_file_name)
+    assert project.manifest.entries == {}
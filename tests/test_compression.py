@@ -0,0 +1,66 @@
+import gzip
+from ConfigParser import RawConfigParser
+
+import py
+from swsg import NoninstalledPackage
+from swsg.compression import CompressionStage, compress, brotli
+
+from utils import pytest_funcarg__temp_project, render
+
+
+def test_compress():
+    data = 'some data ' * 100
+    compressed = compress(data, 'gzip', 9)
+    assert len(compressed) < len(data)
+    # the result does not depend on the current time
+    assert compress(data, 'gzip', 9) == compressed
+    py.test.raises(ValueError, "compress(data, 'zip', 9)")
+
+
+def test_from_config():
+    config = RawConfigParser()
+    assert CompressionStage.from_config(config) is None
+    config.add_section('compression')
+    assert CompressionStage.from_config(config).levels == {'gzip': 9}
+    config.set('compression', 'gzip level', '6')
+    assert CompressionStage.from_config(config).levels == {'gzip': 6}
+    config.set('compression', 'formats', 'gzip, zip')
+    py.test.raises(ValueError, 'CompressionStage.from_config(config)')
+    if brotli is None:
+        py.test.raises(NoninstalledPackage, "CompressionStage({'brotli': 11})")
+
+
+def test_compression_stage(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    output_dir = py.path.local(temp_project.output_dir)
+    source_dir.join('first.rest').write(u'some text')
+    source_dir.join('second.rest').write(u'more text')
+    stage = CompressionStage({'gzip': 6}, processes=2)
+    render(temp_project, stages=[stage])
+    for name in ('first', 'second'):
+        output = output_dir.join(name + '.html').read()
+        compressed_file = gzip.open(str(output_dir.join(name + '.html.gz')))
+        assert compressed_file.read() == output
+    # outputs which did not change are not compressed again
+    output_dir.join('second.html.gz').write('untouched')
+    # changing the config file renders every source again
+    temp_project.update_config('general', [('unused option', 'value')])
+    source_dir.join('first.rest').remove()
+    render(temp_project, stages=[stage])
+    assert output_dir.join('second.html.gz').read() == 'untouched'
+    assert not output_dir.join('first.html.gz').check()
+
+
+def test_changed_levels(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    output_dir = py.path.local(temp_project.output_dir)
+    source_dir.join('first.rest').write(u'some text')
+    render(temp_project, stages=[CompressionStage({'gzip': 9}, processes=1)])
+    output_dir.join('first.html.gz').write('stale')
+    # a file of a format which is not used anymore
+    output_dir.join('first.html.br').write('stale')
+    # no source is rendered again, but the compressed files are outdated
+    render(temp_project, stages=[CompressionStage({'gzip': 1}, processes=1)])
+    compressed_file = gzip.open(str(output_dir.join('first.html.gz')))
+    assert compressed_file.read() == output_dir.join('first.html').read()
+    assert not output_dir.join('first.html.br').check()
@@ -0,0 +1,60 @@
+import pickle
+from ConfigParser import NoOptionError, NoSectionError, RawConfigParser
+
+import py
+from swsg.config import ConfigSnapshot
+from swsg.utils import hash_file
+
+CONFIG = '''[general]
+template language = jinja
+Default Template = default.html
+
+[feeds]
+base url = http://example.com/
+'''
+
+
+def pytest_funcarg__config_file(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    config_file = tmpdir.join('config.ini')
+    config_file.write(CONFIG)
+    return config_file
+
+
+def test_read(config_file):
+    snapshot = ConfigSnapshot.read(str(config_file))
+    assert snapshot.digest == hash_file(str(config_file))
+    assert snapshot.sections() == ['general', 'feeds']
+    assert snapshot.has_section('feeds')
+    assert not snapshot.has_section('search')
+    assert snapshot.has_option('general', 'default template')
+    assert not snapshot.has_option('search', 'default template')
+    assert snapshot.get('general', 'template language') == 'jinja'
+    assert snapshot.get('general', 'Default Template') == 'default.html'
+    assert snapshot.items('feeds') == [('base url', 'http://example.com/')]
+    py.test.raises(NoSectionError, "snapshot.get('search', 'x')")
+    py.test.raises(NoOptionError, "snapshot.get('feeds', 'x')")
+    py.test.raises(NoSectionError, "snapshot.items('search')")
+    # snapshots are passed to other processes by value
+    assert pickle.loads(pickle.dumps(snapshot)).items('feeds') == [
+        ('base url', 'http://example.com/')]
+
+
+def test_is_current(config_file):
+    snapshot = ConfigSnapshot.read(str(config_file))
+    assert snapshot.is_current()
+    config_file.write(CONFIG + '\n[search]\n')
+    assert not snapshot.is_current()
+    config_file.remove()
+    assert not snapshot.is_current()
+
+
+def test_update_parser(config_file):
+    parser = RawConfigParser()
+    parser.add_section('general')
+    parser.set('general', 'template language', 'simple')
+    parser.set('general', 'markup language', 'rest')
+    ConfigSnapshot.read(str(config_file)).update_parser(parser)
+    assert parser.get('general', 'template language') == 'jinja'
+    assert parser.get('general', 'markup language') == 'rest'
+    assert parser.get('feeds', 'base url') == 'http://example.com/'
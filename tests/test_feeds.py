@@ -0,0 +1,51 @@
+from xml.dom import minidom
+
+import py
+from swsg.feeds import FeedStage
+
+from utils import pytest_funcarg__temp_project, render
+
+
+def test_from_config(temp_project):
+    temp_project.read_config()
+    assert FeedStage.from_config(temp_project.config) is None
+    temp_project.config.add_section('feeds')
+    temp_project.config.set('feeds', 'base url', 'http://example.com')
+    temp_project.config.set('feeds', 'entries', '5')
+    stage = FeedStage.from_config(temp_project.config)
+    assert stage.base_url == 'http://example.com/'
+    assert stage.max_entries == 5
+
+
+def test_feed_stage(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    output_dir = py.path.local(temp_project.output_dir)
+    source_dir.join('first.rest').write(u'title: First & best\n*some* text')
+    source_dir.join('second.rest').write(u'title: Second\nmore text')
+    stage = FeedStage('http://example.com/blog', u'My blog', max_entries=1)
+    render(temp_project, stages=[stage])
+    feed = minidom.parse(str(output_dir.join('atom.xml')))
+    assert feed.getElementsByTagName('title')[0].firstChild.data == 'My blog'
+    assert len(feed.getElementsByTagName('entry')) == 1
+    sitemap = minidom.parse(str(output_dir.join('sitemap.xml')))
+    assert [loc.firstChild.data for loc in sitemap.getElementsByTagName(
+        'loc')] == [
+        'http://example.com/blog/first.html',
+        'http://example.com/blog/second.html']
+    # the files are not written again if nothing has been rendered
+    output_dir.join('atom.xml').write('unchanged')
+    render(temp_project, stages=[stage])
+    assert output_dir.join('atom.xml').read() == 'unchanged'
+    # the most recently changed page is the first entry of the feed
+    source_dir.join('first.rest').write(u'title: First & best\nnew text')
+    source_dir.join('second.rest').remove()
+    render(temp_project, stages=[stage])
+    feed = minidom.parse(str(output_dir.join('atom.xml')))
+    entry, = feed.getElementsByTagName('entry')
+    assert entry.getElementsByTagName('title')[0].firstChild.data == (
+        'First & best')
+    assert entry.getElementsByTagName('summary')[0].firstChild.data == (
+        'new text')
+    sitemap = minidom.parse(str(output_dir.join('sitemap.xml')))
+    assert len(sitemap.getElementsByTagName('url')) == 1
+    assert stage.get_state(temp_project).keys() == ['first.rest']
@@ -0,0 +1,69 @@
+import py
+from swsg import highlighting
+from swsg.caches import DirectoryCache
+from swsg.highlighting import highlight_cache, lex_code
+from swsg.sources import ReSTSource, MarkdownSource
+
+py.test.importorskip('pygments')
+
+
+def pytest_funcarg__cache(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    cache = DirectoryCache(str(tmpdir))
+    previous_cache = highlight_cache._cache
+    highlight_cache.cache = cache
+    request.addfinalizer(lambda: setattr(
+        highlight_cache, 'cache', previous_cache))
+    return cache
+
+
+def cached_files(cache):
+    directory = py.path.local(cache.directory)
+    return list(directory.visit(fil=lambda path: path.check(file=True)))
+
+
+def test_lex_code(cache):
+    assert lex_code(u'x = 1', 'python') == [
+        [['n'], u'x'], [[], u' '], [['o'], u'='], [[], u' '], [['mi'], u'1']]
+    assert lex_code(u'x = 1', '') == [[[], u'x = 1']]
+    assert len(cached_files(cache)) == 1
+    # the result is taken from the cache even if it is not in memory
+    for path in cached_files(cache):
+        path.write('[[["k"], "cached"]]')
+    highlight_cache.memory.clear()
+    assert lex_code(u'x = 1', 'python') == [[['k'], u'cached']]
+    # other options are cached separately
+    assert lex_code(u'x = 1', 'python', 'long') == [
+        [['name'], u'x'], [[], u' '], [['operator'], u'='], [[], u' '],
+        [['literal', 'number', 'integer'], u'1']]
+
+
+def test_rest_code_blocks(cache):
+    text = u'some text\n\n.. code:: python\n\n   def f(): pass\n'
+    content = ReSTSource('', '', text).namespace['content']
+    assert (
+        u'<pre class="code python literal-block">\n'
+        u'<span class="keyword">def</span> ') in content
+    assert len(cached_files(cache)) == 1
+    # changing the text around the code block does not highlight the code
+    # block again
+    changed_text = u'other text\n\n.. code:: python\n\n   def f(): pass\n'
+    for path in cached_files(cache):
+        path.write('[[["keyword"], "cached"]]')
+    highlight_cache.memory.clear()
+    content = ReSTSource('', '', changed_text).namespace['content']
+    assert u'<span class="keyword">cached</span>' in content
+
+
+def test_markdown_code_blocks(cache):
+    py.test.importorskip('markdown')
+    text = u'some text\n\n    :::python\n    x = 1 < 2\n\n    plain code\n'
+    content = MarkdownSource('', '', text).namespace['content']
+    assert content.startswith(
+        u'<p>some text</p>\n<div class="codehilite"><pre>')
+    assert u'<span class="o">&lt;</span>' in content
+    assert len(cached_files(cache)) == 1
+    # code blocks which do not name a lexer are not highlighted
+    content = MarkdownSource('', '', u'    x = 1\n').namespace['content']
+    assert content == u'<pre><code>x = 1\n</code></pre>'
+    assert len(cached_files(cache)) == 1
@@ -0,0 +1,64 @@
+import tarfile
+import zipfile
+
+import py
+from swsg.importer import ImportConflict, import_files
+from swsg.projects import get_project_by_path
+
+from utils import make_project
+
+
+def pytest_funcarg__temp_project(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    return make_project(tmpdir.join('projects'), name='test')
+
+
+def pytest_funcarg__import_dir(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    import_dir = tmpdir.join('import')
+    import_dir.ensure('index.rest').write('index')
+    import_dir.ensure('blog', 'first-post.md').write('first post')
+    import_dir.ensure('blog', 'image.png').write('no source')
+    return import_dir
+
+
+def imported_sources(project):
+    source_dir = py.path.local(project.source_dir)
+    return sorted(
+        (path.basename, path.read()) for path in source_dir.listdir())
+
+
+def test_import_directory(temp_project, import_dir):
+    names = import_files(temp_project, str(import_dir))
+    assert names == ['first-post.md', 'index.rest']
+    assert imported_sources(temp_project) == [
+        ('first-post.md', 'first post'), ('index.rest', 'index')]
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.last_modified == temp_project.last_modified
+
+
+def test_import_archives(temp_project, import_dir, tmpdir):
+    tar_filename = str(tmpdir.join('sources.tar.gz'))
+    with tarfile.open(tar_filename, 'w:gz') as archive:
+        archive.add(str(import_dir), 'import')
+    assert import_files(temp_project, tar_filename) == [
+        'first-post.md', 'index.rest']
+    zip_filename = str(tmpdir.join('templates.zip'))
+    with zipfile.ZipFile(zip_filename, 'w') as archive:
+        archive.writestr('templates/page.html', '<p>$content</p>')
+    assert import_files(temp_project, zip_filename, templates=True) == [
+        'page.html']
+    template_dir = py.path.local(temp_project.template_dir)
+    assert template_dir.join('page.html').read() == '<p>$content</p>'
+
+
+def test_import_conflict(temp_project, import_dir):
+    import_dir.ensure('pages', 'index.rest').write('another index')
+    py.test.raises(
+        ImportConflict, 'import_files(temp_project, str(import_dir))')
+    # nothing is imported if the names conflict
+    assert imported_sources(temp_project) == []
+    py.test.raises(
+        ValueError,
+        'import_files(temp_project, str(import_dir.join("index.rest")))')
@@ -0,0 +1,59 @@
+import py
+from swsg.links import BrokenLink, LinkChecker, extract_links, resolve_link
+
+from utils import pytest_funcarg__temp_project, render
+
+
+def test_extract_links(tmpdir):
+    page = tmpdir.join('page.html')
+    page.write(
+        '<p id="top"><a href="other.html#x">a</a><a name="end"></a>'
+        '<a href="http://example.com/">b</a><img src="/logo.png" />'
+        '<a href="mailto:someone@example.com">c</a></p>')
+    assert extract_links(str(page)) == (
+        str(page), ('other.html#x', '/logo.png'),
+        frozenset(['top', 'end']))
+    missing = str(tmpdir.join('missing.html'))
+    assert extract_links(missing) == (missing, None, None)
+
+
+def test_resolve_link():
+    page = '/site/output/a/page.html'
+    assert resolve_link('/site/output', page, '#top') == (page, 'top')
+    assert resolve_link('/site/output', page, '../b.html#x') == (
+        '/site/output/b.html', 'x')
+    assert resolve_link('/site/output', page, '/c/') == (
+        '/site/output/c/index.html', '')
+    assert resolve_link('/site/output', page, 'd%20e.html?q=1') == (
+        '/site/output/a/d e.html', '')
+
+
+def test_link_checker(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    output_dir = py.path.local(temp_project.output_dir)
+    first = source_dir.join('first.rest')
+    first.write(
+        u'`second <second.html#section>`_ `image <logo.png>`_ '
+        u'`missing <missing.html>`_')
+    second = source_dir.join('second.rest')
+    second.write(
+        u'Section\n=======\n\n`back <first.html>`_\n\nEnd\n===\n\ntext')
+    render(temp_project)
+    checker = LinkChecker(temp_project, processes=2)
+    first_output = str(output_dir.join('first.html'))
+    assert checker.check() == [
+        BrokenLink(first_output, 'logo.png', 'missing file'),
+        BrokenLink(first_output, 'missing.html', 'missing file')]
+    # links to files which were not rendered are checked every time
+    output_dir.join('logo.png').write('')
+    assert checker.check() == [
+        BrokenLink(first_output, 'missing.html', 'missing file')]
+    # only the changed output is parsed again, but the links to it are
+    # checked again as well
+    second.write(
+        u'Other\n=====\n\n`back <first.html>`_\n\nEnd\n===\n\ntext')
+    render(temp_project)
+    output_dir.join('first.html').write('not parsed again')
+    assert checker.check() == [
+        BrokenLink(first_output, 'missing.html', 'missing file'),
+        BrokenLink(first_output, 'second.html#section', 'missing anchor')]
@@ -0,0 +1,39 @@
+from os import path
+
+import py
+
+from utils import pytest_funcarg__temp_project
+
+
+def test_source_index(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    source_dir.join('first.rest').write(u'title: First\nsome text')
+    source_dir.join('second.md').write(
+        u'template: other.html\ntitle: Second\ntext')
+    index = temp_project.update_source_index()
+    assert len(index) == 2
+    first, second = list(index)
+    assert first.name == 'first.rest'
+    assert first.title == u'First'
+    assert first.template is None
+    assert first.markup == 'rest'
+    assert first.output_path == path.join(
+        temp_project.output_dir, 'first.html')
+    assert second.title == u'Second'
+    assert second.template == u'other.html'
+    assert second.markup == 'md'
+    assert index.by_template(u'other.html') == [second]
+    # unchanged sources are not scanned again
+    assert index.update(temp_project) == (set(), set())
+    source_dir.join('first.rest').write(u'title: New title\ntext')
+    source_dir.join('second.md').remove()
+    assert index.update(temp_project) == (
+        set(['first.rest']), set(['second.md']))
+    assert [metadata.title for metadata in index] == [u'New title']
+    # the index has the same titles as the loaded sources
+    source_dir.join('first.rest').write(u'text\ntitle: not a header')
+    index.update(temp_project)
+    assert index.get('first.rest').title == u'unknown'
+    assert temp_project.load_source('first.rest').title == u'unknown'
+    assert 'first.rest' in index
+    assert index.get('second.md') is None
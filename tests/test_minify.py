@@ -0,0 +1,45 @@
+from ConfigParser import RawConfigParser
+
+from swsg.caches import DirectoryCache
+from swsg.minify import MinifyStage, minify_html
+from swsg.stages import RenderedPage
+
+
+def test_minify_html():
+    assert minify_html(
+        u'<!DOCTYPE HTML>\n<html>\n  <head>\n    <title>a  title</title>\n'
+        u'  </head>\n  <!-- a comment -->\n  <body class="main">\n'
+        u'    <p id="first" title="two words">text</p>\n  </body>\n</html>'
+    ) == (
+        u'<!DOCTYPE HTML> <html> <head> <title>a title</title> </head> '
+        u'<body class=main> <p id=first title="two words">text</p> </body> '
+        u'</html>')
+    # the content of pre elements is not changed
+    html = u'<p>a   b</p>\n<pre class="code">a   b\n  c</pre>'
+    assert minify_html(html) == (
+        u'<p>a b</p> <pre class="code">a   b\n  c</pre>')
+    # conditional comments are kept
+    assert minify_html(u'<!--[if IE]><p>IE</p><![endif]-->') == (
+        u'<!--[if IE]><p>IE</p><![endif]-->')
+    # values which contain a slash keep their quotes, because the slash could
+    # be confused with the end of a self-closing tag
+    assert minify_html(u'<a href="/index.html">x</a><br class="a" />') == (
+        u'<a href="/index.html">x</a><br class=a />')
+
+
+def test_minify_stage(tmpdir):
+    cache = DirectoryCache(str(tmpdir))
+    stage = MinifyStage(cache)
+    page = RenderedPage('page.rest', None, 'page.html', u'<p>  some text</p>')
+    assert stage.process(None, page) == u'<p> some text</p>'
+    # the second time, the result is taken from the cache
+    for path in tmpdir.visit(fil=lambda path: path.check(file=True)):
+        path.write(u'<p>cached</p>')
+    assert stage.process(None, page) == u'<p>cached</p>'
+
+
+def test_from_config():
+    config = RawConfigParser()
+    assert MinifyStage.from_config(config) is None
+    config.add_section('minify')
+    assert isinstance(MinifyStage.from_config(config), MinifyStage)
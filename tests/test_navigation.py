@@ -0,0 +1,212 @@
+from os import path
+
+import py
+from swsg.projects import Project
+from swsg import navigation
+from swsg.metadata import SourceIndex, SourceMetadata
+from swsg.navigation import (SiteNode, SiteTree, InvalidNavigation,
+    compile_navigation)
+
+JINJA_TEMPLATE = u'{{ breadcrumbs() }}|{{ sitemap() }}|{{ content }}'
+NAVIGATION_TEMPLATE = u'''{% set nav = navigation() %}
+{{ nav.parent.title if nav.parent }}|
+{% for page in nav.siblings %}{{ page.title }},{% endfor %}|{{ content }}'''
+# the example of the file TODO
+NAVIGATION_JSON = '''[
+  "source 1",
+  {"folder 1": ["source 1.1", "source 1.2"]},
+  "source 2",
+  "source 3",
+  {"folder 2": {"folder 2.1": ["source 2.1"]}}
+]'''
+
+
+def pytest_funcarg__site_tree(request):
+    return SiteTree(SiteNode('index.rest', u'Home', 'index.html', [
+        SiteNode('a.rest', u'A & B', 'a.html', [
+            SiteNode('a1.rest', u'A1', 'a1.html')]),
+        SiteNode('b.rest', u'B', 'b.html')]))
+
+
+def test_sitemap(site_tree):
+    assert site_tree.sitemap() == (
+        u'<ul class="sitemap"><li><a href="index.html">Home</a><ul>'
+        u'<li><a href="a.html">A &amp; B</a><ul>'
+        u'<li><a href="a1.html">A1</a></li></ul></li>'
+        u'<li><a href="b.html">B</a></li></ul></li></ul>')
+    assert site_tree.sitemap(depth=0) == (
+        u'<ul class="sitemap"><li><a href="index.html">Home</a></li></ul>')
+    assert site_tree.sitemap(exclude=['a.rest']) == (
+        u'<ul class="sitemap"><li><a href="index.html">Home</a><ul>'
+        u'<li><a href="b.html">B</a></li></ul></li></ul>')
+    # the results are memoized
+    assert site_tree.sitemap(1) is site_tree.sitemap(1)
+
+
+def test_breadcrumbs(site_tree):
+    assert site_tree.breadcrumbs('a1.rest') == (
+        u'<span class="breadcrumbs"><a href="index.html">Home</a> &raquo; '
+        u'<a href="a.html">A &amp; B</a> &raquo; A1</span>')
+    assert site_tree.breadcrumbs('index.rest', u' / ') == (
+        u'<span class="breadcrumbs">Home</span>')
+    assert site_tree.breadcrumbs('does-not-exist.rest') == u''
+
+
+def test_template_functions(site_tree):
+    dependencies = {}
+    functions = site_tree.template_functions('b.rest', dependencies)
+    assert functions['breadcrumbs']() == site_tree.breadcrumbs('b.rest')
+    assert functions['sitemap'](depth=1) == site_tree.sitemap(1)
+    assert sorted(dependencies) == [
+        ('breadcrumbs', 'b.rest', u' &raquo; '), ('sitemap', 1, ())]
+    for key, digest in dependencies.iteritems():
+        assert site_tree.digest(key) == digest
+
+
+def test_render_with_site_tree(tmpdir, monkeypatch):
+    py.test.importorskip('jinja2')
+    project = Project(
+        str(tmpdir), 'test-project', str(tmpdir.join('projects.shelve')))
+    project.init()
+    project.update_config('general', [('template language', 'jinja')])
+    py.path.local(project.template_dir).join('default.html').write(
+        JINJA_TEMPLATE)
+    source_dir = py.path.local(project.source_dir)
+    source_dir.join('index.rest').write(u'title: Home\ntext')
+    source_dir.join('page.rest').write(u'title: Page\ntext')
+    outputs = dict(project.render())
+    page_output = outputs[path.join(project.output_dir, 'page.html')]
+    assert page_output.startswith(
+        u'<span class="breadcrumbs"><a href="index.html">Home</a> &raquo; '
+        u'Page</span>|<ul class="sitemap">')
+    for output_path, output in outputs.iteritems():
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    # the results of the template functions are not compared if the
+    # structure of the site did not change
+    project.update_source_index()
+    site_tree = project.build_site_tree()
+    assert project.manifest.entries['page.rest'].site_tree_digest == (
+        site_tree.structure_digest())
+    monkeypatch.setattr(SiteTree, 'digest', None)
+    assert project.plan().rebuild == []
+    monkeypatch.undo()
+    # adding a page changes the sitemap of every page, but not the
+    # breadcrumbs of the existing pages
+    source_dir.join('other.rest').write(u'title: Other\ntext')
+    plan = project.plan()
+    assert sorted((name, reason) for name, _, reason in plan.rebuild) == [
+        ('index.rest', 'sitemap changed'), ('other.rest', 'new source'),
+        ('page.rest', 'sitemap changed')]
+
+
+def make_source_index(source_names):
+    index = SourceIndex()
+    for name in source_names:
+        index.entries[name] = SourceMetadata(
+            name, path.splitext(name)[0].title(), None, 'rest',
+            path.join('output', path.splitext(name)[0] + '.html'), 0, 0)
+    return index
+
+
+def test_compile_navigation(tmpdir):
+    navigation_file = tmpdir.join('navigation.json')
+    navigation_file.write(NAVIGATION_JSON)
+    assert compile_navigation(str(navigation_file)) == (
+        ('page', u'source 1'),
+        ('folder', u'folder 1', (
+            ('page', u'source 1.1'), ('page', u'source 1.2'))),
+        ('page', u'source 2'),
+        ('page', u'source 3'),
+        ('folder', u'folder 2', (
+            ('folder', u'folder 2.1', (('page', u'source 2.1'),)),)))
+    navigation_file.write('{"folder": 42}')
+    py.test.raises(
+        InvalidNavigation, 'compile_navigation(str(navigation_file))')
+    navigation_file.write('[')
+    py.test.raises(
+        InvalidNavigation, 'compile_navigation(str(navigation_file))')
+
+
+def test_site_tree_from_navigation(tmpdir):
+    navigation_file = tmpdir.join('navigation.json')
+    navigation_file.write(NAVIGATION_JSON)
+    index = make_source_index([
+        'source 1.rest', 'source 1.1.rest', 'source 1.2.rest',
+        'source 2.rest', 'source 3.rest', 'source 2.1.rest'])
+    tree = SiteTree.from_navigation(
+        compile_navigation(str(navigation_file)), index)
+    assert tree.parent('source 1.rest') is None
+    folder = tree.parent('source 1.1.rest')
+    assert folder.title == u'folder 1'
+    assert folder.url is None
+    assert tree.siblings('source 1.1.rest') == [
+        tree.nodes['source 1.2.rest']]
+    assert [node.title for node in tree.siblings('source 2.rest')] == [
+        u'Source 1', u'folder 1', u'Source 3', u'folder 2']
+    assert tree.children('source 2.rest') == []
+    context = tree.navigation('source 2.1.rest')
+    assert [node.title for node in context.ancestors] == [
+        u'folder 2', u'folder 2.1']
+    assert tree.breadcrumbs('source 2.1.rest') == (
+        u'<span class="breadcrumbs">folder 2 &raquo; folder 2.1 &raquo; '
+        u'Source 2.1</span>')
+
+
+def test_render_with_navigation(tmpdir):
+    py.test.importorskip('jinja2')
+    project = Project(
+        str(tmpdir), 'test-project', str(tmpdir.join('projects.shelve')))
+    project.init()
+    project.update_config('general', [('template language', 'jinja')])
+    py.path.local(project.template_dir).join('default.html').write(
+        NAVIGATION_TEMPLATE)
+    source_dir = py.path.local(project.source_dir)
+    for name in ('a', 'b', 'c', 'd'):
+        source_dir.join(name + '.rest').write(u'title: {0}\ntext'.format(
+            name.upper()))
+    navigation_file = py.path.local(project.navigation_filename)
+    navigation_file.write('["a", {"folder": ["b", "c"]}, "d"]')
+    outputs = dict(project.render())
+    assert outputs[path.join(project.output_dir, 'b.html')].startswith(
+        u'folder|\nC,|')
+    for output_path, output in outputs.iteritems():
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    compiled_navigation = project.compiled_navigation
+    assert project.plan().rebuild == []
+    # the navigation is not compiled again if it did not change
+    assert project.compiled_navigation is compiled_navigation
+    # adding "e" to the folder changes the navigation context of b and c, but
+    # not the ones of a and d
+    source_dir.join('e.rest').write(u'title: E\ntext')
+    navigation_file.write('["a", {"folder": ["b", "c", "e"]}, "d"]')
+    plan = project.plan()
+    assert sorted((name, reason) for name, _, reason in plan.rebuild) == [
+        ('b.rest', 'navigation changed'), ('c.rest', 'navigation changed'),
+        ('e.rest', 'new source')]
+
+
+def test_navigation_digest(monkeypatch):
+    names = ['page{0}.rest'.format(i) for i in xrange(50)]
+    tree = SiteTree.from_index(make_source_index(names))
+    descriptions = []
+
+    def describe(node):
+        descriptions.append(node)
+        return node.name
+    monkeypatch.setattr(navigation, '_describe', describe)
+    digests = dict(
+        (name, tree.digest(('navigation', name))) for name in names)
+    assert len(set(digests.itervalues())) == len(names)
+    # the children of the root are described once, not once per page
+    assert len(descriptions) < 3 * len(names)
+    monkeypatch.undo()
+    # renaming a page changes the navigation of its siblings
+    index = make_source_index(names)
+    index.entries['page7.rest'] = index.entries['page7.rest']._replace(
+        title=u'Renamed')
+    tree = SiteTree.from_index(index)
+    old_tree = SiteTree.from_index(make_source_index(names))
+    assert tree.digest(('navigation', 'page3.rest')) != old_tree.digest(
+        ('navigation', 'page3.rest'))
@@ -0,0 +1,93 @@
+import py
+from swsg.caches import BaseCacheBackend
+from swsg.output_cache import OutputCache
+from swsg.pipeline import write_output
+
+from utils import make_project
+
+
+class MemoryCache(BaseCacheBackend):
+    'the simplest possible backend, e.g. a remote backend could be used'
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def put(self, key, value):
+        self.values[key] = value
+
+
+def make_checkout(tmpdir, name):
+    '''create a project like a CI agent which starts with a new checkout
+    does'''
+    return make_project(tmpdir.join(name), {
+        'first.rest': u'title: First\n\nfirst text',
+        'second.rest': u'second text'})
+
+
+def render(project, output_cache):
+    outputs = {}
+    for output_path, output in project.render(output_cache=output_cache):
+        write_output(output_path, output)
+        outputs[project.relative_path(output_path)] = output
+    return outputs
+
+
+def test_base_cache_backend():
+    backend = MemoryCache()
+    assert 'key' not in backend
+    backend.put('key', 'value')
+    assert 'key' in backend
+    py.test.raises(NotImplementedError, "BaseCacheBackend().get('key')")
+
+
+def test_output_cache(tmpdir):
+    output_cache = OutputCache.from_directory(str(tmpdir.join('cache')))
+    first_project = make_checkout(tmpdir, 'first-agent')
+    outputs = render(first_project, output_cache)
+    assert (output_cache.hits, output_cache.misses) == (0, 2)
+    # the second checkout takes every output from the cache
+    second_project = make_checkout(tmpdir, 'second-agent')
+    assert render(second_project, output_cache) == outputs
+    assert (output_cache.hits, output_cache.misses) == (2, 2)
+    assert sorted(second_project.manifest.entries) == [
+        'first.rest', 'second.rest']
+    assert second_project.plan().rebuild == []
+
+
+def test_output_cache_inputs(tmpdir):
+    output_cache = OutputCache(MemoryCache())
+    project = make_checkout(tmpdir, 'agent')
+    render(project, output_cache)
+    # a changed source is rendered again
+    source_dir = py.path.local(project.source_dir)
+    source_dir.join('second.rest').write(u'changed text')
+    assert render(project, output_cache).keys() == ['output/second.html']
+    assert (output_cache.hits, output_cache.misses) == (0, 3)
+    # changing a template invalidates every output; restoring it makes the
+    # old outputs valid again
+    template = py.path.local(project.template_dir).join('default.html')
+    template_text = template.read()
+    template.write(template_text + u'\n')
+    render(project, output_cache)
+    assert (output_cache.hits, output_cache.misses) == (0, 5)
+    template.write(template_text)
+    render(project, output_cache)
+    assert (output_cache.hits, output_cache.misses) == (2, 5)
+
+
+def test_output_cache_dependencies(tmpdir):
+    output_cache = OutputCache(MemoryCache())
+    project = make_checkout(tmpdir, 'agent')
+    included_file = py.path.local(project.project_dir).join('part.txt')
+    included_file.write(u'included text')
+    source_dir = py.path.local(project.source_dir)
+    source_dir.join('second.rest').write(u'.. include:: ../part.txt')
+    render(project, output_cache)
+    # the cached output is not used if a file it depends on changed
+    included_file.write(u'changed text')
+    py.path.local(project.output_dir).join('second.html').remove()
+    outputs = render(project, output_cache)
+    assert u'changed text' in outputs['output/second.html']
+    assert (output_cache.hits, output_cache.misses) == (0, 3)
@@ -0,0 +1,40 @@
+import py
+from swsg.pipeline import prefetch, OutputWriter
+
+
+def test_prefetch():
+    assert list(prefetch(lambda x: x * 2, xrange(100), size=3)) == range(
+        0, 200, 2)
+    assert list(prefetch(lambda x: x, [])) == []
+
+
+def test_prefetch_reraises_exceptions():
+    def function(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+    results = prefetch(function, xrange(10), size=2)
+    assert [results.next() for i in xrange(3)] == [0, 1, 2]
+    py.test.raises(ValueError, 'results.next()')
+
+
+def test_prefetch_stops_early():
+    results = prefetch(lambda x: x, xrange(1000), size=1)
+    assert results.next() == 0
+    # closing the generator must not block the background thread forever
+    results.close()
+
+
+def test_output_writer(tmpdir):
+    with OutputWriter(threads=3, size=2) as writer:
+        for i in xrange(10):
+            writer.write(str(tmpdir.join('{0}.html'.format(i))), u'\xe4' * i)
+    for i in xrange(10):
+        assert tmpdir.join('{0}.html'.format(i)).read_text('utf-8') == (
+            u'\xe4' * i)
+
+
+def test_output_writer_reraises_exceptions(tmpdir):
+    writer = OutputWriter(threads=1)
+    writer.write(str(tmpdir.join('does', 'not', 'exist.html')), u'')
+    py.test.raises(IOError, 'writer.close()')
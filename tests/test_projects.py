@@ -1,3 +1,5 @@
+import pickle
+import shelve
 from os import path
 from functools import partial
 from datetime import datetime
@@ -6,6 +8,7 @@ from ConfigParser import RawConfigParser, NoSectionError
 import py
 from swsg.sources import ReSTSource
 from swsg.templates import SimpleTemplate
+from swsg.manifest import RenderReport
 from swsg.projects import Project, remove_project, NonexistingProject
 
 from test_templates import SIMPLE_TEMPLATE_TEXT
@@ -108,6 +111,19 @@ def test_update_config(temp_project):
     section = 'general'
     temp_project.update_config(section, [('template language', 'jinja2')])
     assert temp_project.config.get(section, 'template language') == 'jinja2'
+    snapshot = temp_project.read_config()
+    assert snapshot.get(section, 'template language') == 'jinja2'
+
+
+def test_read_config(temp_project):
+    temp_project.init()
+    snapshot = temp_project.read_config()
+    assert temp_project.manifest.stamps[temp_project.config_filename] == (
+        snapshot.stamp)
+    # the file is not read again as long as it does not change
+    assert temp_project.read_config() is snapshot
+    assert temp_project.plan().config_digest == snapshot.digest
+    assert temp_project.read_config() is snapshot
 
 
 def test_render_project(temp_project):
@@ -138,6 +154,122 @@ def test_render_project(temp_project):
     py.test.raises(StopIteration, 'return_values.next()')
 
 
+def test_render_with_prefetching(temp_project):
+    temp_project.init()
+    source_dir = py.path.local(temp_project.source_dir)
+    for i in xrange(10):
+        source_dir.join('source{0}.rest'.format(i)).write('text {0}'.format(i))
+    outputs = list(temp_project.render(prefetch=3))
+    assert len(outputs) == 10
+    for i, (output_path, output) in enumerate(outputs):
+        assert output_path == path.join(
+            temp_project.output_dir, 'source{0}.html'.format(i))
+        assert '<p>text {0}</p>'.format(i) in output
+
+
+def test_unpickle_old_project(temp_project):
+    temp_project.init()
+    py.path.local(temp_project.source_dir).join('page.rest').write(u'text')
+    # the state of a project which was pickled by an older version of swsg
+    for name in (
+            'manifest', 'source_index', 'compiled_navigation',
+            'navigation_filename'):
+        del temp_project.__dict__[name]
+    temp_project.rendered_sources = {'page.rest': 'md5'}
+    temp_project.rendered_templates = {}
+    temp_project.config_hash = 'md5'
+    project = pickle.loads(pickle.dumps(temp_project))
+    assert not hasattr(project, 'rendered_sources')
+    assert not hasattr(project, 'config_hash')
+    assert project.manifest.entries == {}
+    assert project.compiled_navigation is None
+    assert project.navigation_filename == path.join(
+        project.project_dir, 'navigation.json')
+    assert [path.basename(output_path) for output_path, _ in
+            project.render()] == ['page.html']
+
+
+def test_plan(temp_project):
+    temp_project.init()
+    plan = temp_project.plan()
+    assert (plan.rebuild, plan.keep, plan.delete) == ([], [], [])
+    source_path = py.path.local(
+        temp_project.source_dir).ensure('temp-source.rest')
+    source_path.write(SOURCE_CONTENT)
+    py.path.local(temp_project.template_dir).join('foo.html').write(
+        SIMPLE_TEMPLATE_TEXT)
+    output_path = path.join(temp_project.output_dir, 'temp-source.html')
+    plan = temp_project.plan()
+    assert plan.rebuild == [('temp-source.rest', output_path, 'new source')]
+    assert plan.keep == plan.delete == []
+    # planning does not render anything
+    assert not path.exists(output_path)
+    for output_path, output in temp_project.render():
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    plan = temp_project.plan()
+    assert plan.rebuild == []
+    assert plan.keep == [('temp-source.rest', output_path, 'up to date')]
+    # nothing is rendered again if nothing has changed
+    assert list(temp_project.render()) == []
+    source_path.write(SOURCE_CONTENT + u' and more text')
+    plan = temp_project.plan()
+    assert plan.rebuild == [
+        ('temp-source.rest', output_path, 'source changed')]
+    source_path.remove()
+    plan = temp_project.plan()
+    assert plan.rebuild == plan.keep == []
+    assert plan.delete == [
+        ('temp-source.rest', output_path, 'source removed')]
+    assert sorted(plan.as_dict()) == ['delete', 'keep', 'rebuild']
+
+
+def test_plan_with_included_files(temp_project):
+    temp_project.init()
+    source_dir = py.path.local(temp_project.source_dir)
+    # included files are relative to the source which includes them
+    included_file = py.path.local(temp_project.project_dir).ensure(
+        'parts', 'part.txt')
+    included_file.write(u'included text')
+    source_dir.join('page.rest').write(u'.. include:: ../parts/part.txt')
+    output_path = path.join(temp_project.output_dir, 'page.html')
+    for output_path, output in temp_project.render():
+        assert u'included text' in output
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    entry = temp_project.manifest.entries['page.rest']
+    assert entry.dependencies.keys() == [('file', str(included_file))]
+    assert temp_project.plan().rebuild == []
+    included_file.write(u'changed text')
+    assert temp_project.plan().rebuild == [
+        ('page.rest', output_path, 'file changed')]
+
+
+def test_prune_outputs(temp_project):
+    temp_project.init()
+    source_dir = py.path.local(temp_project.source_dir)
+    output_dir = py.path.local(temp_project.output_dir)
+    source_dir.join('old-name.rest').write(u'some text')
+    # files in the output directory which were not created by swsg are never
+    # deleted
+    output_dir.join('style.css').write('body {}')
+    for output_path, output in temp_project.render():
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    assert output_dir.join('old-name.html').check(file=True)
+    source_dir.join('old-name.rest').rename(source_dir.join('new-name.rest'))
+    report = RenderReport()
+    for output_path, output in temp_project.render(report=report):
+        with open(output_path, 'w') as fp:
+            fp.write(output)
+    assert report.rendered == [str(output_dir.join('new-name.html'))]
+    assert report.deleted == [str(output_dir.join('old-name.html'))]
+    assert sorted(output_dir.listdir()) == [
+        output_dir.join('new-name.html'), output_dir.join('style.css')]
+    assert temp_project.manifest.outputs == frozenset(
+        [str(output_dir.join('new-name.html'))])
+
+
 def test_save_source(temp_project):
     assert not temp_project.updated_projects_file
     temp_project.init()
@@ -175,6 +307,31 @@ def test_save_template(temp_project):
         assert template_content == fp.read()
 
 
+def test_batch(temp_project, monkeypatch):
+    temp_project.init()
+    temp_project.updated_projects_file = False
+    opened = []
+    open_shelve = shelve.open
+    monkeypatch.setattr(
+        shelve, 'open', lambda filename: opened.append(filename) or
+        open_shelve(filename))
+    with temp_project.batch():
+        with temp_project.batch():
+            for i in xrange(3):
+                source = ReSTSource(
+                    temp_project.template_dir, 'default.html', SOURCE_CONTENT)
+                temp_project.save_source(source, 'source{0}.rest'.format(i))
+        # only the outermost batch updates the projects file
+        assert opened == []
+        assert not temp_project.updated_projects_file
+    assert opened == [temp_project.projects_file_name]
+    assert temp_project.updated_projects_file
+    assert temp_project.deferred_update is None
+    source_dir = py.path.local(temp_project.source_dir)
+    assert sorted(source_dir.listdir()) == [
+        source_dir.join('source{0}.rest'.format(i)) for i in xrange(3)]
+
+
 def test_project_exists(temp_project):
     assert not temp_project.exists
     temp_project.init()
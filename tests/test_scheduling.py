@@ -0,0 +1,56 @@
+import py
+from swsg.manifest import PlannedOutput
+from swsg.projects import get_project_by_path
+from swsg.scheduling import expected_costs, schedule
+
+from utils import make_project, render
+
+
+def pytest_funcarg__temp_project(request):
+    return make_project(request.getfuncargvalue('tmpdir'), dict(
+        ('page{0}.rest'.format(i), u'text ' * 10 * i) for i in xrange(1, 5)))
+
+
+def test_expected_costs_without_durations(temp_project):
+    source_names = ['page1.rest', 'page3.rest']
+    # the sizes are used if no source was rendered before
+    assert expected_costs(temp_project, source_names) == {
+        'page1.rest': 50, 'page3.rest': 150}
+
+
+def test_expected_costs(temp_project):
+    render(temp_project)
+    entries = temp_project.manifest.entries
+    assert all(entry.duration >= 0 for entry in entries.itervalues())
+    for i, source_name in enumerate(sorted(entries)):
+        entries[source_name].duration = 0.5 * (4 - i)
+    del entries['page4.rest']
+    costs = expected_costs(temp_project, sorted(entries) + ['page4.rest'])
+    assert costs['page1.rest'] == 2.0
+    assert costs['page3.rest'] == 1.0
+    # the cost of a new source is estimated from its size: 4.5 seconds for
+    # 300 bytes
+    assert costs['page4.rest'] == 200 * 4.5 / 300
+
+
+def test_schedule(temp_project):
+    planned_outputs = [
+        PlannedOutput('page{0}.rest'.format(i), None, 'new source')
+        for i in xrange(1, 5)]
+    assert [
+        planned.source_name
+        for planned in schedule(temp_project, planned_outputs)] == [
+        'page4.rest', 'page3.rest', 'page2.rest', 'page1.rest']
+
+
+def test_render_in_processes(temp_project):
+    rendered = render(temp_project, jobs=2)
+    assert sorted(rendered) == [
+        'page1.html', 'page2.html', 'page3.html', 'page4.html']
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.plan().rebuild == []
+    assert all(
+        entry.duration >= 0 for entry in project.manifest.entries.itervalues())
+    output = py.path.local(project.output_dir).join('page2.html').read()
+    assert 'text text' in output
@@ -0,0 +1,64 @@
+import json
+
+import py
+from swsg.search import SearchIndexStage, tokenize, get_shard
+
+from utils import pytest_funcarg__temp_project, render
+
+
+def load(index_dir, filename):
+    return json.loads(index_dir.join(filename).read())
+
+
+def test_tokenize():
+    assert tokenize(u'<p>The <em>quick</em> fox, the Fox &amp; a dog</p>') == {
+        u'the': 2, u'quick': 1, u'fox': 2, u'dog': 1}
+
+
+def test_search_index_stage(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    index_dir = py.path.local(temp_project.output_dir).join('search')
+    source_dir.join('first.rest').write(u'title: First\napple banana')
+    source_dir.join('second.rest').write(u'title: Second\nbanana cherry')
+    stage = SearchIndexStage(shards=4)
+    render(temp_project, stages=[stage])
+    assert load(index_dir, 'meta.json')['shards'] == 4
+    documents = load(index_dir, 'documents.json')
+    ids = dict((title, int(id)) for id, (url, title) in documents.items())
+    banana_shard = load(
+        index_dir, 'shard-{0}.json'.format(get_shard(u'banana', 4)))
+    assert banana_shard[u'banana'] == sorted(
+        [[ids['First'], 1], [ids['Second'], 1]])
+    # changing a page only rewrites the shards of its old and new terms
+    unaffected_shards = set(xrange(4)).difference(
+        get_shard(term, 4) for term in (u'apple', u'banana', u'date'))
+    for shard in unaffected_shards:
+        index_dir.join('shard-{0}.json'.format(shard)).write('untouched')
+    source_dir.join('first.rest').write(u'title: First\nbanana date')
+    render(temp_project, stages=[stage])
+    for shard in unaffected_shards:
+        assert index_dir.join('shard-{0}.json'.format(shard)).read() == (
+            'untouched')
+    apple_shard = load(
+        index_dir, 'shard-{0}.json'.format(get_shard(u'apple', 4)))
+    assert u'apple' not in apple_shard
+    date_shard = load(
+        index_dir, 'shard-{0}.json'.format(get_shard(u'date', 4)))
+    assert date_shard[u'date'] == [[ids['First'], 1]]
+    # removing a page removes its postings
+    source_dir.join('second.rest').remove()
+    render(temp_project, stages=[stage])
+    cherry_shard = load(
+        index_dir, 'shard-{0}.json'.format(get_shard(u'cherry', 4)))
+    assert u'cherry' not in cherry_shard
+    assert load(index_dir, 'documents.json').keys() == [str(ids['First'])]
+
+
+def test_fewer_shards(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    index_dir = py.path.local(temp_project.output_dir).join('search')
+    source_dir.join('first.rest').write(u'title: First\napple banana')
+    render(temp_project, stages=[SearchIndexStage(shards=4)])
+    render(temp_project, stages=[SearchIndexStage(shards=2)])
+    assert sorted(path.basename for path in index_dir.listdir()) == [
+        'documents.json', 'meta.json', 'shard-0.json', 'shard-1.json']
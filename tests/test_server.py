@@ -0,0 +1,63 @@
+import hashlib
+import threading
+import urllib2
+
+import py
+from swsg.server import PreviewRenderer, PreviewServer
+
+from utils import make_project
+
+SOURCE_CONTENT = u'title: the title\nsome text'
+
+
+def pytest_funcarg__temp_project(request):
+    return make_project(
+        request.getfuncargvalue('tmpdir'), {'page.rest': SOURCE_CONTENT})
+
+
+def test_preview_renderer(temp_project):
+    renderer = PreviewRenderer(temp_project)
+    assert renderer.find_source('page.html') == 'page.rest'
+    assert renderer.find_source('missing.html') is None
+    page = renderer.render('page.rest')
+    assert '<p>some text</p>' in page.output
+    # nothing has changed, so the cached page is returned
+    assert renderer.render('page.rest') is page
+    source = py.path.local(temp_project.source_dir).join('page.rest')
+    source.write(SOURCE_CONTENT + u' and more text')
+    new_page = renderer.render('page.rest')
+    assert new_page.etag != page.etag
+    # the ETag is the digest of the output, so changing the source without
+    # changing the output keeps it
+    source.write(SOURCE_CONTENT + u' and more text\n')
+    unchanged_page = renderer.render('page.rest')
+    assert unchanged_page is not new_page
+    assert unchanged_page.etag == new_page.etag == '"{0}"'.format(
+        hashlib.sha256(new_page.output.encode('utf-8')).hexdigest())
+    assert '<p>some text and more text</p>' in new_page.output
+    template = py.path.local(temp_project.template_dir).join('default.html')
+    template.write(u'changed template: $content')
+    assert renderer.render('page.rest').output.startswith(
+        u'changed template: ')
+
+
+def test_preview_server(temp_project):
+    server = PreviewServer(temp_project, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        url = 'http://localhost:{0}/page.html'.format(server.server_port)
+        response = urllib2.urlopen(url)
+        assert '<p>some text</p>' in response.read()
+        etag = response.info()['ETag']
+        request = urllib2.Request(url, headers={'If-None-Match': etag})
+        error = py.test.raises(urllib2.HTTPError, 'urllib2.urlopen(request)')
+        assert error.value.code == 304
+        error = py.test.raises(
+            urllib2.HTTPError,
+            "urllib2.urlopen(url.replace('page.html', 'missing.html'))")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,141 @@
+import multiprocessing
+
+import py
+from swsg.projects import get_project_by_path
+from swsg.search import SearchIndexStage
+from swsg.sharding import (InvalidPartialManifest, Shard,
+    dump_partial_manifest, in_shard, load_partial_manifest,
+    merge_partial_manifests, parse_shard)
+
+from utils import pytest_funcarg__temp_project, render
+
+
+def render_shard((project_dir, projects_filename, shard)):
+    '''render a shard of a project like "swsg render --shard" does; this
+    function is called in a separate process for every shard'''
+    project = get_project_by_path(project_dir, projects_filename)
+    render(project, shard=shard)
+    filename = '{0}/manifest-{1}-of-{2}.json'.format(project_dir, *shard)
+    with open(filename, 'w') as fp:
+        dump_partial_manifest(project, shard, fp)
+    return filename
+
+
+def render_shards(project, count):
+    pool = multiprocessing.Pool(count)
+    try:
+        return pool.map(render_shard, [
+            (project.project_dir, project.projects_file_name,
+             Shard(index, count))
+            for index in xrange(1, count + 1)])
+    finally:
+        pool.close()
+        pool.join()
+
+
+def test_parse_shard():
+    assert parse_shard('1/1') == Shard(1, 1)
+    assert parse_shard('2/4') == Shard(2, 4)
+    for value in ('0/4', '5/4', '1', 'a/b', '1/2/3'):
+        py.test.raises(ValueError, 'parse_shard(value)')
+
+
+def test_in_shard():
+    source_names = ['{0}.rest'.format(i) for i in xrange(100)]
+    shards = [Shard(index, 3) for index in (1, 2, 3)]
+    for source_name in source_names:
+        # every source belongs to exactly one shard
+        assert sum(in_shard(source_name, shard) for shard in shards) == 1
+    # the sources are distributed over all shards
+    for shard in shards:
+        assert 20 < sum(in_shard(name, shard) for name in source_names) < 50
+
+
+def test_sharded_rendering(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    for i in xrange(10):
+        source_dir.join('page{0}.rest'.format(i)).write(u'text {0}'.format(i))
+    filenames = render_shards(temp_project, 3)
+    # rendering a shard does not change the projects file
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.manifest.entries == {}
+    assert sorted(py.path.local(temp_project.output_dir).listdir()) == [
+        py.path.local(temp_project.output_dir).join('page{0}.html'.format(i))
+        for i in xrange(10)]
+    assert merge_partial_manifests(project, filenames) == [
+        Shard(1, 3), Shard(2, 3), Shard(3, 3)]
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert sorted(project.manifest.entries) == [
+        'page{0}.rest'.format(i) for i in xrange(10)]
+    assert project.plan().rebuild == []
+    # removed sources are removed from the manifest when merging
+    source_dir.join('page0.rest').remove()
+    source_dir.join('page1.rest').write(u'changed text')
+    plan = project.plan()
+    assert [source_name for source_name, _, _ in plan.rebuild] == [
+        'page1.rest']
+    assert [source_name for source_name, _, _ in plan.delete] == [
+        'page0.rest']
+    filenames = render_shards(project, 3)
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    merge_partial_manifests(project, filenames)
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert 'page0.rest' not in project.manifest.entries
+    plan = project.plan()
+    assert plan.rebuild == plan.delete == []
+    assert not py.path.local(temp_project.output_dir).join(
+        'page0.html').check()
+
+
+def test_partial_manifest(temp_project, tmpdir):
+    source_dir = py.path.local(temp_project.source_dir)
+    source_dir.join('page.rest').write(u'text')
+    list(temp_project.render())
+    shard = Shard(1, 1)
+    filename = tmpdir.join('manifest.json')
+    with filename.open('w') as fp:
+        dump_partial_manifest(temp_project, shard, fp)
+    # paths inside the project directory are relative to it
+    assert temp_project.project_dir not in filename.read()
+    loaded_shard, entries, stamps = load_partial_manifest(
+        temp_project, str(filename))
+    assert loaded_shard == shard
+    entry = temp_project.manifest.entries['page.rest']
+    assert vars(entries['page.rest']) == vars(entry)
+    assert sorted(stamps) == sorted(temp_project.manifest.stamps)
+    filename.write('no JSON')
+    py.test.raises(
+        InvalidPartialManifest,
+        'load_partial_manifest(temp_project, str(filename))')
+
+
+def test_site_wide_stages_after_merging(temp_project):
+    source_dir = py.path.local(temp_project.source_dir)
+    for i in xrange(4):
+        source_dir.join('page{0}.rest'.format(i)).write(u'text {0}'.format(i))
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    merge_partial_manifests(project, render_shards(temp_project, 2))
+    assert project.manifest.unstaged == frozenset(
+        'page{0}.rest'.format(i) for i in xrange(4))
+    # the outputs are passed to the stages without being rendered again
+    stage = SearchIndexStage()
+    assert list(project.render(stages=[stage])) == []
+    assert sorted(stage.get_state(project)['documents']) == [
+        'page{0}.rest'.format(i) for i in xrange(4)]
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.manifest.unstaged == frozenset()
+    # only the outputs which changed are passed to the stages again
+    source_dir.join('page1.rest').write(u'changed text')
+    merge_partial_manifests(project, render_shards(temp_project, 2))
+    project = get_project_by_path(
+        temp_project.project_dir, temp_project.projects_file_name)
+    assert project.manifest.unstaged == frozenset(['page1.rest'])
+    # the outputs are not passed to any stage without site-wide stages
+    assert list(project.render()) == []
+    assert project.manifest.unstaged == frozenset()
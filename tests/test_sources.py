@@ -2,7 +2,8 @@ from functools import partial
 
 import py.test
 from swsg.sources import (UnsupportedMarkup, BaseSource, ReSTSource,
-    CreoleSource, TextileSource, MarkdownSource, get_source_class_by_markup)
+    CreoleSource, TextileSource, MarkdownSource, get_source_class_by_markup,
+    parse_header_line, scan_header, split_header)
 
 
 def test_base_source():
@@ -32,6 +33,40 @@ def test_base_source():
     assert source.title == 'foo'
     assert source.template_path == 'bar.html'
     assert source.text == 'some text'
+    # the names of the variables are prefixes, not sets of characters
+    source = Source('title:item list\ntemplate:tempest.html\nsome text')
+    assert source.title == 'item list'
+    assert source.template_path == 'tempest.html'
+
+
+def test_parse_header_line():
+    assert parse_header_line(u'title: foo') == (u'title', u'foo')
+    assert parse_header_line(u'title:title') == (u'title', u'title')
+    assert parse_header_line(u'template: a.html ') == (u'template', u'a.html')
+    assert parse_header_line(u'some text') is None
+    assert parse_header_line(u'') is None
+
+
+def test_scan_header(tmpdir):
+    source = tmpdir.join('source.rest')
+    source.write('title: foo\ntemplate: bar.html\ntitle: not a header\n')
+    assert scan_header(str(source)) == {
+        u'title': u'foo', u'template': u'bar.html'}
+    # a line is only a header line if it is followed by a newline, like in
+    # the text of a source
+    for text in ['some text\ntitle: foo', 'title: foo', '']:
+        source.write(text)
+        assert scan_header(str(source)) == {}
+        assert split_header(text.decode('utf-8'))[0] == {}
+    source.write('some text\ntitle: foo\nmore text')
+    assert scan_header(str(source)) == {u'title': u'foo'}
+
+
+def test_split_header():
+    text = u'some text\ntitle: foo\nmore text\ntemplate: a.html'
+    assert split_header(text) == (
+        {u'title': u'foo'}, u'some text\nmore text\ntemplate: a.html')
+    assert split_header(u'title: foo\n') == ({u'title': u'foo'}, u'')
 
 
 def test_render_rest():
@@ -0,0 +1,64 @@
+from hashlib import sha256
+
+from swsg import utils
+from swsg.utils import (HASH_CHUNK_SIZE, hash_file, stamp_file, read_file,
+    html_to_text)
+
+
+def test_hash_file(tmpdir):
+    # make sure that the content is larger than a single chunk
+    content = 'some content\n' * HASH_CHUNK_SIZE
+    filename = str(tmpdir.join('file.txt'))
+    with open(filename, 'wb') as fp:
+        fp.write(content)
+    expected_digest = sha256(content).hexdigest()
+    assert hash_file(filename) == expected_digest
+    assert hash_file(filename, use_mmap=True) == expected_digest
+    empty_filename = str(tmpdir.ensure('empty.txt'))
+    assert hash_file(empty_filename, use_mmap=True) == sha256('').hexdigest()
+
+
+def test_stamp_file(tmpdir):
+    file_ = tmpdir.join('file.txt')
+    file_.write('content')
+    stamp = stamp_file(str(file_))
+    assert stamp.size == len('content')
+    assert stamp.digest == sha256('content').hexdigest()
+    # the file is not hashed again if its stat information did not change
+    fake_stamp = stamp._replace(digest='not really a digest')
+    assert stamp_file(str(file_), fake_stamp) is fake_stamp
+    file_.write('changed content')
+    assert stamp_file(str(file_), stamp).digest == hash_file(str(file_))
+
+
+def test_stamp_large_file(tmpdir, monkeypatch):
+    calls = []
+    def recording_hash_file(filename, use_mmap=False):
+        calls.append(use_mmap)
+        return hash_file(filename, use_mmap)
+    monkeypatch.setattr(utils, 'hash_file', recording_hash_file)
+    monkeypatch.setattr(utils, 'MMAP_THRESHOLD', len('large content'))
+    small_file = tmpdir.join('small.txt')
+    small_file.write('content')
+    large_file = tmpdir.join('large.txt')
+    large_file.write('large content')
+    assert stamp_file(str(small_file)).digest == sha256('content').hexdigest()
+    assert stamp_file(str(large_file)).digest == sha256(
+        'large content').hexdigest()
+    # only the file which is not smaller than the threshold is memory-mapped
+    assert calls == [False, True]
+
+
+def test_read_file(tmpdir):
+    file_ = tmpdir.join('file.txt')
+    file_.write('content')
+    data, stamp = read_file(str(file_))
+    assert data == 'content'
+    assert stamp == stamp_file(str(file_))
+
+
+def test_html_to_text():
+    assert html_to_text(u'<p>some <em>important</em>\n text</p>') == (
+        u'some important text')
+    assert html_to_text(u'<p>A &amp; B</p>') == u'A & B'
+    assert html_to_text(u'') == u''
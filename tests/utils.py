@@ -1,2 +1,42 @@
+from os import path
+
+import py
+from swsg.pipeline import write_output
+from swsg.projects import Project
+
+
 class Object(object):
     pass
+
+
+def make_project(directory, sources=None, name='test-project'):
+    '''Create a project in ``directory`` (a ``py.path.local``) which has a
+    projects file of its own. ``sources`` maps the names of the sources of
+    the project to their texts.
+
+    '''
+    projects_filename = str(directory.join('projects.shelve'))
+    project = Project(str(directory), name, projects_filename)
+    project.init()
+    source_dir = py.path.local(project.source_dir)
+    for source_name, text in (sources or {}).iteritems():
+        source_dir.join(source_name).write(text)
+    return project
+
+
+def pytest_funcarg__temp_project(request):
+    'an empty project in the temporary directory of the test'
+    return make_project(request.getfuncargvalue('tmpdir'))
+
+
+def render(project, **options):
+    '''Render ``project`` with the keyword arguments ``options`` of
+    ``Project.render`` and write the outputs. Return the filenames of the
+    rendered outputs in the order they were rendered.
+
+    '''
+    rendered = []
+    for output_path, output in project.render(**options):
+        write_output(output_path, output)
+        rendered.append(path.basename(output_path))
+    return rendered